@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+麦克风 / 回环参考双流对齐：基于回调时间戳估计时钟漂移，分数重采样补偿
+
+两个独立声卡各有自己的晶振，标称 16k / 48k 实际会差几十到几百 ppm。
+长时间运行后参考信号相对麦克风逐渐错位，AEC 自适应滤波器只能不停重新收敛。
+
+  ClockTracker       : 单个流的 (时间戳, 累计帧数) 指数加权线性回归 → 实际采样率
+  FractionalResampler: 步长可连续调整的 4 点三次插值重采样（Catmull-Rom）
+  DriftAligner       : 两个 ClockTracker 得出相对漂移 ppm，把参考流重采样到麦克风时钟
+"""
+
+import time
+
+import numpy as np
+
+from config import (
+    ALIGN_DRIFT_TC_SEC,
+    ALIGN_WARMUP_SEC,
+    ALIGN_MAX_DRIFT_PPM,
+    ALIGN_GAP_SEC,
+)
+
+
+class ClockTracker:
+    """
+    估计一个流相对时间戳时钟的实际采样率。
+
+    每个回调调用 observe(frames, adc_time)：adc_time 取回调 time_info 中
+    第一个采样的 ADC 时间；首次观测若为 0（部分 Host API 不提供），
+    该流此后一律改用 time.perf_counter()，保证同一流的时间基一致。
+    回归只用斜率，两个流的时间戳可以来自不同的时间基准。
+
+    回归 x = 时间戳（相对首次），y = 该块第一个采样之前的累计帧数，
+    采用指数加权的中心化增量更新（数值稳定），时间常数 tc_sec。
+
+    WASAPI 回环在无声时会停止回调：相邻两次观测的间隔比上一块时长多出
+    ALIGN_GAP_SEC 以上时视为断流，把多出的时间从时间轴上扣掉，避免被误判为降速。
+    """
+
+    def __init__(self, nominal_rate: float, tc_sec: float = ALIGN_DRIFT_TC_SEC):
+        self.nominal   = float(nominal_rate)
+        self._tc       = tc_sec
+        self._use_host = None     # None = 尚未决定时间基
+        self._t0       = 0.0
+        self._t_last   = 0.0
+        self._n_last   = 0        # 上一块帧数
+        self._frames   = 0        # 累计帧数
+        self._k        = 0        # 观测次数
+        self._mx = self._my = 0.0
+        self._cxx = self._cxy = 0.0
+        self.span_sec  = 0.0      # 已观测的时间跨度
+
+    def observe(self, frames: int, adc_time: float = 0.0):
+        """回调中调用（只做若干次浮点运算）"""
+        if self._use_host is None:
+            self._use_host = not adc_time or adc_time <= 0
+        t = time.perf_counter() if self._use_host else adc_time
+        if self._k == 0:
+            self._t0 = t
+        else:
+            gap = (t - self._t_last) - self._n_last / self.nominal
+            if gap > ALIGN_GAP_SEC:
+                self._t0 += gap
+        self._t_last, self._n_last = t, frames
+        x, y = t - self._t0, float(self._frames)
+        self._frames += frames
+        self._k      += 1
+        self.span_sec = x
+
+        # 预热期按样本数平均，之后按时间常数遗忘：a ≈ 块时长 / tc
+        blk_sec = frames / self.nominal
+        a  = max(1.0 / self._k, min(1.0, blk_sec / self._tc))
+        dx = x - self._mx
+        dy = y - self._my
+        self._mx  += a * dx
+        self._my  += a * dy
+        self._cxx  = (1.0 - a) * (self._cxx + a * dx * dx)
+        self._cxy  = (1.0 - a) * (self._cxy + a * dx * dy)
+
+    @property
+    def rate(self) -> float:
+        """估计的实际采样率（帧/秒）；数据不足时返回标称值"""
+        if self._cxx <= 0.0:
+            return self.nominal
+        return self._cxy / self._cxx
+
+    def reset(self):
+        self.__init__(self.nominal, self._tc)
+
+
+class FractionalResampler:
+    """
+    步长可变的三次插值重采样：每输出一个采样，读位置前进 step 个输入采样。
+    step 略大于 1 → 输出比输入少（压缩），略小于 1 → 输出更多（拉伸）。
+    保留 3 个采样的历史以跨块连续，固有延迟 2 个采样。
+    """
+
+    def __init__(self):
+        self._x   = np.zeros(1, dtype=np.float64)   # 位置 0 之前补一个零作为 x[-1]
+        self._pos = 1.0                             # 下一个输出在 _x 中的读位置
+
+    def process(self, x: np.ndarray, step: float) -> np.ndarray:
+        buf = np.concatenate([self._x, x])
+        n   = len(buf)
+        # 第 k 个输出需要 floor(p_k) + 2 <= n - 1
+        K = int(np.ceil((n - 2 - self._pos) / step)) if n - 2 > self._pos else 0
+        if K <= 0:
+            self._x = buf
+            return np.zeros(0, dtype=np.float32)
+
+        p  = self._pos + step * np.arange(K)
+        i  = p.astype(np.int64)
+        f  = p - i
+        xm1, x0, x1, x2 = buf[i - 1], buf[i], buf[i + 1], buf[i + 2]
+        y = x0 + 0.5 * f * (x1 - xm1 + f * (2.0 * xm1 - 5.0 * x0 + 4.0 * x1 - x2
+                                             + f * (3.0 * (x0 - x1) + x2 - xm1)))
+
+        self._pos += K * step
+        keep       = int(self._pos) - 1          # 下次仍需要的第一个采样
+        self._x    = buf[keep:]
+        self._pos -= keep
+        return y.astype(np.float32)
+
+
+class DriftAligner:
+    """
+    参考流 → 麦克风时钟的漂移补偿。
+
+    回调里分别调用 observe_mic / observe_ref 记录时间戳；
+    工作线程把重采样到 16kHz 的参考块交给 correct()，得到麦克风时钟下的参考信号。
+
+    drift_ppm > 0 表示参考时钟比麦克风快：每个麦克风采样对应 1+drift 个参考采样。
+    观测时长不足 ALIGN_WARMUP_SEC 时不做补偿（步长为 1），估计值限幅在
+    ±ALIGN_MAX_DRIFT_PPM 以内，防止设备异常时把参考信号拉坏。
+    """
+
+    def __init__(self, mic_rate: float, ref_rate: float,
+                 tc_sec: float = ALIGN_DRIFT_TC_SEC):
+        self.mic = ClockTracker(mic_rate, tc_sec)
+        self.ref = ClockTracker(ref_rate, tc_sec)
+        self._rs = FractionalResampler()
+
+    def observe_mic(self, frames: int, adc_time: float = 0.0):
+        self.mic.observe(frames, adc_time)
+
+    def observe_ref(self, frames: int, adc_time: float = 0.0):
+        self.ref.observe(frames, adc_time)
+
+    @property
+    def ready(self) -> bool:
+        return min(self.mic.span_sec, self.ref.span_sec) >= ALIGN_WARMUP_SEC
+
+    @property
+    def drift_ppm(self) -> float:
+        """参考相对麦克风的时钟漂移（ppm）；预热期为 0"""
+        if not self.ready:
+            return 0.0
+        rel = (self.ref.rate / self.ref.nominal) / (self.mic.rate / self.mic.nominal)
+        return float(np.clip((rel - 1.0) * 1e6, -ALIGN_MAX_DRIFT_PPM, ALIGN_MAX_DRIFT_PPM))
+
+    def correct(self, ref: np.ndarray) -> np.ndarray:
+        """把一段参考信号（16kHz，参考时钟）重采样到麦克风时钟"""
+        return self._rs.process(ref, 1.0 + self.drift_ppm * 1e-6)
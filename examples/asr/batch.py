@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+离线批量转写：录音文件 → SRT / VTT / JSONL 字幕（main.py --transcribe）
+
+实时流水线按 1× 节奏运行、还要做 preview；离线时整段音频已经在手，可以：
+  1. VAD  ：整个文件一次切帧，每 BATCH_VAD_FRAMES 帧交给后端成批打分，
+             用与实时相同的 VADSegmenter 断句（超过 MAX_SEG_SEC 强制切断）
+  2. 识别 ：全部语音段交给 engine.transcribe_many —— 按时长排序，相近长度的段凑成一批
+             （补齐后总时长 ≤ BATCH_MAX_SEC），每批一次 model.generate，补齐浪费最小
+  3. 输出 ：按原顺序写出，时间轴为段起止 ± BATCH_PAD_MS
+
+转写结束打印实时因子（各阶段耗时 / 音频时长）。
+"""
+
+import os
+import json
+import time
+import logging
+from typing import NamedTuple
+
+import numpy as np
+
+from config import (
+    SAMPLE_RATE, VAD_CHUNK, SILENCE_MS, MAX_SEG_SEC, NOISE_GATE_RMS,
+    BATCH_MAX_SEC, BATCH_PAD_MS, BATCH_VAD_FRAMES,
+)
+from vad import make_vad_backend, VADSegmenter
+
+log = logging.getLogger("subtitle")
+
+FORMATS = ("srt", "vtt", "jsonl")
+
+
+class Segment(NamedTuple):
+    start: float         # 秒
+    end:   float
+    text:  str           # 剥离标签后的字幕文本
+    raw:   str           # 引擎原始输出（含 SenseVoice 标签）
+
+
+# ─── 切段 ──────────────────────────────────────────────────────────────────────
+
+def find_speech(audio: np.ndarray, vad=None) -> list[tuple[int, int]]:
+    """
+    整段音频 VAD 切段，返回 [(起始采样, 结束采样), ...]。
+    起点为触发帧，终点为最后一个语音帧（不含句尾静音），再各扩展 BATCH_PAD_MS。
+    """
+    vad = vad or make_vad_backend()
+    vad.reset()
+    seg     = VADSegmenter(threshold=0.5, min_silence_ms=SILENCE_MS)
+    n       = len(audio) // VAD_CHUNK
+    frames  = audio[:n * VAD_CHUNK].reshape(n, VAD_CHUNK)
+    max_len = MAX_SEG_SEC * SAMPLE_RATE // VAD_CHUNK
+    spans   = []
+    start   = None
+    last    = 0           # 最近一个语音帧
+
+    for b in range(0, n, BATCH_VAD_FRAMES):
+        for i, p in enumerate(vad.probs(frames[b:b + BATCH_VAD_FRAMES]), b):
+            event = seg.step(p)
+            if p >= seg.threshold:
+                last = i
+            if event == "start":
+                start = i
+            elif event == "end" and start is not None:
+                if last >= start:             # 强制切断后只剩静音则不成段
+                    spans.append((start, last + 1))
+                start = None
+            elif start is not None and i + 1 - start >= max_len:
+                spans.append((start, i + 1))
+                start = i + 1
+    if start is not None and last >= start:
+        spans.append((start, last + 1))
+
+    pad, out = BATCH_PAD_MS * SAMPLE_RATE // 1000, []
+    for k, (s, e) in enumerate(spans):
+        s = max(s * VAD_CHUNK - pad, out[-1][1] if out else 0)
+        e = min(e * VAD_CHUNK + pad, len(audio))
+        if k + 1 < len(spans):
+            e = min(e, spans[k + 1][0] * VAD_CHUNK)
+        out.append((s, e))
+    return out
+
+
+# ─── 推理 ──────────────────────────────────────────────────────────────────────
+
+def transcribe_file(engine, path: str, vad=None,
+                    max_sec: float = BATCH_MAX_SEC) -> tuple[list[Segment], dict]:
+    """
+    转写一个文件，返回 (按时间排序的字幕段, 报告)。
+    报告含音频时长与 load / vad / asr 各阶段耗时（秒）、段数、批数。
+    engine 没有 transcribe_many（EngineProcess 等）时逐段推理。
+    """
+    from capture import load_audio
+    from subtitle import _TAG_RE
+
+    t0    = time.perf_counter()
+    audio = load_audio(path)
+    t1    = time.perf_counter()
+    spans = [(s, e) for s, e in find_speech(audio, vad)
+             if np.sqrt(np.mean(audio[s:e] ** 2)) >= NOISE_GATE_RMS]
+    t2    = time.perf_counter()
+
+    clips = [audio[s:e] for s, e in spans]
+    log.info("[转写] %s: %d 段语音，开始识别", os.path.basename(path), len(clips))
+    if hasattr(engine, "transcribe_many"):
+        raws    = engine.transcribe_many(clips, max_sec)
+        batches = len(engine.last_batches)
+    else:
+        raws    = [engine.transcribe(c) for c in clips]
+        batches = len(clips)
+    t3 = time.perf_counter()
+
+    segs = [Segment(s / SAMPLE_RATE, e / SAMPLE_RATE, _TAG_RE.sub("", raw).strip(), raw)
+            for (s, e), raw in zip(spans, raws)]
+    report = {
+        "audio_sec":  len(audio) / SAMPLE_RATE,
+        "speech_sec": sum(len(c) for c in clips) / SAMPLE_RATE,
+        "segments":   len(clips),
+        "batches":    batches,
+        "load":       t1 - t0,
+        "vad":        t2 - t1,
+        "asr":        t3 - t2,
+    }
+    return [s for s in segs if s.text], report
+
+
+def format_report(path: str, r: dict) -> str:
+    total = r["load"] + r["vad"] + r["asr"]
+    rtf   = total / max(r["audio_sec"], 1e-9)
+    return (f"{os.path.basename(path)}: 音频 {r['audio_sec']:.1f}s（语音 {r['speech_sec']:.1f}s，"
+            f"{r['segments']} 段 / {r['batches']} 批）  "
+            f"解码 {r['load']:.1f}s + VAD {r['vad']:.1f}s + 识别 {r['asr']:.1f}s = {total:.1f}s  "
+            f"RTF {rtf:.3f}（{1 / max(rtf, 1e-9):.0f}× 实时）")
+
+
+# ─── 输出 ──────────────────────────────────────────────────────────────────────
+
+def _stamp(sec: float, sep: str) -> str:
+    ms = int(round(sec * 1000))
+    h, ms = divmod(ms, 3_600_000)
+    m, ms = divmod(ms, 60_000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}{sep}{ms:03d}"
+
+
+def write_srt(segs: list[Segment], path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        for k, s in enumerate(segs, 1):
+            f.write(f"{k}\n{_stamp(s.start, ',')} --> {_stamp(s.end, ',')}\n{s.text}\n\n")
+
+
+def write_vtt(segs: list[Segment], path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("WEBVTT\n\n")
+        for s in segs:
+            f.write(f"{_stamp(s.start, '.')} --> {_stamp(s.end, '.')}\n{s.text}\n\n")
+
+
+def write_jsonl(segs: list[Segment], path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        for s in segs:
+            f.write(json.dumps({"start": round(s.start, 3), "end": round(s.end, 3),
+                                "text": s.text, "raw": s.raw}, ensure_ascii=False) + "\n")
+
+
+_WRITERS = {"srt": write_srt, "vtt": write_vtt, "jsonl": write_jsonl}
+
+
+def run(engine, paths: list[str], out_dir: str | None = None, formats=FORMATS):
+    """逐个文件转写并写出字幕（与输入同名，扩展名为格式名），最后打印汇总实时因子"""
+    vad = make_vad_backend()
+    total_audio = total_sec = 0.0
+    for path in paths:
+        segs, r = transcribe_file(engine, path, vad)
+        base = os.path.splitext(os.path.basename(path))[0]
+        dst  = out_dir or os.path.dirname(os.path.abspath(path))
+        os.makedirs(dst, exist_ok=True)
+        for fmt in formats:
+            _WRITERS[fmt](segs, os.path.join(dst, f"{base}.{fmt}"))
+        print(format_report(path, r), flush=True)
+        total_audio += r["audio_sec"]
+        total_sec   += r["load"] + r["vad"] + r["asr"]
+    if len(paths) > 1:
+        print(f"合计: 音频 {total_audio:.1f}s，耗时 {total_sec:.1f}s，"
+              f"RTF {total_sec / max(total_audio, 1e-9):.3f}", flush=True)
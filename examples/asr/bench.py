@@ -0,0 +1,1426 @@
+#!/usr/bin/env python3
+"""
+离线性能基准（合成信号，不需要打开音频设备，也不加载模型）
+
+用法：
+  uv run python bench.py aec      # FreqDomainAEC：逐块 process vs 批量 process_batch
+  uv run python bench.py mdf      # FreqDomainAEC vs PartitionedBlockAEC：不同回声尾长的每块 CPU
+  uv run python bench.py ring     # RingBuffer：稳态累积路径的内存分配（tracemalloc）
+  uv run python bench.py resample # StreamResampler vs 逐块 resample_poly：每回调耗时与块边界误差
+  uv run python bench.py drift    # DriftAligner：已知 ppm 偏差的合成双流，漂移估计与补偿误差
+  uv run python bench.py gate [ref.wav mic.wav]
+                                  # FreqDomainAEC 门控开/关的 CPU 与跳过比例（默认合成会话）
+  uv run python bench.py proc     # 进程内 vs 子进程采集：持续占用 GIL 的推理负载下的丢帧率
+  uv run python bench.py vad [rec.wav]
+                                  # VADIterator 逐帧 vs Torch / ONNX 后端成批打分：每帧 CPU 与断句是否一致
+  uv run python bench.py segbuf   # 语音段缓冲：list + concatenate vs SegmentBuffer，preview / final 请求耗时随段长
+  uv run python bench.py stream rec.wav [seg_sec]
+                                  # 需要模型：固定窗口 preview vs 增量识别，每秒语音的推理耗时与最终文本一致度
+  uv run python bench.py many rec.wav [n_segs]
+                                  # 需要模型：混合时长语音段，逐段 transcribe vs transcribe_many 的总耗时与文本一致性
+  uv run python bench.py sched    # 单 FIFO 推理队列 vs 双通道调度器：句尾 → final 显示延迟、final 乱序与过期 preview 显示
+  uv run python bench.py governor # 不同 CPU 速度下 preview 调速开/关：final 延迟、preview 刷新间隔与最终档位
+  uv run python bench.py pool [rec.wav [max_workers]]
+                                  # 推理线程池 N=1..4：final 吞吐、快节奏对话下的延迟分位与交付顺序
+                                  # （给出录音时加载 SenseVoice，否则用纯 CPU 负载模拟引擎）
+  uv run python bench.py engine_proc
+                                  # 持续说话时推理在进程内线程 vs 推理子进程：界面 100ms 刷新的抖动与 audio_q 丢帧
+  uv run python bench.py server [max_sessions [rec.wav]]
+                                  # 多会话服务器：并发会话数 1..N，跨会话合批开 / 关的批大小、推理占用、
+                                  # 句尾 → final 延迟与 partial 刷新率（给出录音时用 SenseVoice + Silero VAD）
+  uv run python bench.py tracing [seconds]
+                                  # 线程时间线：每事件开销，与实时回放整条流水线时开 / 关记录的进程 CPU 占用
+  uv run python bench.py idle [minutes [rec.wav]]
+                                  # 待机场景（长静音 + 偶尔说话）VAD 能量预门控开 / 关：每路 VAD CPU、跳过比例、
+                                  # 唤醒次数，语音起点是否丢失 / 推迟（给出录音时把它插在静音之间）
+  uv run python bench.py startup rec.wav [runs]
+                                  # 需要模型：每次新开进程 main.py --file，预热关 / 开的启动时间线各阶段与首条字幕时间
+  uv run python bench.py snapshot [runs [snapshot_dir]]
+                                  # 需要模型：原路径 vs 模型快照（mmap）的冷 / 热启动加载耗时，两个进程同时加载时的 RSS / PSS
+"""
+
+import sys
+import time
+import queue
+import threading
+import tracemalloc
+import multiprocessing as mp
+
+import numpy as np
+from scipy.signal import resample_poly
+
+from config import (
+    SAMPLE_RATE, VAD_CHUNK, LOOPBACK_BLOCKSIZE, SILENCE_MS, VAD_BATCH_FRAMES,
+    PREVIEW_WINDOW_SEC, PREVIEW_INTERVAL_SEC, GOV_HOLD_SEC, GOV_PROBE_SEC, STREAM_MAX_WINDOW_SEC,
+)
+from capture import FreqDomainAEC, PartitionedBlockAEC, load_audio
+from ringbuf import RingBuffer, SharedRingBuffer, SegmentBuffer
+from capture_proc import _RingSink
+from resample import StreamResampler
+from align import DriftAligner
+from vad import TorchVAD, OnnxVAD, VADSegmenter, EnergyGate, make_vad_backend
+from scheduler import InferenceScheduler, InferRequest, PreviewGovernor
+
+
+# ─── 工具函数 ──────────────────────────────────────────────────────────────────
+
+def _synth_echo(n_blocks: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """生成 (ref, mic)：ref 为白噪声，mic = ref 经随机回声路径 + 少量近端噪声"""
+    rng  = np.random.default_rng(seed)
+    n    = n_blocks * VAD_CHUNK
+    ref  = (rng.standard_normal(n) * 0.3).astype(np.float32)
+    path = rng.standard_normal(400) * np.exp(-np.arange(400) / 80.0) * 0.1
+    mic  = np.convolve(ref, path)[:n] + rng.standard_normal(n) * 0.01
+    return ref, mic.astype(np.float32)
+
+
+def _per_block_us(fn, n_blocks: int, repeat: int) -> float:
+    """重复执行 fn()，返回每个 block 的平均耗时（微秒）"""
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / (repeat * n_blocks) * 1e6
+
+
+# ─── AEC 批量处理 ──────────────────────────────────────────────────────────────
+
+def bench_aec(depths=(1, 8, 64), total_blocks: int = 512):
+    """模拟工作线程积压 depth 块后一次性追赶：逐块调用 vs 一次 process_batch"""
+    ref, mic = _synth_echo(total_blocks)
+    B = VAD_CHUNK
+
+    print(f"{'backlog':>8} {'process us/blk':>16} {'batch us/blk':>14} {'speedup':>8}")
+    for depth in depths:
+        rounds = total_blocks // depth
+
+        def run_single():
+            aec = FreqDomainAEC()
+            for i in range(rounds * depth):
+                aec.process(ref[i * B:(i + 1) * B], mic[i * B:(i + 1) * B])
+
+        def run_batch():
+            aec = FreqDomainAEC()
+            for r in range(rounds):
+                s = slice(r * depth * B, (r + 1) * depth * B)
+                aec.process_batch(ref[s], mic[s])
+
+        n = rounds * depth
+        t_single = _per_block_us(run_single, n, repeat=2)
+        t_batch  = _per_block_us(run_batch, n, repeat=2)
+        print(f"{depth:>8} {t_single:>16.1f} {t_batch:>14.1f} {t_single / t_batch:>7.2f}x")
+
+
+# ─── AEC 引擎对比 ──────────────────────────────────────────────────────────────
+
+def bench_mdf(filter_blocks=(8, 16, 32, 64), n_blocks: int = 200):
+    """回声尾 256ms → 2s：单块大 FFT 引擎与分块 MDF 引擎的每块 CPU 对比"""
+    ref, mic = _synth_echo(n_blocks)
+    B = VAD_CHUNK
+
+    print(f"{'tail ms':>8} {'fdaf us/blk':>12} {'mdf us/blk':>11} {'ratio':>7}")
+    for k in filter_blocks:
+        row = []
+        for cls in (FreqDomainAEC, PartitionedBlockAEC):
+            aec = cls(filter_blocks=k)
+
+            def run():
+                for i in range(n_blocks):
+                    aec.process(ref[i * B:(i + 1) * B], mic[i * B:(i + 1) * B])
+
+            row.append(_per_block_us(run, n_blocks, repeat=1))
+        tail_ms = k * B * 1000 // SAMPLE_RATE
+        print(f"{tail_ms:>8} {row[0]:>12.1f} {row[1]:>11.1f} {row[0] / row[1]:>6.2f}x")
+
+
+# ─── 环形缓冲 ──────────────────────────────────────────────────────────────────
+
+def bench_ring(n_chunks: int = 20000):
+    """
+    模拟采集线程：不规则长度的块写入，按 VAD_CHUNK 对齐读出。
+    对比 concatenate 累积与 RingBuffer 在稳态下的峰值分配量与耗时。
+    """
+    rng    = np.random.default_rng(0)
+    sizes  = rng.integers(VAD_CHUNK // 2, VAD_CHUNK * 2, size=n_chunks)
+    chunks = [np.ones(n, dtype=np.float32) for n in sizes]
+
+    def run_concat():
+        buf = np.array([], dtype=np.float32)
+        for c in chunks:
+            buf = np.concatenate([buf, c])
+            while len(buf) >= VAD_CHUNK:
+                frame = buf[:VAD_CHUNK]
+                buf   = buf[VAD_CHUNK:]
+
+    ring = RingBuffer()
+
+    def run_ring():
+        for c in chunks:
+            ring.write(c)
+            while len(ring) >= VAD_CHUNK:
+                frame = ring.peek()
+                ring.advance()
+
+    print(f"{'path':>8} {'peak alloc B':>13} {'us/chunk':>9}")
+    for name, fn in (("concat", run_concat), ("ring", run_ring)):
+        fn()                                   # 预热，排除首次分配 / 缓冲构造
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        t = _per_block_us(fn, n_chunks, repeat=1)
+        print(f"{name:>8} {peak - base:>13} {t:>9.2f}")
+
+
+# ─── 流式重采样 ────────────────────────────────────────────────────────────────
+
+def bench_resample(rates=(44100, 48000), seconds: float = 10.0):
+    """
+    回调块长与 capture.py 一致（48k 用 LOOPBACK_BLOCKSIZE，其余按同样公式），
+    以整段一次性 resample_poly 为基准，比较两种逐块做法的误差与每回调耗时。
+    """
+    print(f"{'rate':>6} {'path':>9} {'us/callback':>12} {'max err':>10}")
+    for rate in rates:
+        sr       = StreamResampler(rate)
+        up, down = sr.up, sr.down
+        bs       = LOOPBACK_BLOCKSIZE if rate == 48000 else VAD_CHUNK * down // up * 2 + 64
+        t        = np.arange(int(rate * seconds)) / rate
+        x        = (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+        blocks   = [x[i:i + bs] for i in range(0, len(x) - bs + 1, bs)]
+        oneshot  = resample_poly(x[:len(blocks) * bs], up, down).astype(np.float32)
+
+        def run_poly():
+            return [resample_poly(b, up, down).astype(np.float32) for b in blocks]
+
+        def run_stream():
+            sr.reset()
+            return [sr.process(b).copy() for b in blocks]
+
+        for name, fn in (("poly", run_poly), ("stream", run_stream)):
+            y   = np.concatenate(fn())
+            n   = min(len(y), len(oneshot))
+            err = float(np.abs(y[:n] - oneshot[:n]).max())
+            us  = _per_block_us(fn, len(blocks), repeat=3)
+            print(f"{rate:>6} {name:>9} {us:>12.1f} {err:>10.2e}")
+
+
+# ─── 时钟漂移补偿 ──────────────────────────────────────────────────────────────
+
+def bench_drift(ppms=(-150, -20, 0, 40, 300), seconds: float = 120.0,
+                jitter_sec: float = 0.5e-3):
+    """
+    合成双流：麦克风 16k/512 帧回调，参考 48k/1536 帧回调但时钟偏快 ppm，
+    回调时间戳带 jitter_sec 的高斯抖动。报告估计漂移，以及补偿后的参考信号
+    相对“按麦克风时钟采样的同一信号”的最大误差（未补偿时误差随时间线性增长）。
+    """
+    rng = np.random.default_rng(0)
+    sig = lambda t: 0.5 * np.sin(2 * np.pi * 440 * t)
+
+    print(f"{'true ppm':>9} {'est ppm':>9} {'err raw':>9} {'err corr':>9}")
+    for ppm in ppms:
+        al = DriftAligner(SAMPLE_RATE, 48000)
+        f_ref = SAMPLE_RATE * (1 + ppm * 1e-6)   # 参考流（已重采样到 16k）的真实速率
+        tm = tr = 0.0
+        while tm < seconds:
+            if tm <= tr:
+                al.observe_mic(VAD_CHUNK, 1.0 + tm + rng.normal(0, jitter_sec))
+                tm += VAD_CHUNK / SAMPLE_RATE
+            else:
+                al.observe_ref(1536, 7.0 + tr + rng.normal(0, jitter_sec))
+                tr += 1536 / (48000 * (1 + ppm * 1e-6))
+
+        # 用最终估计补偿最后 10s 参考信号
+        n_ref = int(10 * f_ref)
+        ref   = sig(np.arange(n_ref) / f_ref).astype(np.float32)
+        out   = np.concatenate([al.correct(ref[i:i + VAD_CHUNK])
+                                for i in range(0, n_ref, VAD_CHUNK)])
+        truth = sig(np.arange(len(out)) / SAMPLE_RATE)
+        n     = min(len(out), n_ref)
+        err_raw  = float(np.abs(ref[:n] - sig(np.arange(n) / SAMPLE_RATE)).max())
+        err_corr = float(np.abs(out - truth).max())
+        print(f"{ppm:>9} {al.drift_ppm:>9.2f} {err_raw:>9.4f} {err_corr:>9.4f}")
+
+
+# ─── AEC 远端活动门控 ──────────────────────────────────────────────────────────
+
+def _synth_session(seconds: float = 60.0, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """合成会议场景：远端播放约占 25% 时间，近端说话约占 30%，其余为底噪"""
+    rng  = np.random.default_rng(seed)
+    n    = int(seconds * SAMPLE_RATE)
+    seg  = SAMPLE_RATE * 2                      # 每 2s 随机决定一次是否有声
+    ref  = np.zeros(n, dtype=np.float32)
+    near = np.zeros(n, dtype=np.float32)
+    for s in range(0, n, seg):
+        if rng.random() < 0.25:
+            ref[s:s + seg] = rng.standard_normal(min(seg, n - s)) * 0.2
+        if rng.random() < 0.30:
+            near[s:s + seg] = rng.standard_normal(min(seg, n - s)) * 0.2
+    path = rng.standard_normal(400) * np.exp(-np.arange(400) / 80.0) * 0.1
+    mic  = np.convolve(ref, path)[:n] + near + rng.standard_normal(n) * 1e-3
+    return ref, mic.astype(np.float32)
+
+
+def bench_gate(ref_path: str | None = None, mic_path: str | None = None):
+    """整段会话逐块处理，对比 gate=False / gate=True 的总 CPU 与跳过自适应比例"""
+    if ref_path and mic_path:
+        ref, mic = load_audio(ref_path), load_audio(mic_path)
+        n = min(len(ref), len(mic)) // VAD_CHUNK * VAD_CHUNK
+        ref, mic = ref[:n], mic[:n]
+    else:
+        ref, mic = _synth_session()
+    n_blocks = len(mic) // VAD_CHUNK
+    B = VAD_CHUNK
+
+    print(f"{'gate':>6} {'us/blk':>8} {'skip_idle':>10} {'skip_dtd':>9} {'skip %':>7}")
+    base = None
+    for gate in (False, True):
+        aec = FreqDomainAEC(gate=gate)
+        t0  = time.perf_counter()
+        for i in range(n_blocks):
+            aec.process(ref[i * B:(i + 1) * B], mic[i * B:(i + 1) * B])
+        us = (time.perf_counter() - t0) / n_blocks * 1e6
+        st = aec.gate_stats()
+        print(f"{str(gate):>6} {us:>8.1f} {st['skip_idle']:>10} {st['skip_dtd']:>9} "
+              f"{st['skip_fraction'] * 100:>6.1f}%")
+        base = base or us
+    print(f"CPU 节省: {(1 - us / base) * 100:.1f}%")
+
+
+def _emulated_device(put, seconds: float, host_buf_blocks: int) -> dict:
+    """
+    模拟声卡回调：设备每 VAD_CHUNK 采样产生一块，驱动缓冲最多容纳 host_buf_blocks 块。
+    回调线程拿不到 GIL 迟到时，超出驱动缓冲的块被覆盖（xrun）；
+    按时送达但 put 失败（队列 / 环形缓冲满）的块计为 queue 丢弃。
+    """
+    dt      = VAD_CHUNK / SAMPLE_RATE
+    total   = int(seconds / dt)
+    blk     = np.zeros(VAD_CHUNK, dtype=np.float32)
+    xrun    = 0
+    q_drop  = 0
+    k       = 0
+    t0      = time.perf_counter()
+    while k < total:
+        time.sleep(max(0.0, t0 + (k + 1) * dt - time.perf_counter()))
+        due = min(total, int((time.perf_counter() - t0) / dt))
+        if due - k > host_buf_blocks:
+            xrun += due - k - host_buf_blocks
+            k     = due - host_buf_blocks
+        while k < due:
+            try:
+                put(blk)
+            except queue.Full:
+                q_drop += 1
+            k += 1
+    return {"total": total, "xrun": xrun, "q_drop": q_drop}
+
+
+def _proc_device_main(ring_name: str, capacity: int, seconds: float,
+                      host_buf_blocks: int, result):
+    """子进程：模拟声卡写共享环形缓冲"""
+    ring = SharedRingBuffer(capacity, name=ring_name, create=False)
+    result.put(_emulated_device(_RingSink(ring).put_nowait, seconds, host_buf_blocks))
+    ring.close()
+
+
+def _gil_hog(stop: threading.Event, hold_ms: float):
+    """
+    模拟推理负载：sorted() 在 C 层整段持有 GIL（不受 switch interval 打断），
+    每次约 hold_ms，间隔 20ms 循环，直到 stop。
+    """
+    data = list(np.random.default_rng(0).random(200_000))
+    t0 = time.perf_counter()
+    sorted(data)
+    per = (time.perf_counter() - t0) * 1e3
+    data = data * max(1, int(round(hold_ms / per)))
+    while not stop.is_set():
+        sorted(data)
+        time.sleep(0.02)
+
+
+def bench_proc(holds_ms=(0, 100, 400, 1500), seconds: float = 8.0,
+               host_buf_blocks: int = 3):
+    """
+    同样的 GIL 占用负载下，采集放在主进程线程（queue.Queue）与放在子进程（共享环形缓冲）
+    两种方式的丢帧率。消费端都在主进程，模拟 VAD 逐帧读取。
+    """
+    def consume(get, stop):
+        while not stop.is_set():
+            if get() is None:
+                time.sleep(0.002)
+
+    print(f"{'mode':>8} {'hold ms':>8} {'blocks':>7} {'xrun':>6} {'q_drop':>7} {'loss %':>7}")
+    for hold in holds_ms:
+        for mode in ("thread", "process"):
+            stop = threading.Event()
+            if mode == "thread":
+                q = queue.Queue(maxsize=300)
+
+                def get():
+                    try:
+                        return q.get_nowait()
+                    except queue.Empty:
+                        return None
+                put = q.put_nowait
+            else:
+                ring = SharedRingBuffer()
+
+                def get():
+                    if len(ring) < VAD_CHUNK:
+                        return None
+                    frame = ring.peek().copy()
+                    ring.advance()
+                    return frame
+
+            threading.Thread(target=consume, args=(get, stop), daemon=True).start()
+            if hold:
+                threading.Thread(target=_gil_hog, args=(stop, hold), daemon=True).start()
+
+            if mode == "thread":
+                res = _emulated_device(put, seconds, host_buf_blocks)
+            else:
+                ctx    = mp.get_context("spawn")
+                result = ctx.Queue()
+                p = ctx.Process(target=_proc_device_main,
+                                args=(ring.name, ring.capacity, seconds, host_buf_blocks, result))
+                p.start()
+                res = result.get()
+                p.join()
+            stop.set()
+            if mode == "process":
+                time.sleep(0.05)
+                ring.close()
+
+            lost = res["xrun"] + res["q_drop"]
+            print(f"{mode:>8} {hold:>8} {res['total']:>7} {res['xrun']:>6} {res['q_drop']:>7} "
+                  f"{lost / res['total'] * 100:>6.1f}%")
+
+
+def bench_vad(wav_path: str | None = None):
+    """
+    同一段录音（默认合成会话的近端信号，建议传入真实语音 16kHz WAV）分别走：
+      iterator : 原实现，VADIterator 逐帧调用 TorchScript 模型
+      torch/onnx × batch 1 / VAD_BATCH_FRAMES : 后端 probs() + VADSegmenter
+    报告每帧 CPU 时间（process_time）与断句事件序列是否与第一行一致。
+    缺少 torch 或 onnxruntime 时跳过对应行。
+    """
+    audio  = load_audio(wav_path) if wav_path else _synth_session()[1]
+    frames = audio[:len(audio) // VAD_CHUNK * VAD_CHUNK].reshape(-1, VAD_CHUNK)
+    n      = len(frames)
+
+    def run_iterator():
+        import torch
+        from silero_vad import load_silero_vad, VADIterator
+        it = VADIterator(load_silero_vad(), threshold=0.5, sampling_rate=SAMPLE_RATE,
+                         min_silence_duration_ms=SILENCE_MS, speech_pad_ms=80)
+        events = []
+        t0 = time.process_time()
+        for i in range(n):
+            r = it(torch.from_numpy(frames[i]), return_seconds=False)
+            if r:
+                events.append((i, next(iter(r))))
+        return events, time.process_time() - t0
+
+    def run_backend(backend, batch):
+        seg    = VADSegmenter(threshold=0.5, min_silence_ms=SILENCE_MS)
+        events = []
+        backend.reset()
+        t0 = time.process_time()
+        for s in range(0, n, batch):
+            for k, p in enumerate(backend.probs(frames[s:s + batch])):
+                e = seg.step(p)
+                if e:
+                    events.append((s + k, e))
+        return events, time.process_time() - t0
+
+    rows = [("iterator", 1, run_iterator)]
+    for cls in (TorchVAD, OnnxVAD):
+        for batch in (1, VAD_BATCH_FRAMES):
+            rows.append((cls.name, batch, lambda cls=cls, batch=batch: run_backend(cls(), batch)))
+
+    print(f"{n} 帧 ({n * VAD_CHUNK / SAMPLE_RATE:.0f}s)")
+    print(f"{'backend':>9} {'batch':>6} {'us/frame':>9} {'segments':>9} {'same':>5}")
+    ref = None
+    for name, batch, fn in rows:
+        try:
+            events, cpu = fn()
+        except ImportError as e:
+            print(f"{name:>9} {batch:>6}   跳过（{e.name} 未安装）")
+            continue
+        ref = events if ref is None else ref
+        segs = sum(1 for _, e in events if e == "start")
+        print(f"{name:>9} {batch:>6} {cpu / n * 1e6:>9.1f} {segs:>9} {str(events == ref):>5}")
+
+
+def bench_segbuf(seg_secs=(1, 5, 10, 25), repeat: int = 50):
+    """
+    说话进行到 seg_sec 秒时提交一次请求的耗时（微秒）：
+      preview : 原实现 concatenate 全段再切末尾 PREVIEW_WINDOW_SEC 秒 vs SegmentBuffer.tail
+      final   : 原实现 concatenate + 全段 RMS vs SegmentBuffer.rms + take
+    """
+    win   = int(PREVIEW_WINDOW_SEC * SAMPLE_RATE)
+    frame = (np.random.default_rng(0).standard_normal(VAD_CHUNK) * 0.1).astype(np.float32)
+
+    print(f"{'seg s':>6} {'preview list':>13} {'preview seg':>12} {'final list':>11} {'final seg':>10}")
+    for sec in seg_secs:
+        n_frames = sec * SAMPLE_RATE // VAD_CHUNK
+        buf = [frame.copy() for _ in range(n_frames)]
+        seg = SegmentBuffer()
+        for _ in range(n_frames):
+            seg.append(frame)
+
+        def preview_list():
+            audio = np.concatenate(buf)
+            return audio[-win:] if len(audio) > win else audio
+
+        def final_list():
+            audio = np.concatenate(buf)
+            return float(np.sqrt(np.mean(audio ** 2))), audio
+
+        def final_seg():
+            rms = seg.rms
+            seg._n = n_frames * VAD_CHUNK      # take() 会清空，基准里复位长度重复测量
+            return rms, seg.take()
+
+        row = []
+        for fn in (preview_list, lambda: seg.tail(win), final_list, final_seg):
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                fn()
+            row.append((time.perf_counter() - t0) / repeat * 1e6)
+        print(f"{sec:>6} {row[0]:>13.1f} {row[1]:>12.1f} {row[2]:>11.1f} {row[3]:>10.1f}")
+
+
+def bench_stream(wav_path: str | None = None, seg_sec: str = "10"):
+    """
+    真实录音按 seg_sec 秒切段，模拟说话过程：每 PREVIEW_INTERVAL_SEC 一次 preview，段末一次 final。
+      window : 原实现，preview 取末尾 PREVIEW_WINDOW_SEC 秒整段推理，final 整段推理
+      stream : SenseVoiceEngine.transcribe_stream
+    报告每秒语音的 preview / final 推理耗时（毫秒），以及两种方式 final 文本的相似度。
+    另检查没有 preview 状态时（preview 被顶替 / 调速暂停 / 由别的引擎处理）final 是否
+    仍覆盖整段：只调用一次 transcribe_stream(final=True) 的文本应与 transcribe 相同。
+    会加载 SenseVoice 模型（不打开音频设备）。
+    """
+    if not wav_path:
+        print("跳过：需要真实语音录音（bench.py stream rec.wav [seg_sec]）")
+        return
+    import difflib
+    from engine import SenseVoiceEngine
+    from subtitle import _TAG_RE
+
+    audio = load_audio(wav_path)
+    seg_n = int(float(seg_sec) * SAMPLE_RATE)
+    step  = int(PREVIEW_INTERVAL_SEC * SAMPLE_RATE)
+    win   = int(PREVIEW_WINDOW_SEC * SAMPLE_RATE)
+    dur   = len(audio) / SAMPLE_RATE
+    eng   = SenseVoiceEngine()
+    eng.transcribe(audio[:SAMPLE_RATE])                  # 预热
+
+    texts = {}
+    print(f"{len(audio) / SAMPLE_RATE:.0f}s 音频，每段 {seg_sec}s")
+    print(f"{'mode':>7} {'preview ms/s':>13} {'final ms/s':>11} {'previews':>9}")
+    for mode in ("window", "stream"):
+        t_prev = t_final = 0.0
+        n_prev = 0
+        out    = []
+        for k, s in enumerate(range(0, len(audio), seg_n)):
+            seg = audio[s:s + seg_n]
+            for e in range(step, len(seg), step):
+                t0 = time.perf_counter()
+                if mode == "window":
+                    eng.transcribe(seg[:e][-win:])
+                else:
+                    eng.transcribe_stream(k, seg[:e])
+                t_prev += time.perf_counter() - t0
+                n_prev += 1
+            t0 = time.perf_counter()
+            raw = eng.transcribe(seg) if mode == "window" else eng.transcribe_stream(k, seg, final=True)
+            t_final += time.perf_counter() - t0
+            out.append(_TAG_RE.sub("", raw).strip())
+        texts[mode] = "".join(out)
+        print(f"{mode:>7} {t_prev / dur * 1e3:>13.1f} {t_final / dur * 1e3:>11.1f} {n_prev:>9}")
+
+    ratio = difflib.SequenceMatcher(None, texts["window"], texts["stream"]).ratio()
+    print(f"final 文本相似度: {ratio:.3f}")
+
+    long = int(STREAM_MAX_WINDOW_SEC * SAMPLE_RATE)
+    segs = [seg for seg in (audio[s:s + seg_n] for s in range(0, len(audio), seg_n)) if len(seg) > long]
+    bad  = [k for k, seg in enumerate(segs)
+            if eng.transcribe_stream(("final-only", k), seg, final=True) != eng.transcribe(seg)]
+    print(f"仅 final（无 preview 状态，段长 > {STREAM_MAX_WINDOW_SEC:.0f}s）与整段推理一致: {len(segs) - len(bad)}/{len(segs)}"
+          + (f"，不一致的段: {bad}" if bad else ""))
+
+
+def bench_many(wav_path: str | None = None, n_segs: str = "48", repeat: int = 2):
+    """
+    从真实录音随机截取 n_segs 段（0.5-15s，长短混合，模拟 VAD 切出的句子），比较
+      sequential : 逐段 engine.transcribe
+      many       : engine.transcribe_many（按长度排序、补齐分批）
+    的总耗时（各 repeat 次取最小）与每秒语音耗时，列出每批统计，并检查两种方式的文本是否一致。
+    """
+    if not wav_path:
+        print("跳过：需要真实语音录音（bench.py many rec.wav [n_segs]）")
+        return
+    import difflib
+    from engine import SenseVoiceEngine
+    from subtitle import _TAG_RE
+
+    audio = load_audio(wav_path)
+    rng   = np.random.default_rng(0)
+    segs  = []
+    for _ in range(int(n_segs)):
+        n = int(rng.uniform(0.5, 15.0) * SAMPLE_RATE)
+        s = int(rng.integers(0, max(len(audio) - n, 1)))
+        segs.append(audio[s:s + n])
+    speech = sum(len(a) for a in segs) / SAMPLE_RATE
+    eng    = SenseVoiceEngine()
+    eng.transcribe(audio[:SAMPLE_RATE])                  # 预热
+
+    runs = {
+        "sequential": lambda: [eng.transcribe(a) for a in segs],
+        "many":       lambda: eng.transcribe_many(segs),
+    }
+    out, best = {}, {}
+    print(f"{len(segs)} 段 / {speech:.0f}s 语音")
+    print(f"{'mode':>11} {'total s':>8} {'ms/s':>7}")
+    for mode, fn in runs.items():
+        best[mode] = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            out[mode] = fn()
+            best[mode] = min(best[mode], time.perf_counter() - t0)
+        print(f"{mode:>11} {best[mode]:>8.2f} {best[mode] / speech * 1e3:>7.1f}")
+    print(f"加速: {best['sequential'] / best['many']:.2f}×")
+
+    print(f"\n{'batch':>5} {'n':>3} {'max s':>6} {'pad %':>6} {'ms':>7}")
+    for k, b in enumerate(eng.last_batches):
+        print(f"{k:>5} {b['n']:>3} {b['max_sec']:>6.1f} {b['pad'] * 100:>5.1f}% {b['sec'] * 1e3:>7.0f}")
+
+    strip = lambda texts: [_TAG_RE.sub("", t).strip() for t in texts]
+    a, b  = strip(out["sequential"]), strip(out["many"])
+    same  = sum(x == y for x, y in zip(a, b))
+    ratio = difflib.SequenceMatcher(None, "".join(a), "".join(b)).ratio()
+    print(f"文本完全一致 {same}/{len(a)} 段，整体相似度 {ratio:.3f}")
+
+
+def _speech_timeline(n_segs: int, rng) -> list[tuple[float, str, int]]:
+    """合成说话时间线 [(t, kind, seg)]：段长 1.5-6s（含句尾静音），段内每 PREVIEW_INTERVAL_SEC 一次 preview"""
+    events, t = [], 0.0
+    for seg in range(n_segs):
+        dur = rng.uniform(1.5, 6.0) + SILENCE_MS / 1000
+        for k in range(1, int(dur / PREVIEW_INTERVAL_SEC) + 1):
+            events.append((t + k * PREVIEW_INTERVAL_SEC, "preview", seg))
+        t += dur
+        events.append((t, "final", seg))
+        t += rng.uniform(0.3, 1.5)
+    return sorted(events, key=lambda e: e[0])
+
+
+_NO_AUDIO = np.zeros(0, dtype=np.float32)
+
+
+def _fifo_worker(q: queue.Queue, infer, shown):
+    """原 _infer_worker：单 FIFO，取到 preview 时排空队列合并，非 preview 放回队尾"""
+    while True:
+        item = q.get()
+        if item is None:
+            return
+        kind, t, seg = item
+        if kind == "preview":
+            while True:
+                try:
+                    nxt = q.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is not None and nxt[0] == "preview":
+                    _, t, seg = nxt
+                else:
+                    q.put(nxt)
+                    break
+        infer(kind, 0.0)              # FIFO 项不带音频；bench_sched 的耗时只看 kind
+        shown.append((kind, t, seg, time.perf_counter()))
+
+
+def _sched_worker(sched: InferenceScheduler, infer, shown, stop, governor=None, time_scale=1.0):
+    """
+    双通道调度器：final 优先；推理完成时过期的 preview 不显示；
+    governor 非空时上报耗时（按 time_scale 换算回未加速的时间）
+    """
+    while not stop.is_set() or sched.qsize():
+        req = sched.get(timeout=0.01)
+        if req is None:
+            continue
+        sec = len(req.audio) / SAMPLE_RATE
+        t0  = time.perf_counter()
+        infer(req.kind, sec)
+        if governor is not None:
+            governor.observe(req.kind, sec, (time.perf_counter() - t0) / time_scale,
+                             sched.final_backlog)
+        if not sched.is_stale(req):
+            shown.append((req.kind, req.t, req.seg, time.perf_counter()))
+        sched.task_done()
+
+
+def bench_sched(preview_ms=(150, 300, 600), final_ms: float = 200.0,
+                n_segs: int = 20, time_scale: float = 0.05):
+    """
+    合成说话时间线按 time_scale 加速回放，推理用 sleep 模拟（preview 固定 preview_ms，final 固定 final_ms），
+    对比原单 FIFO 队列与 InferenceScheduler：
+      final p50 / p95 / max : 句尾（final 提交）→ final 显示的延迟（换算回实际毫秒）
+      reorder               : final 显示顺序与段顺序不一致的次数
+      stale prev            : 某段 final 显示之后又显示了该段（或更早段）preview 的次数
+    """
+    timeline = _speech_timeline(n_segs, np.random.default_rng(0))
+
+    print(f"{'preview ms':>10} {'mode':>6} {'final p50':>10} {'p95':>8} {'max':>8} "
+          f"{'reorder':>8} {'stale prev':>11}")
+    for p_ms in preview_ms:
+        cost = {"preview": p_ms / 1000 * time_scale, "final": final_ms / 1000 * time_scale}
+
+        def infer(kind, sec):
+            time.sleep(cost[kind])
+
+        for mode in ("fifo", "sched"):
+            shown = []
+            if mode == "fifo":
+                q = queue.Queue()
+                worker = threading.Thread(target=_fifo_worker, args=(q, infer, shown))
+                submit = lambda kind, t, seg: q.put((kind, t, seg))
+            else:
+                sched, stop = InferenceScheduler(), threading.Event()
+                gen    = sched.new_generation()
+                worker = threading.Thread(target=_sched_worker, args=(sched, infer, shown, stop))
+                submit = lambda kind, t, seg: sched.submit(InferRequest(kind, _NO_AUDIO, gen, seg, t))
+            worker.start()
+
+            t0 = time.perf_counter()
+            for at, kind, seg in timeline:
+                delay = t0 + at * time_scale - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                submit(kind, time.perf_counter(), seg)
+
+            if mode == "fifo":
+                q.put(None)
+            else:
+                stop.set()
+            worker.join()
+
+            lat, order, stale, done = [], [], 0, -1
+            for kind, t, seg, t_shown in shown:
+                if kind == "final":
+                    lat.append((t_shown - t) / time_scale * 1e3)
+                    order.append(seg)
+                    done = max(done, seg)
+                elif seg <= done:
+                    stale += 1
+            reorder = sum(a > b for a, b in zip(order, order[1:]))
+            p50, p95 = np.percentile(lat, (50, 95))
+            print(f"{p_ms:>10} {mode:>6} {p50:>10.0f} {p95:>8.0f} {max(lat):>8.0f} "
+                  f"{reorder:>8} {stale:>11}")
+
+
+def bench_governor(rtfs=(0.05, 0.15, 0.3), n_segs: int = 10, time_scale: float = 0.1):
+    """
+    模拟不同速度的 CPU：推理耗时 = rtf × 音频秒数（preview 为窗口长度，final 为整段）。
+    合成说话（段长 2-8s）按 time_scale 加速回放，VAD 侧按调速器的间隔 / 窗口提交 preview：
+      off : 固定 GOV_LEVELS[0]（原静态配置）
+      on  : PreviewGovernor
+    报告 final 延迟（句尾 → 显示，实际毫秒）、preview 完成数与平均刷新间隔、结束时档位 / 换级次数。
+    """
+    rng   = np.random.default_rng(1)
+    segs  = [(rng.uniform(2.0, 8.0) + SILENCE_MS / 1000, rng.uniform(0.5, 1.5)) for _ in range(n_segs)]
+    frame = VAD_CHUNK / SAMPLE_RATE
+
+    print(f"{'rtf':>5} {'gov':>4} {'final p50':>10} {'p95':>7} {'previews':>9} "
+          f"{'refresh s':>10} {'level':>6} {'changes':>8}")
+    for rtf in rtfs:
+        def infer(kind, sec):
+            time.sleep(rtf * sec * time_scale)
+
+        for on in (False, True):
+            gov   = PreviewGovernor(windowed=True, hold_sec=GOV_HOLD_SEC * time_scale,
+                                    probe_sec=GOV_PROBE_SEC * time_scale)
+            sched = InferenceScheduler()
+            stop  = threading.Event()
+            gen   = sched.new_generation()
+            shown = []
+            worker = threading.Thread(target=_sched_worker,
+                                      args=(sched, infer, shown, stop, gov if on else None, time_scale))
+            worker.start()
+
+            t0, clock = time.perf_counter(), 0.0
+            for k, (dur, gap) in enumerate(segs):
+                last = 0.0
+                for i in range(1, int(dur / frame) + 1):
+                    t = i * frame
+                    delay = t0 + (clock + t) * time_scale - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    if not gov.suspended and t - last >= gov.interval:
+                        n = int(min(t, gov.window) * SAMPLE_RATE)
+                        sched.submit(InferRequest("preview", np.zeros(n, dtype=np.float32),
+                                                  gen, k, time.perf_counter()))
+                        last = t
+                sched.submit(InferRequest("final", np.zeros(int(dur * SAMPLE_RATE), dtype=np.float32),
+                                          gen, k, time.perf_counter()))
+                clock += dur + gap
+            stop.set()
+            worker.join()
+
+            lat  = [(ts - t) / time_scale * 1e3 for kind, t, _, ts in shown if kind == "final"]
+            prev = [ts for kind, _, _, ts in shown if kind == "preview"]
+            gaps = np.diff(prev) / time_scale if len(prev) > 1 else [0.0]
+            p50, p95 = np.percentile(lat, (50, 95))
+            print(f"{rtf:>5} {'on' if on else 'off':>4} {p50:>10.0f} {p95:>7.0f} {len(prev):>9} "
+                  f"{np.median(gaps):>10.2f} {gov.level:>6} {gov.changes:>8}")
+
+
+class _CpuEngine:
+    """模拟引擎：按音频时长做固定量的 numpy 计算（释放 GIL，单线程），返回 "<|zh|>段号" """
+
+    _N = 1 << 16
+
+    def __init__(self, rtf: float = 0.1):
+        self._x = np.random.default_rng(0).standard_normal(self._N).astype(np.float32)
+        self._y = np.empty_like(self._x)
+        t0, n = time.perf_counter(), 200
+        for _ in range(n):
+            np.exp(self._x, out=self._y)
+        self._per_sec = rtf * n / (time.perf_counter() - t0)    # 每秒音频的迭代次数
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        for _ in range(int(len(audio) / SAMPLE_RATE * self._per_sec)):
+            np.exp(self._x, out=self._y)
+        return f"<|zh|>{int(audio[0])}"
+
+
+def bench_pool(wav_path: str | None = None, max_workers: str = "4", n_sents: int = 16):
+    """
+    快节奏对话：短句（1-2.5s）接连出现、句间 0.2-0.6s，final 直接提交到 RealtimeSubtitle 的调度器：
+      burst    : 全部 final 一次提交，吞吐 = 语音秒数 / 处理完所需秒数
+      realtime : 按时间线实时提交，句尾 → final 显示延迟 p50 / p95 / p99
+      ordered  : on_final 回调顺序是否与说话顺序一致
+    每段音频首个采样写入段号，模拟引擎据此返回文本以检查顺序。
+    """
+    from subtitle import RealtimeSubtitle
+    if wav_path:
+        from engine import SenseVoiceEngine
+        factory, rec = SenseVoiceEngine, load_audio(wav_path)
+    else:
+        factory, rec = _CpuEngine, None
+
+    rng   = np.random.default_rng(2)
+    sents = [(rng.uniform(1.0, 2.5), rng.uniform(0.2, 0.6)) for _ in range(n_sents)]
+    clips = []
+    for k, (dur, _) in enumerate(sents):
+        n = int(dur * SAMPLE_RATE)
+        a = rec[k * n % max(len(rec) - n, 1):][:n].copy() if rec is not None else np.zeros(n, np.float32)
+        if rec is None:
+            a[0] = k
+        clips.append(a)
+    speech = sum(d for d, _ in sents)
+
+    print(f"{speech:.0f}s 语音 / {n_sents} 句（{'SenseVoice' if wav_path else '模拟引擎 rtf 0.1'}）")
+    print(f"{'N':>3} {'burst x':>8} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'ordered':>8}")
+    engines = [factory() for _ in range(int(max_workers))]     # 预先加载，不计入测量
+    for n in range(1, int(max_workers) + 1):
+        extra = iter(engines[1:n])
+        st    = RealtimeSubtitle(engines[0], workers=n, engine_factory=lambda it=extra: next(it))
+        st._streaming = False
+        out   = []
+        st.on_final = out.append
+        time.sleep(0.2)                                   # 等推理线程启动
+
+        def submit(k):
+            t = time.time()
+            st._sched.submit(InferRequest("final", clips[k], st._gen, k, t, ts={"vad": t}))
+
+        t0 = time.perf_counter()
+        for k in range(n_sents):
+            submit(k)
+        st.wait_idle()
+        burst = speech / (time.perf_counter() - t0)
+
+        st._gen = st._sched.new_generation()
+        st._reset_delivery()
+        st.tracer.reset()
+        out.clear()
+        t0 = time.perf_counter()
+        clock = 0.0
+        for k, (dur, gap) in enumerate(sents):
+            clock += dur
+            delay = t0 + clock - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            submit(k)
+            clock += gap
+        st.wait_idle()
+        p = st.tracer.summary()["final"]["end_to_display"]
+        ordered = not wav_path and out == [str(k) for k in range(n_sents)]
+        print(f"{n:>3} {burst:>8.1f} {p['p50']:>7.0f} {p['p95']:>7.0f} {p['p99']:>7.0f} "
+              f"{str(ordered) if not wav_path else '-':>8}")
+
+
+class _GilEngine:
+    """
+    模拟引擎：每秒音频耗时约 cost_ms 毫秒，其间按 chunk_ms 一段在 C 层整段持有 GIL（sorted），
+    段与段之间才让出 GIL —— 近似 model.generate 里长时间不释放 GIL 的 Python / 算子调用
+    """
+
+    cost_ms  = 60.0
+    chunk_ms = 50.0
+
+    def __init__(self):
+        data = list(np.random.default_rng(0).random(100_000))
+        t0 = time.perf_counter()
+        sorted(data)
+        per = (time.perf_counter() - t0) * 1e3
+        self._data = data * max(1, int(round(self.chunk_ms / per)))
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        for _ in range(max(1, int(len(audio) / SAMPLE_RATE * self.cost_ms / self.chunk_ms))):
+            sorted(self._data)
+        return "<|zh|>"
+
+    def transcribe_stream(self, seg, audio: np.ndarray, final: bool = False) -> str:
+        return self.transcribe(audio[-int(PREVIEW_WINDOW_SEC * SAMPLE_RATE):])
+
+    def reset(self):
+        pass
+
+
+def bench_engine_proc(seconds: float = 8.0, host_buf_blocks: int = 3):
+    """
+    持续说话：推理线程每 PREVIEW_INTERVAL_SEC 对 PREVIEW_WINDOW_SEC 秒音频做一次 preview，
+    每 3s 一次 final（_GilEngine，推理期间持有 GIL）。同时在主进程里测量：
+      frame late : 模拟 Tk 100ms 刷新定时器的迟到（p95 / max，毫秒）
+      drop       : 模拟声卡回调 → audio_q(maxsize=300) 的 xrun + 队列丢弃
+    thread  : 引擎在主进程推理线程（原实现）
+    process : EngineProcess（模型在子进程，主进程只等 Pipe）
+    """
+    from engine_proc import EngineProcess
+
+    preview = np.zeros(int(PREVIEW_WINDOW_SEC * SAMPLE_RATE), dtype=np.float32)
+    final   = np.zeros(3 * SAMPLE_RATE, dtype=np.float32)
+
+    def infer_loop(engine, stop):
+        k = 0
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            engine.transcribe(final if k % 6 == 5 else preview)
+            k += 1
+            time.sleep(max(0.0, PREVIEW_INTERVAL_SEC - (time.perf_counter() - t0)))
+
+    def frame_loop(late, stop):
+        t_next = time.perf_counter() + 0.1
+        while not stop.is_set():
+            time.sleep(max(0.0, t_next - time.perf_counter()))
+            late.append((time.perf_counter() - t_next) * 1e3)
+            t_next += 0.1
+
+    print(f"{'mode':>8} {'frames':>7} {'late p95':>9} {'late max':>9} {'blocks':>7} {'drop':>5}")
+    for mode in ("thread", "process"):
+        engine = _GilEngine() if mode == "thread" else EngineProcess(factory="bench:_GilEngine")
+        q, late, stop = queue.Queue(maxsize=300), [], threading.Event()
+
+        def consume():
+            while not stop.is_set():
+                try:
+                    q.get(timeout=0.05)
+                except queue.Empty:
+                    pass
+
+        for target, args in ((infer_loop, (engine, stop)), (frame_loop, (late, stop)), (consume, ())):
+            threading.Thread(target=target, args=args, daemon=True).start()
+        res = _emulated_device(q.put_nowait, seconds, host_buf_blocks)
+        stop.set()
+        time.sleep(0.2)
+        if mode == "process":
+            engine.close()
+
+        p95 = np.percentile(late, 95)
+        print(f"{mode:>8} {len(late):>7} {p95:>9.1f} {max(late):>9.1f} {res['total']:>7} "
+              f"{res['xrun'] + res['q_drop']:>5}")
+
+
+class _EnergyVAD:
+    """VAD 替身：按帧能量给出 0 / 0.9 的"语音概率"（合成会话，不加载 Silero）"""
+
+    name = "energy"
+
+    def probs(self, frames: np.ndarray) -> np.ndarray:
+        return (np.sqrt((frames ** 2).mean(axis=1)) > 0.02).astype(np.float32) * 0.9
+
+    def reset(self):
+        pass
+
+
+class _BatchCpuEngine(_CpuEngine):
+    """
+    模拟引擎的批量版本：每次调用固定 call_ms（model.generate 的 Python / 前端 / 调度开销）
+    + 按补齐后的音频时长计算。只模拟了调用开销的摊薄，没有模拟批内矩阵运算效率的提升。
+    """
+
+    call_ms = 25.0
+
+    def __init__(self, rtf: float = 0.02):
+        super().__init__(rtf)
+        self._per_call = int(self.call_ms / 1000 * self._per_sec / rtf)
+
+    def _work(self, n_samples: int):
+        for _ in range(self._per_call + int(n_samples / SAMPLE_RATE * self._per_sec)):
+            np.exp(self._x, out=self._y)
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        self._work(len(audio))
+        return "<|zh|>x"
+
+    def transcribe_batch(self, audios: list[np.ndarray]) -> list[str]:
+        self._work(max(len(a) for a in audios) * len(audios))
+        return ["<|zh|>x"] * len(audios)
+
+
+def _synth_talk(seconds: float, seed: int) -> np.ndarray:
+    """合成对话：1-4s 的"语音"（带噪正弦）与 0.8-2s 静音交替"""
+    rng, out, n = np.random.default_rng(seed), [], 0
+    while n < seconds * SAMPLE_RATE:
+        talk = int(rng.uniform(1.0, 4.0) * SAMPLE_RATE)
+        gap  = int(rng.uniform(0.8, 2.0) * SAMPLE_RATE)
+        t    = np.arange(talk) / SAMPLE_RATE
+        out += [(0.2 * np.sin(2 * np.pi * rng.uniform(120, 250) * t)
+                 + 0.05 * rng.standard_normal(talk)).astype(np.float32),
+                np.zeros(gap, dtype=np.float32)]
+        n   += talk + gap
+    return np.concatenate(out)
+
+
+def bench_server(max_sessions: str = "16", wav_path: str | None = None, seconds: float = 12.0):
+    """
+    N 个客户端同时按实时节奏（每 100ms 一块）推流到本机 SubtitleServer，合批开（默认参数）/
+    关（每批 1 条）各跑一次：
+      batch  : 平均批大小        busy : 推理线程占用率
+      final  : 句尾判定 → 客户端收到 final 的延迟 p50 / p95（毫秒）
+      part/s : 每个会话每秒收到的 partial 数（preview 被合并 / 作废后实际送达的刷新率）
+    """
+    import server
+
+    if wav_path:
+        from engine import SenseVoiceEngine
+        from vad import make_vad_backend
+        engine, vad_factory, rec = SenseVoiceEngine(), make_vad_backend, load_audio(wav_path)
+    else:
+        engine, vad_factory, rec = _BatchCpuEngine(), _EnergyVAD, None
+    block = SAMPLE_RATE // 10
+
+    def client(k, lat, parts):
+        audio = rec[k * SAMPLE_RATE:][:int(seconds * SAMPLE_RATE)] if rec is not None \
+            else _synth_talk(seconds, k)
+        sent  = []                    # 第 i 块的发送时刻
+
+        def on_message(msg):
+            if msg["type"] == "partial":
+                parts.append(1)
+            else:                     # 句尾位置所在块发出 → 收到
+                i = min(int(np.ceil(msg["end"] * SAMPLE_RATE / block)) - 1, len(sent) - 1)
+                lat.append(time.perf_counter() - sent[i])
+
+        c  = server.SubtitleClient(*srv.server_address[:2], on_message=on_message)
+        t0 = time.perf_counter()
+        for i in range(0, len(audio), block):
+            time.sleep(max(0.0, t0 + i / SAMPLE_RATE - time.perf_counter()))
+            sent.append(time.perf_counter())
+            c.send(audio[i:i + block])
+        c.finish(timeout=60)
+
+    print(f"{'engine: SenseVoice' if wav_path else f'模拟引擎 call {_BatchCpuEngine.call_ms:.0f}ms + rtf 0.02'}，"
+          f"每会话 {seconds:.0f}s")
+    print(f"{'N':>3} {'batch':>6} {'mean':>6} {'max':>4} {'busy':>6} {'final p50':>10} {'p95':>7} {'part/s':>7}")
+    n = 1
+    while n <= int(max_sessions):
+        for on in (False, True):
+            kw  = {} if on else {"wait_ms": 0, "max_items": 1}
+            srv = server.SubtitleServer(engine, port=0, vad_factory=vad_factory, **kw)
+            threading.Thread(target=srv.serve_forever, daemon=True).start()
+            lat, parts = [], []
+            threads = [threading.Thread(target=client, args=(k, lat, parts)) for k in range(n)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            st = srv.stats()
+            srv.shutdown()
+            srv.server_close()
+            p50, p95 = np.percentile(lat, (50, 95)) * 1e3 if lat else (0.0, 0.0)
+            print(f"{n:>3} {'on' if on else 'off':>6} {st['mean_batch']:>6.2f} {st['max_batch']:>4} "
+                  f"{st['busy'] * 100:>5.0f}% {p50:>10.0f} {p95:>7.0f} {len(parts) / (n * seconds):>7.2f}")
+        n *= 2
+
+
+def bench_tracing(seconds: str = "30", repeat: int = 2):
+    """
+    events   : 关闭时 complete()、开启时 complete() / span() 每个事件的耗时（纳秒）
+    pipeline : RealtimeSubtitle 按实时节奏回放合成会话（带参考信号，经 AEC），_CpuEngine 推理，
+               off / on 交替各 repeat 次取最小，比较整个进程的 CPU 时间（所有线程）
+    """
+    import os
+    import tempfile
+    from scipy.io import wavfile
+    from subtitle import RealtimeSubtitle
+    from tracing import SpanTracer, tracer
+
+    def span():
+        with tr.span("infer:final", seg=1):
+            pass
+
+    n  = 200_000
+    tr = SpanTracer(capacity=n)
+    print(f"{'event':>16} {'ns':>7}")
+    for label, on, fn in (("complete (off)", False, lambda: tr.complete("vad", 0.0)),
+                          ("complete (on)",  True,  lambda: tr.complete("vad", 0.0)),
+                          ("span (on)",      True,  span)):
+        tr.enable() if on else tr.disable()
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        print(f"{label:>16} {(time.perf_counter() - t0) / n * 1e9:>7.0f}")
+
+    seconds   = float(seconds)
+    ref, mic  = _synth_session(seconds)
+    tmp       = tempfile.mkdtemp()
+    mic_path, ref_path = os.path.join(tmp, "mic.wav"), os.path.join(tmp, "ref.wav")
+    wavfile.write(mic_path, SAMPLE_RATE, mic)
+    wavfile.write(ref_path, SAMPLE_RATE, ref)
+
+    st = RealtimeSubtitle(_CpuEngine())
+    st._streaming = False
+    cpu = {False: [], True: []}
+    for on in (False, True) * repeat:
+        tracer.enable() if on else tracer.disable()
+        c0 = time.process_time()
+        st.start_stream(None, mode="file", file_path=mic_path, ref_path=ref_path)
+        st.wait_file_done()
+        st.wait_idle()
+        st.stop_stream()
+        cpu[on].append(time.process_time() - c0)
+        events = tracer.stats()["events"] if on else 0
+    tracer.disable()
+
+    off, on = min(cpu[False]), min(cpu[True])
+    wall    = seconds + 2 * SILENCE_MS / 1000
+    print(f"\n{seconds:.0f}s 实时回放（AEC + VAD + 推理），进程 CPU：")
+    print(f"{'trace':>6} {'cpu s':>7} {'cpu %':>6}")
+    for label, c in (("off", off), ("on", on)):
+        print(f"{label:>6} {c:>7.2f} {c / wall * 100:>5.1f}%")
+    print(f"事件 {events}（{events / wall:.0f}/s），开销 {(on - off) / off * 100:+.1f}% "
+          f"（占单核 {(on - off) / wall * 100:.2f}%）")
+
+
+def _synth_idle(minutes: float, speech: np.ndarray | None, seed: int = 0) -> np.ndarray:
+    """
+    待机场景：约 -60 dBFS 的底噪（带慢速起伏），每 20-90s 出现一段 1-4s 说话（或给定录音）；
+    偶尔夹一声短促的敲击（不是语音，考验误唤醒）
+    """
+    rng = np.random.default_rng(seed)
+    n   = int(minutes * 60 * SAMPLE_RATE)
+    t   = np.arange(n) / SAMPLE_RATE
+    out = (rng.standard_normal(n) * 1e-3 * (1 + 0.3 * np.sin(2 * np.pi * t / 17))).astype(np.float32)
+    pos = int(rng.uniform(5, 20) * SAMPLE_RATE)
+    while pos < n:
+        if speech is not None:
+            clip = speech
+        else:
+            k    = int(rng.uniform(1.0, 4.0) * SAMPLE_RATE)
+            tt   = np.arange(k) / SAMPLE_RATE
+            clip = (0.2 * np.sin(2 * np.pi * rng.uniform(120, 250) * tt)
+                    * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * tt))).astype(np.float32)
+        clip = clip[:n - pos]
+        out[pos:pos + len(clip)] += clip
+        if rng.random() < 0.5:                          # 敲击：20ms 衰减噪声
+            at = min(n - 320, pos + len(clip) + int(rng.uniform(3, 10) * SAMPLE_RATE))
+            out[at:at + 320] += rng.standard_normal(320).astype(np.float32) * 0.1 \
+                                * np.exp(-np.arange(320) / 60.0)
+        pos += len(clip) + int(rng.uniform(20, 90) * SAMPLE_RATE)
+    return out
+
+
+def bench_idle(minutes: str = "10", wav_path: str | None = None):
+    """
+    按 subtitle._vad_loop 的方式每 VAD_BATCH_FRAMES 帧打分一次，对比 VAD_GATE 关 / 开：
+      cpu %     : VAD（含门控本身）占单核的比例 = CPU 时间 / 音频时长
+      skipped   : 未交给 Silero 的帧比例
+      starts    : 检测到的语音段数；与不开门控相比：丢失 / 推迟的起点，以及多出的起点
+                  （开门控才有的起点 = 误触发，每个都会变成一次对非语音的 final 推理）
+    """
+    speech = load_audio(wav_path) if wav_path else None
+    audio  = _synth_idle(float(minutes), speech)
+    n      = len(audio) // VAD_CHUNK
+    frames = audio[:n * VAD_CHUNK].reshape(n, VAD_CHUNK)
+    vad    = make_vad_backend()
+
+    def run(gated: bool):
+        gate   = EnergyGate() if gated else None
+        seg    = VADSegmenter(threshold=0.5, min_silence_ms=SILENCE_MS)
+        starts = []
+        vad.reset()
+        t0 = time.process_time()
+        for b in range(0, n, VAD_BATCH_FRAMES):
+            batch = frames[b:b + VAD_BATCH_FRAMES]
+            first = b
+            if gate is not None:
+                out = gate.process(batch, seg.triggered)
+                if out is None:
+                    continue
+                if out.warmup is not None:
+                    vad.probs(out.warmup)
+                first -= out.replay
+                batch  = out.frames
+            for i, p in enumerate(vad.probs(batch), first):
+                if seg.step(p) == "start":
+                    starts.append(i)
+        return starts, time.process_time() - t0, gate
+
+    ref, cpu_off, _ = run(False)
+    got, cpu_on, gate = run(True)
+    wall  = n * VAD_CHUNK / SAMPLE_RATE
+    # 每个基准起点在 ±1s 内找开门控的起点：找不到为丢失，晚于基准为推迟；反过来找不到为多出
+    tol   = SAMPLE_RATE // VAD_CHUNK
+    late  = [min((g - r for g in got if abs(g - r) <= tol), key=abs, default=None) for r in ref]
+    missed = sum(d is None for d in late)
+    delays = [d for d in late if d is not None and d > 0]
+    extra  = [g for g in got if all(abs(g - r) > tol for r in ref)]
+
+    print(f"{vad.name} VAD，{wall / 60:.0f} 分钟 {n} 帧，批 {VAD_BATCH_FRAMES} 帧")
+    print(f"{'gate':>5} {'cpu s':>7} {'cpu %':>7} {'skipped':>8} {'wakeups':>8} {'starts':>7}")
+    print(f"{'off':>5} {cpu_off:>7.2f} {cpu_off / wall * 100:>6.2f}% {'-':>8} {'-':>8} {len(ref):>7}")
+    st = gate.stats()
+    print(f"{'on':>5} {cpu_on:>7.2f} {cpu_on / wall * 100:>6.2f}% {st['skipped'] / n:>7.1%} "
+          f"{st['wakeups']:>8} {len(got):>7}")
+    print(f"起点丢失 {missed}/{len(ref)}，推迟 {len(delays)} 个"
+          + (f"（最多 {max(delays) * VAD_CHUNK / SAMPLE_RATE * 1000:.0f}ms）" if delays else "")
+          + f"，多出 {len(extra)} 个"
+          + (f"（{', '.join(f'{g * VAD_CHUNK / SAMPLE_RATE:.1f}s' for g in extra)}）" if extra else ""))
+
+
+# 子进程里执行：按参数改 config 后跑 main.py --file，最后一行输出启动时间线
+_STARTUP_CHILD = """
+import sys, json, config
+config.WARMUP = {warmup}
+sys.argv = ["main.py", "--file", {path!r}, "--speed", "0"]
+import main
+main.main()
+from startup import timeline
+print("STARTUP " + json.dumps(timeline.summary()), flush=True)
+"""
+
+
+def _run_startup(path: str, **cfg) -> tuple[dict, float]:
+    """新进程跑一次 --file 回放，返回 (timeline.summary(), 进程总耗时秒)"""
+    import os
+    import json
+    import tempfile
+    import subprocess
+    here = os.path.dirname(os.path.abspath(__file__))
+    env  = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [here, os.environ.get("PYTHONPATH")])))
+    t0   = time.perf_counter()
+    out  = subprocess.run([sys.executable, "-c", _STARTUP_CHILD.format(path=os.path.abspath(path), **cfg)],
+                          cwd=tempfile.mkdtemp(), env=env, capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - t0
+    line = next(l for l in reversed(out.stdout.splitlines()) if l.startswith("STARTUP "))
+    return json.loads(line[len("STARTUP "):]), wall
+
+
+def _startup_row(label: str, runs: list[tuple[dict, float]]) -> str:
+    def med(fn):
+        vals = [fn(s) for s, _ in runs]
+        vals = [v for v in vals if v is not None]
+        return f"{np.median(vals):>8.2f}" if vals else f"{'-':>8}"
+    dur = lambda k: lambda s: s[k]["end"] - s[k]["start"] if k in s else None
+    return (f"{label:>12} {len(runs):>4}" + med(lambda s: s["imports"]["end"]) + med(dur("vad"))
+            + med(dur("engine_import")) + med(dur("model")) + med(dur("warmup"))
+            + med(lambda s: s["ready"]["end"]) + med(lambda s: s.get("first_subtitle_after_start"))
+            + med(lambda s: s.get("time_to_first_subtitle")) + f"{np.median([w for _, w in runs]):>8.2f}")
+
+
+_STARTUP_HEAD = (f"{'':>12} {'runs':>4}{'imports':>8}{'vad':>8}{'torch':>8}{'model':>8}{'warmup':>8}"
+                 f"{'ready':>8}{'1st sub':>8}{'ttfs':>8}{'wall':>8}")
+
+
+def bench_startup(wav_path: str, runs: str = "3"):
+    """
+    每次新开进程跑 main.py --file rec.wav --speed 0（时间线零点为 main.py 入口，不含解释器启动），
+    预热关 / 开交替各 runs 次，列出各阶段中位数（秒）：
+      1st sub : 开始识别 → 第一条字幕（预热的收益在这里：首次推理不再付 JIT / 分配开销）
+      ttfs    : 入口 → 第一条字幕（time to first subtitle）
+      wall    : 进程从启动到退出（含整个文件的回放）
+    第一次运行可能含冷磁盘缓存，单独列为 first。
+    """
+    first = _run_startup(wav_path, warmup=False)
+    rows  = {False: [], True: []}
+    for _ in range(int(runs)):
+        for on in (False, True):
+            rows[on].append(_run_startup(wav_path, warmup=on))
+    print(_STARTUP_HEAD)
+    print(_startup_row("first", [first]))
+    print(_startup_row("warmup off", rows[False]))
+    print(_startup_row("warmup on", rows[True]))
+
+
+# 子进程：加载引擎并推理一次，输出各段耗时；之后等 stdin 关闭再退出（父进程在此期间读内存占用）
+_SNAPSHOT_CHILD = """
+import sys, json, time
+t0 = time.perf_counter()
+import numpy as np
+from engine import SenseVoiceEngine
+t1 = time.perf_counter()
+engine = SenseVoiceEngine(snapshot={snapshot!r})
+t2 = time.perf_counter()
+engine.transcribe(np.zeros(16000, dtype=np.float32))
+t3 = time.perf_counter()
+print("ENGINE " + json.dumps({{"import": t1 - t0, "load": t2 - t1, "first": t3 - t2,
+                               "source": engine.source,
+                               "model_path": engine.model.kwargs.get("model_path")}}), flush=True)
+sys.stdin.read()
+"""
+
+
+def _spawn_engine(snapshot: str | None):
+    """新进程加载引擎，返回 (Popen, 耗时字典)；进程保持存活直到关闭其 stdin"""
+    import os
+    import json
+    import tempfile
+    import subprocess
+    here = os.path.dirname(os.path.abspath(__file__))
+    env  = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [here, os.environ.get("PYTHONPATH")])))
+    proc = subprocess.Popen([sys.executable, "-c", _SNAPSHOT_CHILD.format(snapshot=snapshot)],
+                            cwd=tempfile.mkdtemp(), env=env, text=True,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    for line in proc.stdout:
+        if line.startswith("ENGINE "):
+            return proc, json.loads(line[len("ENGINE "):])
+    proc.wait()
+    raise RuntimeError(f"引擎子进程失败 (exitcode={proc.returncode})")
+
+
+def _close_engine(proc):
+    proc.stdin.close()
+    proc.wait()
+
+
+def _mem_mb(pid: int) -> tuple[float, float]:
+    """(RSS, PSS) MB：PSS 把共享页按共享进程数均摊，进程间共享越多越小于 RSS（仅 Linux）"""
+    out = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                out[key] = int(rest.split()[0]) / 1024
+    return out["Rss"], out["Pss"]
+
+
+def _evict(paths: list[str]) -> bool:
+    """把文件逐出页缓存（posix_fadvise DONTNEED，不需要 root；不支持的平台返回 False）"""
+    import os
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+def bench_snapshot(runs: str = "3", snapshot_dir: str | None = None):
+    """
+    每次新开进程创建 SenseVoiceEngine 并推理 1s 静音，对比原路径（AutoModel 解析 ModelScope 缓存、
+    建图、torch.load 读入权重）与模型快照（跳过缓存解析与随机初始化，权重 mmap）：
+      cold / warm : 加载前把权重文件逐出页缓存 / 不处理（上一次运行后仍在缓存里）
+      import      : 导入 engine（torch / funasr）   load : 创建引擎   first : 第一次推理
+    最后两个进程同时持有引擎，读 RSS / PSS：快照的权重页由两个进程共享，PSS 明显小于 RSS。
+    snapshot_dir 不给时写到临时目录，结束后删除。
+    """
+    import os
+    import shutil
+    import tempfile
+    tmp  = None if snapshot_dir else tempfile.mkdtemp()
+    snap = snapshot_dir or os.path.join(tmp, "sensevoice")
+    try:
+        proc, first = _spawn_engine(snap)
+        _close_engine(proc)
+        weights = {"hub":      [os.path.join(first["model_path"], "model.pt")],
+                   "snapshot": [os.path.join(snap, "weights.pt")]}
+        print(f"首次（原路径加载 + 写快照）: 加载 {first['load']:.2f}s  →  {snap}")
+
+        print(f"{'path':>9} {'cache':>6} {'runs':>5} {'import':>7} {'load':>7} {'first':>7}")
+        for name, arg in (("hub", None), ("snapshot", snap)):
+            for cache in ("cold", "warm"):
+                if cache == "cold" and not _evict(weights[name]):
+                    print(f"{name:>9} {cache:>6}   跳过（本平台无法逐出页缓存）")
+                    continue
+                rows = []
+                for _ in range(int(runs)):
+                    if cache == "cold":
+                        _evict(weights[name])
+                    proc, r = _spawn_engine(arg)
+                    _close_engine(proc)
+                    if r["source"] != name:
+                        print(f"  注意：期望 {name}，实际走了 {r['source']}")
+                    rows.append(r)
+                med = {k: np.median([r[k] for r in rows]) for k in ("import", "load", "first")}
+                print(f"{name:>9} {cache:>6} {len(rows):>5} {med['import']:>7.2f} "
+                      f"{med['load']:>7.2f} {med['first']:>7.2f}")
+
+        if not os.path.exists("/proc/self/smaps_rollup"):
+            return
+        print(f"{'path':>9} {'procs':>6} {'RSS MB':>8} {'PSS MB':>8}   （每进程）")
+        for name, arg in (("hub", None), ("snapshot", snap)):
+            procs = [_spawn_engine(arg)[0] for _ in range(2)]
+            mem   = [_mem_mb(p.pid) for p in procs]
+            for p in procs:
+                _close_engine(p)
+            print(f"{name:>9} {len(procs):>6} {np.mean([m[0] for m in mem]):>8.0f} "
+                  f"{np.mean([m[1] for m in mem]):>8.0f}")
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+BENCHES = {
+    "aec": bench_aec,
+    "mdf": bench_mdf,
+    "ring": bench_ring,
+    "resample": bench_resample,
+    "drift": bench_drift,
+    "gate": bench_gate,
+    "proc": bench_proc,
+    "vad": bench_vad,
+    "segbuf": bench_segbuf,
+    "stream": bench_stream,
+    "many": bench_many,
+    "sched": bench_sched,
+    "governor": bench_governor,
+    "pool": bench_pool,
+    "engine_proc": bench_engine_proc,
+    "server": bench_server,
+    "tracing": bench_tracing,
+    "idle": bench_idle,
+    "startup": bench_startup,
+    "snapshot": bench_snapshot,
+}
+
+
+if __name__ == "__main__":
+    # bench.py [name [args...]]：指定名称时其余参数传给该基准；不带参数时全部运行
+    if len(sys.argv) > 1:
+        name, args = sys.argv[1], sys.argv[2:]
+        if name not in BENCHES:
+            sys.exit(f"未知基准: {name}（可选: {', '.join(BENCHES)}）")
+        print(f"── {name} ──")
+        BENCHES[name](*args)
+    else:
+        for name, fn in BENCHES.items():
+            print(f"── {name} ──")
+            fn()
@@ -3,20 +3,39 @@
 
 import queue
 import threading
+import time
 import logging
+from collections import defaultdict
 from math import gcd
 
 import numpy as np
-import sounddevice as sd
+
+try:
+    import sounddevice as sd
+except OSError:   # Linux 无 PortAudio（如 CI）：只能用文件回放
+    sd = None
 
 from config import (
     SAMPLE_RATE,
     VAD_CHUNK,
+    SILENCE_MS,
     LOOPBACK_SAMPLE_RATE,
     LOOPBACK_BLOCKSIZE,
     AEC_FILTER_BLOCKS,
     AEC_MU,
+    AEC_MDF_MU,
+    AEC_ENGINE,
+    AEC_GATE,
+    AEC_REF_SILENCE_RMS,
+    AEC_DTD_GEIGEL,
+    DSP_RING_BLOCKS,
+    CAPTURE_STATS_INTERVAL_SEC,
+    ALIGN_MAX_WAIT_MS,
 )
+from ringbuf import RingBuffer
+from metrics import LatencyWindow
+from tracing import tracer
+from align import DriftAligner
 
 log = logging.getLogger("subtitle")
 
@@ -25,6 +44,9 @@ log = logging.getLogger("subtitle")
 
 def list_input_devices() -> list[tuple[int, str]]:
     """用 sounddevice 列出输入设备（麦克风、WoMic 等）"""
+    if sd is None:
+        log.warning("sounddevice 不可用（未找到 PortAudio），无法枚举输入设备")
+        return []
     devs = sd.query_devices()
     return [(i, d["name"]) for i, d in enumerate(devs) if d["max_input_channels"] > 0]
 
@@ -52,6 +74,35 @@ def _pad_or_trim(arr: np.ndarray, length: int) -> np.ndarray:
     return np.pad(arr.astype(np.float32), (0, length - len(arr)))
 
 
+def load_audio(path: str) -> np.ndarray:
+    """
+    解码音频文件为 16kHz mono float32。
+    优先用 soundfile（WAV / FLAC / OGG），未安装时退回 scipy.io.wavfile（仅 WAV）。
+    """
+    from scipy.signal import resample_poly
+
+    try:
+        import soundfile as sf
+        data, rate = sf.read(path, dtype="float32", always_2d=True)
+        data = data.mean(axis=1)
+    except ImportError:
+        if not path.lower().endswith(".wav"):
+            raise RuntimeError(f"解码 {path} 需要 soundfile：uv pip install soundfile")
+        from scipy.io import wavfile
+        rate, data = wavfile.read(path)
+        if data.dtype == np.uint8:                       # 8-bit WAV 是无符号，128 为零点
+            data = (data.astype(np.float32) - 128) / 128
+        elif np.issubdtype(data.dtype, np.integer):
+            data = data / float(-np.iinfo(data.dtype).min)
+        if data.ndim == 2:
+            data = data.mean(axis=1)
+
+    if rate != SAMPLE_RATE:
+        g    = gcd(SAMPLE_RATE, rate)
+        data = resample_poly(data, SAMPLE_RATE // g, rate // g)
+    return np.asarray(data, dtype=np.float32)
+
+
 # ─── 频域回声消除（AEC）────────────────────────────────────────────────────────
 
 class FreqDomainAEC:
@@ -63,15 +114,29 @@ class FreqDomainAEC:
       在频域估计回声并减去，然后用误差信号更新频域滤波器系数。
       约束滤波器因果性（时域前 L 系数清零），避免估计发散。
 
+    两种调用方式：
+      process(ref, mic)       : 逐块处理，一次一个 block
+      process_batch(ref, mic) : 一次处理 N 个积压 block（工作线程追赶时使用），
+                                参考信号 FFT 一次批量完成，输出与逐块调用逐样本一致
+
+    远端活动门控（gate=True）：
+      - 参考静音：整个 FFT 窗口（当前块 + L 历史）的参考 RMS < AEC_REF_SILENCE_RMS，
+        回声估计必然≈0，直接透传麦克风，本块不做任何 FFT
+      - 双讲：Geigel 检测 max|mic| > AEC_DTD_GEIGEL · max|参考窗口|，
+        照常减去回声估计，但跳过 NLMS 更新与因果约束（省 3 次 FFT，也避免滤波器被人声带偏）
+      跳过情况累计在 gate_stats()。
+
     参数：
       block_size   : 每次处理的采样数，应等于 VAD_CHUNK (512)
       filter_blocks: 滤波器覆盖的历史块数，建议 8→覆盖 256ms @ 16kHz
       mu           : 步长，越大收敛越快但越不稳定，建议 0.005~0.02
+      gate         : 是否启用远端活动 / 双讲门控（关闭时每块都完整更新）
     """
 
     def __init__(self, block_size: int = VAD_CHUNK,
                  filter_blocks: int = AEC_FILTER_BLOCKS,
-                 mu: float = AEC_MU):
+                 mu: float = AEC_MU,
+                 gate: bool = AEC_GATE):
         self.B        = block_size
         self.K        = filter_blocks
         self.L        = block_size * filter_blocks   # 滤波器有效长度（样本数）
@@ -79,7 +144,25 @@ class FreqDomainAEC:
         self._fft_n   = self.B + self.L              # FFT 窗口大小
         n_bins        = self._fft_n // 2 + 1
         self.H        = np.zeros(n_bins, dtype=complex)          # 频域滤波器
-        self._ref_hist = np.zeros(self.L, dtype=np.float32)     # 参考信号历史
+
+        # 预分配工作缓冲：参考历史常驻 _x_buf 头部 L 个采样，新块追加在其后，
+        # 处理完把末尾 L 个采样回卷到头部（环形复用，不再每块 concatenate）
+        self._x_buf   = np.zeros(self.L + self.B, dtype=np.float32)
+        self._e_pad   = np.zeros(self._fft_n)                    # 误差 FFT 输入，前 L 恒为 0
+
+        # 门控统计
+        self.gate          = gate
+        self.n_blocks      = 0
+        self.n_skip_idle   = 0    # 参考静音：整块跳过
+        self.n_skip_dtd    = 0    # 双讲：跳过自适应
+
+    def _reserve(self, n_blocks: int):
+        """确保工作缓冲能容纳 n_blocks 个新块（只增不减，保留参考历史）"""
+        need = self.L + n_blocks * self.B
+        if len(self._x_buf) < need:
+            buf = np.zeros(need, dtype=np.float32)
+            buf[:self.L] = self._x_buf[:self.L]
+            self._x_buf = buf
 
     def process(self, ref: np.ndarray, mic: np.ndarray) -> np.ndarray:
         """
@@ -90,41 +173,350 @@ class FreqDomainAEC:
         B = self.B
         ref = _pad_or_trim(ref, B)
         mic = _pad_or_trim(mic, B)
+        return self.process_batch(ref[np.newaxis], mic[np.newaxis])[0]
+
+    def process_batch(self, ref: np.ndarray, mic: np.ndarray) -> np.ndarray:
+        """
+        一次处理 N 个连续 block，结果与 N 次 process() 逐样本一致。
+
+        ref : 参考信号，形状 (N, block_size) 或长度 N*block_size 的一维数组
+        mic : 麦克风信号，形状同 ref
+        返回 : 去回声后的干净信号，float32，形状 (N, block_size)
 
-        # ── 频域回声估计 ──────────────────────────────────────────────────────
-        x        = np.concatenate([self._ref_hist, ref])
-        X        = np.fft.rfft(x, n=self._fft_n)
-        echo_td  = np.fft.irfft(self.H * X, n=self._fft_n)
-        echo_est = echo_td[-B:].astype(np.float32)
+        参考信号的 N 个 FFT 窗口互不依赖，合并为一次批量 rfft；
+        滤波器 H 每块更新一次，回声估计与 NLMS 更新仍按块顺序执行。
+        """
+        B, L, n = self.B, self.L, self._fft_n
+        mic = np.asarray(mic, dtype=np.float32).reshape(-1, B)
+        N   = len(mic)
+        ref = _pad_or_trim(np.ravel(ref), N * B)
+        out = np.empty((N, B), dtype=np.float32)
+        if N == 0:
+            return out
+
+        self._reserve(N)
+        x = self._x_buf[:L + N * B]
+        x[L:] = ref
+
+        # ── 门控：按 B 采样分段统计能量 / 峰值，第 i 块窗口覆盖段 i..i+K ──────────
+        windows = np.lib.stride_tricks.sliding_window_view(x, n)[::B]
+        if self.gate:
+            seg      = x.reshape(-1, B)
+            seg_e    = np.einsum("ij,ij->i", seg, seg, dtype=np.float64)
+            csum     = np.concatenate([[0.0], np.cumsum(seg_e)])
+            win_rms  = np.sqrt((csum[self.K + 1:] - csum[:N]) / n)
+            active   = win_rms >= AEC_REF_SILENCE_RMS
+            win_peak = np.lib.stride_tricks.sliding_window_view(
+                np.abs(seg).max(axis=1), self.K + 1).max(axis=1)
+            mic_peak = np.abs(mic).max(axis=1)
+            adapt    = mic_peak <= AEC_DTD_GEIGEL * win_peak
+        else:
+            active = adapt = np.ones(N, dtype=bool)
+        self.n_blocks += N
+
+        # ── 批量参考信号 FFT：第 i 块窗口 = x[i*B : i*B + B + L]（静音块不算）───
+        idx     = np.flatnonzero(active)
+        X_all   = np.fft.rfft(windows[idx], n=n, axis=-1) if len(idx) else None
+        P_all   = np.abs(X_all) ** 2 + 1e-8 if len(idx) else None
+        e_pad   = self._e_pad
+        j       = 0
+
+        for i in range(N):
+            if not active[i]:
+                out[i] = mic[i]
+                self.n_skip_idle += 1
+                continue
+            X, P = X_all[j], P_all[j]
+            j += 1
+
+            # ── 频域回声估计 ──────────────────────────────────────────────────
+            echo_td  = np.fft.irfft(self.H * X, n=n)
+            echo_est = echo_td[-B:].astype(np.float32)
+
+            # ── 误差信号（去回声后的人声）─────────────────────────────────────
+            e = mic[i] - echo_est
+            out[i] = e
+
+            if not adapt[i]:
+                self.n_skip_dtd += 1
+                continue
+
+            # ── 频域 NLMS 权重更新 ────────────────────────────────────────────
+            e_pad[L:] = e
+            E        = np.fft.rfft(e_pad, n=n)
+            self.H  += (self.mu / P) * np.conj(X) * E
+
+            # 约束因果性：时域前 L 个系数清零（防止非因果发散）
+            h_td = np.fft.irfft(self.H, n=n)
+            h_td[:L] = 0.0
+            self.H = np.fft.rfft(h_td, n=n)
+
+        # ── 更新参考历史：末尾 L 个采样回卷到缓冲头部 ──────────────────────────
+        x[:L] = x[N * B:]
+        return out
+
+    def gate_stats(self) -> dict:
+        """门控统计：总块数、两类跳过块数、跳过自适应的比例"""
+        skipped = self.n_skip_idle + self.n_skip_dtd
+        return {
+            "blocks":         self.n_blocks,
+            "skip_idle":      self.n_skip_idle,
+            "skip_dtd":       self.n_skip_dtd,
+            "skip_fraction":  round(skipped / self.n_blocks, 4) if self.n_blocks else 0.0,
+        }
+
+
+class PartitionedBlockAEC:
+    """
+    分块频域自适应回声消除 (Multi-Delay block Frequency-domain filter, MDF)。
+
+    与 FreqDomainAEC 的区别：
+      FreqDomainAEC 用一个 B+L 点 FFT 覆盖整条回声尾，L 越长单次 FFT 越贵；
+      MDF 把长度 L=B*K 的滤波器切成 K 个分区，每个分区只用 2B 点 FFT，
+      历史参考谱保存在频域延迟线里复用，每块只新算一次参考 FFT。
+      因果性约束每块只做一个分区（轮转），额外 FFT 从“每块两次 B+L 点”
+      降为“每块两次 2B 点”。
+    每块成本 ≈ 5 次 2B 点 FFT + O(K·B) 的频域乘加，回声尾加长时近似线性增长。
+
+    参数：
+      block_size   : 每次处理的采样数，应等于 VAD_CHUNK (512)
+      filter_blocks: 分区数 K，滤波器长度 = K·block_size（8→256ms @ 16kHz）
+      mu           : 步长，按全部分区的参考功率归一化，建议 0.1~0.5
+    """
+
+    def __init__(self, block_size: int = VAD_CHUNK,
+                 filter_blocks: int = AEC_FILTER_BLOCKS,
+                 mu: float = AEC_MDF_MU):
+        self.B      = block_size
+        self.K      = filter_blocks
+        self.L      = block_size * filter_blocks
+        self.mu     = mu
+        self._fft_n = 2 * block_size
+        n_bins      = block_size + 1
+        K           = filter_blocks
+
+        self.W      = np.zeros((K, n_bins), dtype=complex)       # 各分区频域滤波器
+
+        # 频域延迟线：长度 2K，新谱同时写入 h 和 h+K，
+        # _X[h:h+K] 即按延迟 0..K-1 排好的零拷贝视图
+        self._X     = np.zeros((2 * K, n_bins), dtype=complex)
+        self._P     = np.zeros((2 * K, n_bins))                  # 对应的 |X|² 延迟线
+        self._P_sum = np.zeros(n_bins)                           # K 个分区功率之和
+        self._head  = 0
+        self._part  = 0                                          # 下一个做因果约束的分区
+
+        self._x2    = np.zeros(self._fft_n, dtype=np.float32)    # [上一块参考, 当前参考]
+        self._e_pad = np.zeros(self._fft_n)                      # [0…0, 误差]
+        self._tmp   = np.empty((K, n_bins), dtype=complex)       # 权重更新临时量
+
+    def process(self, ref: np.ndarray, mic: np.ndarray) -> np.ndarray:
+        """
+        ref : 参考信号块（扬声器回环，已重采样到 16kHz，长度应 == block_size）
+        mic : 麦克风信号块（含回声，长度应 == block_size）
+        返回 : 去回声后的干净信号（float32，与 mic 等长）
+        """
+        B, K, n = self.B, self.K, self._fft_n
+        ref = _pad_or_trim(ref, B)
+        mic = _pad_or_trim(mic, B)
+
+        # ── 新参考谱推入频域延迟线 ────────────────────────────────────────────
+        self._x2[:B] = self._x2[B:]
+        self._x2[B:] = ref
+        h = self._head = (self._head - 1) % K
+        X0 = np.fft.rfft(self._x2, n=n)
+        P0 = X0.real ** 2 + X0.imag ** 2
+        self._P_sum += P0 - self._P[h]          # 减去被挤出延迟线的最旧分区
+        self._X[h] = self._X[h + K] = X0
+        self._P[h] = self._P[h + K] = P0
+        X = self._X[h:h + K]
+
+        # ── 频域回声估计：各分区输出求和 ──────────────────────────────────────
+        Y        = np.einsum("kf,kf->f", self.W, X)
+        echo_est = np.fft.irfft(Y, n=n)[B:].astype(np.float32)
 
         # ── 误差信号（去回声后的人声）─────────────────────────────────────────
         e = mic - echo_est
 
-        # ── 频域 NLMS 权重更新 ────────────────────────────────────────────────
-        e_padded = np.concatenate([np.zeros(self.L), e])
-        E        = np.fft.rfft(e_padded, n=self._fft_n)
-        power    = np.abs(X) ** 2 + 1e-8
-        self.H  += (self.mu / power) * np.conj(X) * E
+        # ── 频域 NLMS 权重更新（全部分区共用归一化功率）───────────────────────
+        self._e_pad[B:] = e
+        E    = np.fft.rfft(self._e_pad, n=n)
+        g    = (self.mu / (np.maximum(self._P_sum, 0.0) + 1e-8)) * E
+        tmp  = np.conjugate(X, out=self._tmp)
+        tmp *= g
+        self.W += tmp
+
+        # ── 轮转因果约束：每块只约束一个分区（时域后 B 个系数清零）────────────
+        j = self._part
+        w_td = np.fft.irfft(self.W[j], n=n)
+        w_td[B:] = 0.0
+        self.W[j] = np.fft.rfft(w_td, n=n)
+        self._part = (j + 1) % K
+
+        return e
+
+    def process_batch(self, ref: np.ndarray, mic: np.ndarray) -> np.ndarray:
+        """
+        与 FreqDomainAEC.process_batch 接口一致：输入 N 个连续 block，
+        返回 float32 (N, block_size)。MDF 每块只做一次参考 FFT，逐块处理即可。
+        """
+        B   = self.B
+        mic = np.asarray(mic, dtype=np.float32).reshape(-1, B)
+        ref = _pad_or_trim(np.ravel(ref), len(mic) * B).reshape(-1, B)
+        out = np.empty(mic.shape, dtype=np.float32)
+        for i in range(len(mic)):
+            out[i] = self.process(ref[i], mic[i])
+        return out
+
+
+# 可在 start_mic_aec 中按名称选择的回声消除引擎
+AEC_ENGINES = {
+    "fdaf": FreqDomainAEC,
+    "mdf":  PartitionedBlockAEC,
+}
+
+
+# ─── 采集健康统计 ──────────────────────────────────────────────────────────────
+
+class CaptureStats:
+    """
+    单次采集会话（一个 AudioCapture）的健康计数器。
+
+    各计数器按流/队列名分组，通常只有一个线程写同一个键，
+    因此不加锁；snapshot() 读到的是近似一致的快照，足够用于监控与容量评估。
+
+      frames_in      : 各输入流收到的采样帧数（mic / loopback / ref）
+      frames_out     : 送入 audio_q 的采样数
+      drops          : 各队列 / 环形缓冲因满而丢弃的次数或采样数（见键名）
+      status         : 各流回调报告 status（xrun / 设备异常）的次数
+      ref_zero_blocks: AEC 参考信号缺失、用零填充的块数
+      queue_hwm      : 各队列 put 之后观测到的最高水位
+      cb_latency     : 各回调的耗时窗口（微秒）
+    """
+
+    def __init__(self):
+        self.t_start         = time.monotonic()
+        self.frames_in       = defaultdict(int)
+        self.frames_out      = 0
+        self.drops           = defaultdict(int)
+        self.status          = defaultdict(int)
+        self.ref_zero_blocks = 0
+        self.queue_hwm       = defaultdict(int)
+        self.cb_latency: dict[str, LatencyWindow] = {}
+
+    def latency(self, stream: str) -> LatencyWindow:
+        """取（必要时创建）某个回调的耗时窗口；应在启动流之前调用"""
+        if stream not in self.cb_latency:
+            self.cb_latency[stream] = LatencyWindow()
+        return self.cb_latency[stream]
+
+    def offer(self, q: queue.Queue, name: str, item: np.ndarray) -> bool:
+        """put_nowait 并记录水位 / 丢弃；name == "audio_q" 时同时累计 frames_out"""
+        try:
+            q.put_nowait(item)
+        except queue.Full:
+            self.drops[name] += 1
+            return False
+        depth = q.qsize()
+        if depth > self.queue_hwm[name]:
+            self.queue_hwm[name] = depth
+        if name == "audio_q":
+            self.frames_out += len(item)
+        return True
+
+    def snapshot(self) -> dict:
+        return {
+            "uptime_s":        round(time.monotonic() - self.t_start, 1),
+            "frames_in":       dict(self.frames_in),
+            "frames_out":      self.frames_out,
+            "drops":           dict(self.drops),
+            "status":          dict(self.status),
+            "ref_zero_blocks": self.ref_zero_blocks,
+            "queue_hwm":       dict(self.queue_hwm),
+            "callback_us":     {k: w.percentiles() for k, w in self.cb_latency.items()},
+        }
+
+
+# ─── 回调 / DSP 分离 ───────────────────────────────────────────────────────────
+
+class CaptureDSPStage:
+    """
+    把下混与重采样移出音频驱动回调的 DSP 线程。
+
+    回调线程只调用 push()：把原始交错 float32 采样拷入预分配的 RingBuffer，
+    记录耗时后立刻返回（稳态下为微秒级，不分配、不做数值计算）。
+    DSP 线程被唤醒后批量取出全部完整帧，交给 StreamResampler 下混 + 重采样，
+    再把结果交给 sink（写 audio_q 或参考队列）。
+
+    回调耗时记录在 cb_latency（LatencyWindow，微秒），通常传入 CaptureStats 的窗口，
+    由 AudioCapture.stats() 汇总。
+    """
+
+    def __init__(self, resampler, channels: int, blocksize: int,
+                 sink, name: str = "dsp", cb_latency: LatencyWindow | None = None):
+        self.name       = name
+        self._resampler = resampler
+        self._ch        = channels
+        self._sink      = sink
+        # 容量与读取量都是 channels 的整数倍，保证交错帧不被拆开
+        frame_block     = blocksize * channels
+        self._ring      = RingBuffer(capacity=frame_block * DSP_RING_BLOCKS, block=frame_block)
+        self._work      = np.zeros(self._ring.capacity, dtype=np.float32)
+        self.cb_latency = cb_latency if cb_latency is not None else LatencyWindow()
+        self._wake      = threading.Event()
+        self._stop      = threading.Event()
+        self._thread    = threading.Thread(target=self._run, daemon=True, name=name)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    # ── 回调线程 ───────────────────────────────────────────────────────────────
+
+    def push(self, in_data: bytes, t0: float):
+        """回调中调用：拷贝原始字节并唤醒 DSP 线程；t0 为回调入口的 perf_counter()"""
+        # 溢出只由 RingBuffer.dropped 计数，回调里不打日志
+        self._ring.write(np.frombuffer(in_data, dtype=np.float32))
+        self._wake.set()
+        self.cb_latency.add((time.perf_counter() - t0) * 1e6)
+        tracer.complete(f"cb:{self.name}", t0)
+
+    @property
+    def dropped(self) -> int:
+        """原始采样环形缓冲溢出丢弃的采样数（交错，含全部声道）"""
+        return self._ring.dropped
 
-        # 约束因果性：时域前 L 个系数清零（防止非因果发散）
-        h_td = np.fft.irfft(self.H, n=self._fft_n)
-        h_td[:self.L] = 0.0
-        self.H = np.fft.rfft(h_td, n=self._fft_n)
+    # ── DSP 线程 ───────────────────────────────────────────────────────────────
 
-        # ── 更新参考历史 ──────────────────────────────────────────────────────
-        self._ref_hist = np.concatenate([self._ref_hist[B:], ref])
+    def _run(self):
+        log.debug("%s DSP 线程启动", self.name)
+        while not self._stop.is_set():
+            self._wake.wait(timeout=0.1)
+            self._wake.clear()
+
+            n = self._ring.read_into(self._work[:len(self._ring) // self._ch * self._ch])
+            if n:
+                t0  = time.perf_counter()
+                out = self._resampler.process(self._work[:n].reshape(-1, self._ch))
+                tracer.complete(f"dsp:{self.name}", t0)
+                if len(out):
+                    self._sink(out.copy())
+        log.debug("%s DSP 线程退出", self.name)
 
-        return e.astype(np.float32)
 
 
 # ─── 音频采集后端 ──────────────────────────────────────────────────────────────
 
 class AudioCapture:
     """
-    统一音频采集后端，支持三种模式：
+    统一音频采集后端，支持以下模式：
       - input:    sounddevice.InputStream，16000Hz mono（麦克风、WoMic）
       - loopback: PyAudioWPatch WASAPI 回环，自动重采样到 16000Hz mono
       - mic_aec:  麦克风 + 扬声器回环双流，实时回声消除后送入 audio_q
+      - mic_mix:  麦克风 + 扬声器回环双流，直接混音
+      - file:     WAV / FLAC 文件回放（实时节奏或不限速），无需声卡
     """
 
     def __init__(self, audio_q: queue.Queue, on_error=None):
@@ -132,6 +524,10 @@ class AudioCapture:
         self._on_error = on_error
         self._stream   = None   # sd.InputStream 或 PyAudio stream
         self._pa       = None   # PyAudio 实例（回环模式专用）
+        self._dsp_stages: list[CaptureDSPStage] = []   # 回环流的下混 / 重采样线程
+        self._stats      = CaptureStats()
+        self._aligner: DriftAligner | None = None      # AEC / 混音模式的双流对齐
+        self._stats_stop = threading.Event()
 
     # ── 麦克风输入模式 ─────────────────────────────────────────────────────────
 
@@ -146,19 +542,23 @@ class AudioCapture:
             blocksize=VAD_CHUNK,
             callback=self._input_cb,
         )
+        self._mic_latency = self._stats.latency("mic")
         self._stream.start()
+        self._start_stats_reporter()
         log.info("麦克风流已启动")
 
     def _input_cb(self, indata, frames, time_info, status):
+        t0 = time.perf_counter()
+        self._stats.frames_in["mic"] += frames
         if status:
+            self._stats.status["mic"] += 1
             log.warning("麦克风流状态异常: %s", status)
             if self._on_error:
                 self._on_error(str(status))
             return
-        try:
-            self._audio_q.put_nowait(indata[:, 0].copy())
-        except queue.Full:
-            pass
+        self._stats.offer(self._audio_q, "audio_q", indata[:, 0].copy())
+        self._mic_latency.add((time.perf_counter() - t0) * 1e6)
+        tracer.complete("cb:mic", t0)
 
     # ── 扬声器回环模式 ─────────────────────────────────────────────────────────
 
@@ -167,7 +567,7 @@ class AudioCapture:
         启动 PyAudioWPatch WASAPI 回环流。
         自动将设备原生格式（通常 stereo 48kHz）重采样为 mono 16kHz。
         """
-        from scipy.signal import resample_poly
+        from resample import StreamResampler
         import pyaudiowpatch as pyaudio
 
         self._pa = pyaudio.PyAudio()
@@ -178,27 +578,28 @@ class AudioCapture:
         log.info("启动回环流: device=%s name=%s rate=%s ch=%s",
                  device_idx, device_info.get("name", "?"), rate, ch)
 
-        g    = gcd(SAMPLE_RATE, rate)
-        up   = SAMPLE_RATE // g
-        down = rate // g
+        resampler = StreamResampler(rate, SAMPLE_RATE)
+        up, down  = resampler.up, resampler.down
 
         if rate == LOOPBACK_SAMPLE_RATE:
             blocksize = LOOPBACK_BLOCKSIZE
         else:
             blocksize = VAD_CHUNK * down // up * 2 + 64
 
+        def _to_audio_q(mono):
+            self._stats.offer(self._audio_q, "audio_q", mono)
+
+        stage = self._add_dsp_stage(resampler, ch, blocksize, _to_audio_q, "loopback")
+
         def _loopback_cb(in_data, frame_count, time_info, status):
+            t0 = time.perf_counter()
+            self._stats.frames_in["loopback"] += frame_count
             if status:
+                self._stats.status["loopback"] += 1
                 log.warning("回环流状态异常（xrun/设备拔出）: %s", status)
                 if self._on_error:
                     self._on_error(f"loopback status: {status}")
-            audio = np.frombuffer(in_data, dtype=np.float32).reshape(-1, ch)
-            mono  = audio.mean(axis=1)
-            mono  = resample_poly(mono, up, down).astype(np.float32)
-            try:
-                self._audio_q.put_nowait(mono)
-            except queue.Full:
-                pass
+            stage.push(in_data, t0)
             return (None, pyaudio.paContinue)
 
         self._stream = self._pa.open(
@@ -211,37 +612,48 @@ class AudioCapture:
             stream_callback=_loopback_cb,
         )
         self._stream.start_stream()
+        self._start_stats_reporter()
         log.info("回环流已启动: blocksize=%s resample=%s→%s", blocksize, rate, SAMPLE_RATE)
 
     # ── 麦克风 + 回环双流（AEC 模式）──────────────────────────────────────────
 
-    def start_mic_aec(self, mic_idx: int, loopback_idx: int, loopback_info: dict):
+    def start_mic_aec(self, mic_idx: int, loopback_idx: int, loopback_info: dict,
+                      engine: str = AEC_ENGINE):
         """
         同时捕获麦克风和扬声器回环，实时做回声消除后送入 audio_q。
         mic_idx      : sounddevice 麦克风设备索引
         loopback_idx : PyAudioWPatch 回环设备索引
         loopback_info: list_loopback_devices() 返回的设备信息字典
+        engine       : 回声消除引擎，"fdaf" | "mdf"（见 AEC_ENGINES）
         """
-        from scipy.signal import resample_poly
+        if engine not in AEC_ENGINES:
+            raise ValueError(f"未知 AEC 引擎: {engine}（可选: {', '.join(AEC_ENGINES)}）")
+
+        from resample import StreamResampler
         import pyaudiowpatch as pyaudio
 
-        log.info("启动 AEC 模式: mic=%s loopback=%s name=%s",
-                 mic_idx, loopback_idx, loopback_info.get("name", "?"))
+        log.info("启动 AEC 模式: mic=%s loopback=%s name=%s engine=%s",
+                 mic_idx, loopback_idx, loopback_info.get("name", "?"), engine)
         self._mic_q    = queue.Queue(maxsize=200)
         self._ref_q    = queue.Queue(maxsize=200)
-        self._aec_obj  = FreqDomainAEC(block_size=VAD_CHUNK)
+        self._aec_obj  = AEC_ENGINES[engine](block_size=VAD_CHUNK)
         self._aec_stop = threading.Event()
 
+        mic_latency = self._stats.latency("mic")
+
         def _mic_cb(indata, frames, time_info, status):
+            t0 = time.perf_counter()
+            self._stats.frames_in["mic"] += frames
+            self._aligner.observe_mic(frames, time_info.inputBufferAdcTime)
             if status:
+                self._stats.status["mic"] += 1
                 log.warning("AEC 麦克风流状态异常: %s", status)
                 if self._on_error:
                     self._on_error(str(status))
                 return
-            try:
-                self._mic_q.put_nowait(indata[:, 0].copy())
-            except queue.Full:
-                pass
+            self._stats.offer(self._mic_q, "mic_q", indata[:, 0].copy())
+            mic_latency.add((time.perf_counter() - t0) * 1e6)
+            tracer.complete("cb:mic", t0)
 
         self._stream = sd.InputStream(
             device=mic_idx,
@@ -255,19 +667,25 @@ class AudioCapture:
         ch   = int(loopback_info.get("maxInputChannels", 2))
         rate = int(loopback_info.get("defaultSampleRate", LOOPBACK_SAMPLE_RATE))
         ch   = max(1, ch)
-        g    = gcd(SAMPLE_RATE, rate)
-        up, down = SAMPLE_RATE // g, rate // g
+        resampler = StreamResampler(rate, SAMPLE_RATE)
+        up, down  = resampler.up, resampler.down
         bs   = LOOPBACK_BLOCKSIZE if rate == LOOPBACK_SAMPLE_RATE else VAD_CHUNK * down // up * 2 + 64
+        self._aligner = DriftAligner(SAMPLE_RATE, rate)   # 回调时间戳 → 时钟漂移补偿
+
+        def _to_ref_q(mono):
+            if not self._stats.offer(self._ref_q, "ref_q", mono):
+                log.debug("AEC 参考队列满，丢弃一帧（ref_q 积压）")
+
+        stage = self._add_dsp_stage(resampler, ch, bs, _to_ref_q, "ref")
 
         def _ref_cb(in_data, frame_count, time_info, status):
+            t0 = time.perf_counter()
+            self._stats.frames_in["ref"] += frame_count
+            self._aligner.observe_ref(frame_count, time_info.get("input_buffer_adc_time", 0.0))
             if status:
+                self._stats.status["ref"] += 1
                 log.warning("AEC 参考回环流状态异常: %s", status)
-            audio = np.frombuffer(in_data, dtype=np.float32).reshape(-1, ch)
-            mono  = resample_poly(audio.mean(axis=1), up, down).astype(np.float32)
-            try:
-                self._ref_q.put_nowait(mono)
-            except queue.Full:
-                log.debug("AEC 参考队列满，丢弃一帧（ref_q 积压）")
+            stage.push(in_data, t0)
             return (None, pyaudio.paContinue)
 
         self._pa = pyaudio.PyAudio()
@@ -285,23 +703,31 @@ class AudioCapture:
 
         self._stream.start()
         self._ref_stream.start_stream()
+        self._start_stats_reporter()
         log.info("AEC 双流已启动: mic_blocksize=%s ref_blocksize=%s resample=%s/%s",
                  VAD_CHUNK, bs, up, down)
 
     def _aec_worker(self):
         """
-        对齐麦克风块与参考块，逐块调用 FreqDomainAEC，
+        对齐麦克风块与参考块，批量调用 AEC 引擎（FreqDomainAEC / PartitionedBlockAEC），
         将清洁人声送入 audio_q。
         """
         log.debug("AEC 工作线程启动")
-        ref_buf = np.array([], dtype=np.float32)
-        mic_buf = np.array([], dtype=np.float32)
+        ref_ring = RingBuffer()
+        mic_ring = RingBuffer()
+        # 批量工作区：一次最多取出一个 ring 容量的积压块
+        mic_blks = np.zeros(mic_ring.capacity, dtype=np.float32)
+        ref_blks = np.zeros(mic_ring.capacity, dtype=np.float32)
         ref_zero_count = 0
+        max_wait = ALIGN_MAX_WAIT_MS * SAMPLE_RATE // 1000
 
         while not self._aec_stop.is_set():
             try:
                 while True:
-                    ref_buf = np.concatenate([ref_buf, self._ref_q.get_nowait()])
+                    chunk = self._aligner.correct(self._ref_q.get_nowait())
+                    if (written := ref_ring.write(chunk)) < len(chunk):
+                        self._stats.drops["ref_ring"] += 1
+                        log.debug("AEC 参考环形缓冲满，丢弃 %d 采样", len(chunk) - written)
             except queue.Empty:
                 pass
 
@@ -310,12 +736,25 @@ class AudioCapture:
             except queue.Empty:
                 continue
 
-            mic_buf = np.concatenate([mic_buf, mic_chunk])
+            if (written := mic_ring.write(mic_chunk)) < len(mic_chunk):
+                self._stats.drops["mic_ring"] += 1
+                log.debug("AEC 麦克风环形缓冲满，丢弃 %d 采样", len(mic_chunk) - written)
 
-            while len(mic_buf) >= VAD_CHUNK:
-                if len(ref_buf) < VAD_CHUNK:
-                    ref_buf = np.zeros(VAD_CHUNK, dtype=np.float32)
+            # 一次取出所有积压的完整块，批量做 AEC（调度抖动后追赶更省 CPU）；
+            # 参考只是暂时滞后时先处理已对齐的部分，积压超过 ALIGN_MAX_WAIT_MS 才零填充
+            n = len(mic_ring) // VAD_CHUNK
+            if len(ref_ring) < n * VAD_CHUNK and n * VAD_CHUNK < max_wait:
+                n = len(ref_ring) // VAD_CHUNK
+            if n == 0:
+                continue
+            mic_ring.read_into(mic_blks[:n * VAD_CHUNK])
+            for i in range(n):
+                ref_blk = ref_blks[i * VAD_CHUNK:(i + 1) * VAD_CHUNK]
+                if len(ref_ring) < VAD_CHUNK:
+                    ref_ring.clear()
+                    ref_blk[:] = 0.0
                     ref_zero_count += 1
+                    self._stats.ref_zero_blocks += 1
                     if ref_zero_count == 10:
                         log.warning("AEC 参考信号持续缺失（已用零填充 %d 块），"
                                     "请检查回环设备是否正常工作", ref_zero_count)
@@ -323,16 +762,14 @@ class AudioCapture:
                     if ref_zero_count > 0:
                         log.debug("AEC 参考信号恢复，之前缺失 %d 块", ref_zero_count)
                     ref_zero_count = 0
-
-                mic_blk = mic_buf[:VAD_CHUNK]
-                ref_blk = ref_buf[:VAD_CHUNK]
-                mic_buf = mic_buf[VAD_CHUNK:]
-                ref_buf = ref_buf[VAD_CHUNK:]
-
-                clean = self._aec_obj.process(ref_blk, mic_blk)
-                try:
-                    self._audio_q.put_nowait(clean)
-                except queue.Full:
+                    ref_ring.read_into(ref_blk)
+
+            t0    = time.perf_counter()
+            clean = self._aec_obj.process_batch(ref_blks[:n * VAD_CHUNK],
+                                                mic_blks[:n * VAD_CHUNK])
+            tracer.complete("aec", t0, {"blocks": n})
+            for blk in clean:
+                if not self._stats.offer(self._audio_q, "audio_q", blk):
                     log.debug("audio_q 满，丢弃一帧（SenseVoice 处理滞后）")
 
     # ── 麦克风 + 回环双流（混音模式，不消除回声）─────────────────────────────
@@ -342,7 +779,7 @@ class AudioCapture:
         同时捕获麦克风和扬声器回环，直接混合后送入 audio_q（无回声消除）。
         适用：同时识别自己说的话和屏幕/视频声音。
         """
-        from scipy.signal import resample_poly
+        from resample import StreamResampler
         import pyaudiowpatch as pyaudio
 
         log.info("启动混音模式: mic=%s loopback=%s name=%s",
@@ -351,16 +788,21 @@ class AudioCapture:
         self._ref_q    = queue.Queue(maxsize=200)
         self._mix_stop = threading.Event()
 
+        mic_latency = self._stats.latency("mic")
+
         def _mic_cb(indata, frames, time_info, status):
+            t0 = time.perf_counter()
+            self._stats.frames_in["mic"] += frames
+            self._aligner.observe_mic(frames, time_info.inputBufferAdcTime)
             if status:
+                self._stats.status["mic"] += 1
                 log.warning("混音麦克风流状态异常: %s", status)
                 if self._on_error:
                     self._on_error(str(status))
                 return
-            try:
-                self._mic_q.put_nowait(indata[:, 0].copy())
-            except queue.Full:
-                pass
+            self._stats.offer(self._mic_q, "mic_q", indata[:, 0].copy())
+            mic_latency.add((time.perf_counter() - t0) * 1e6)
+            tracer.complete("cb:mic", t0)
 
         self._stream = sd.InputStream(
             device=mic_idx,
@@ -374,19 +816,25 @@ class AudioCapture:
         ch   = int(loopback_info.get("maxInputChannels", 2))
         rate = int(loopback_info.get("defaultSampleRate", LOOPBACK_SAMPLE_RATE))
         ch   = max(1, ch)
-        g    = gcd(SAMPLE_RATE, rate)
-        up, down = SAMPLE_RATE // g, rate // g
+        resampler = StreamResampler(rate, SAMPLE_RATE)
+        up, down  = resampler.up, resampler.down
         bs   = LOOPBACK_BLOCKSIZE if rate == LOOPBACK_SAMPLE_RATE else VAD_CHUNK * down // up * 2 + 64
+        self._aligner = DriftAligner(SAMPLE_RATE, rate)   # 回调时间戳 → 时钟漂移补偿
+
+        def _to_ref_q(mono):
+            if not self._stats.offer(self._ref_q, "ref_q", mono):
+                log.debug("混音参考队列满，丢弃一帧")
+
+        stage = self._add_dsp_stage(resampler, ch, bs, _to_ref_q, "ref")
 
         def _ref_cb(in_data, frame_count, time_info, status):
+            t0 = time.perf_counter()
+            self._stats.frames_in["ref"] += frame_count
+            self._aligner.observe_ref(frame_count, time_info.get("input_buffer_adc_time", 0.0))
             if status:
+                self._stats.status["ref"] += 1
                 log.warning("混音回环流状态异常: %s", status)
-            audio = np.frombuffer(in_data, dtype=np.float32).reshape(-1, ch)
-            mono  = resample_poly(audio.mean(axis=1), up, down).astype(np.float32)
-            try:
-                self._ref_q.put_nowait(mono)
-            except queue.Full:
-                log.debug("混音参考队列满，丢弃一帧")
+            stage.push(in_data, t0)
             return (None, pyaudio.paContinue)
 
         self._pa = pyaudio.PyAudio()
@@ -404,19 +852,25 @@ class AudioCapture:
 
         self._stream.start()
         self._ref_stream.start_stream()
+        self._start_stats_reporter()
         log.info("混音双流已启动: mic_blocksize=%s ref_blocksize=%s resample=%s/%s",
                  VAD_CHUNK, bs, up, down)
 
     def _mix_worker(self):
         """对齐麦克风块与回环块，叠加后限幅，送入 audio_q。"""
         log.debug("混音工作线程启动")
-        ref_buf = np.array([], dtype=np.float32)
-        mic_buf = np.array([], dtype=np.float32)
+        ref_ring = RingBuffer()
+        mic_ring = RingBuffer()
+        silence  = np.zeros(VAD_CHUNK, dtype=np.float32)
+        max_wait = ALIGN_MAX_WAIT_MS * SAMPLE_RATE // 1000
 
         while not self._mix_stop.is_set():
             try:
                 while True:
-                    ref_buf = np.concatenate([ref_buf, self._ref_q.get_nowait()])
+                    chunk = self._aligner.correct(self._ref_q.get_nowait())
+                    if (written := ref_ring.write(chunk)) < len(chunk):
+                        self._stats.drops["ref_ring"] += 1
+                        log.debug("混音参考环形缓冲满，丢弃 %d 采样", len(chunk) - written)
             except queue.Empty:
                 pass
 
@@ -425,24 +879,144 @@ class AudioCapture:
             except queue.Empty:
                 continue
 
-            mic_buf = np.concatenate([mic_buf, mic_chunk])
+            if (written := mic_ring.write(mic_chunk)) < len(mic_chunk):
+                self._stats.drops["mic_ring"] += 1
+                log.debug("混音麦克风环形缓冲满，丢弃 %d 采样", len(mic_chunk) - written)
+
+            while len(mic_ring) >= VAD_CHUNK:
+                has_ref = len(ref_ring) >= VAD_CHUNK
+                if not has_ref and len(mic_ring) < max_wait:
+                    break   # 参考暂时滞后，等下一轮（超过 ALIGN_MAX_WAIT_MS 才补零）
+                ref_blk = ref_ring.peek() if has_ref else silence
+
+                # 直接叠加（各自保持原始音量），限幅防止溢出；
+                # mixed 交给 audio_q，是唯一一次新分配
+                t0    = time.perf_counter()
+                mixed = mic_ring.peek() + ref_blk
+                np.clip(mixed, -1.0, 1.0, out=mixed)
+                mic_ring.advance()
+                if has_ref:
+                    ref_ring.advance()
+                tracer.complete("mix", t0)
+                if not self._stats.offer(self._audio_q, "audio_q", mixed):
+                    log.debug("audio_q 满，丢弃一帧（识别滞后）")
 
-            while len(mic_buf) >= VAD_CHUNK:
-                mic_blk = mic_buf[:VAD_CHUNK]
-                mic_buf  = mic_buf[VAD_CHUNK:]
+    # ── 文件回放（WAV / FLAC）───────────────────────────────────────────────────
 
-                if len(ref_buf) >= VAD_CHUNK:
-                    ref_blk = ref_buf[:VAD_CHUNK]
-                    ref_buf  = ref_buf[VAD_CHUNK:]
-                else:
-                    ref_blk = np.zeros(VAD_CHUNK, dtype=np.float32)
+    def start_file(self, path: str, speed: float = 1.0, ref_path: str | None = None,
+                   engine: str = AEC_ENGINE):
+        """
+        把音频文件当作输入设备回放：解码 → 16kHz mono → 按 VAD_CHUNK 送入 audio_q。
+        不需要任何声卡，可在无头环境（CI）里复现 / 压测整条识别流水线。
 
-                # 直接叠加（各自保持原始音量），限幅防止溢出
-                mixed = np.clip(mic_blk + ref_blk, -1.0, 1.0)
-                try:
-                    self._audio_q.put_nowait(mixed)
-                except queue.Full:
-                    log.debug("audio_q 满，丢弃一帧（识别滞后）")
+        path    : 近端（麦克风）音频文件，WAV 或 FLAC
+        speed   : 1.0 按实时节奏回放，>1 加速；0 表示不限速 ——
+                  此时用阻塞式 put，audio_q 满了就等，保证一帧不丢、结果可复现
+        ref_path: 可选的参考（扬声器）文件，与 path 逐块对齐后先过 AEC 再送入
+        engine  : ref_path 存在时使用的 AEC 引擎，"fdaf" | "mdf"
+
+        回放结束（含尾部 2×SILENCE_MS 静音，让 VAD 收尾最后一句）后 file_done 置位。
+        """
+        if speed < 0:
+            raise ValueError(f"speed 不能为负数: {speed}")
+        if ref_path and engine not in AEC_ENGINES:
+            raise ValueError(f"未知 AEC 引擎: {engine}（可选: {', '.join(AEC_ENGINES)}）")
+
+        mic = load_audio(path)
+        ref = None
+        if ref_path:
+            ref = load_audio(ref_path)
+            self._aec_obj = AEC_ENGINES[engine](block_size=VAD_CHUNK)
+        log.info("启动文件回放: %s (%.1fs) ref=%s speed=%s",
+                 path, len(mic) / SAMPLE_RATE, ref_path, speed or "不限速")
+
+        self._file_stop = threading.Event()
+        self.file_done  = threading.Event()
+        threading.Thread(target=self._file_worker, args=(mic, ref, speed),
+                         daemon=True, name="file").start()
+        self._start_stats_reporter()
+
+    def _file_worker(self, mic: np.ndarray, ref: np.ndarray | None, speed: float):
+        """按节奏切块送入 audio_q；speed == 0 时阻塞 put（背压）而不是丢帧"""
+        B     = VAD_CHUNK
+        tail  = np.zeros(SILENCE_MS * 2 * SAMPLE_RATE // 1000, dtype=np.float32)
+        mic   = np.concatenate([mic, tail])
+        n_blk = len(mic) // B
+        if ref is not None:
+            ref = _pad_or_trim(ref, n_blk * B)
+
+        t_start = time.monotonic()
+        for k in range(n_blk):
+            if self._file_stop.is_set():
+                break
+            if speed > 0:
+                delay = t_start + k * B / SAMPLE_RATE / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+            blk = mic[k * B:(k + 1) * B]
+            self._stats.frames_in["file"] += B
+            if ref is not None:
+                t0  = time.perf_counter()
+                blk = self._aec_obj.process(ref[k * B:(k + 1) * B], blk)
+                tracer.complete("aec", t0)
+            else:
+                blk = blk.copy()
+
+            if speed > 0:
+                if not self._stats.offer(self._audio_q, "audio_q", blk):
+                    log.debug("audio_q 满，丢弃一帧（文件回放，识别滞后）")
+            else:
+                while not self._file_stop.is_set():
+                    try:
+                        self._audio_q.put(blk, timeout=0.1)
+                        self._stats.frames_out += B
+                        break
+                    except queue.Full:
+                        continue
+
+        log.info("文件回放结束: %.1fs 音频，用时 %.1fs",
+                 n_blk * B / SAMPLE_RATE, time.monotonic() - t_start)
+        self.file_done.set()
+
+    # ── 回调 DSP 线程 ──────────────────────────────────────────────────────────
+
+    def _add_dsp_stage(self, resampler, channels: int, blocksize: int,
+                       sink, name: str) -> CaptureDSPStage:
+        """创建并启动一个 DSP 线程（线程名 <name>-dsp），stop() 时统一停止"""
+        stage = CaptureDSPStage(resampler, channels, blocksize, sink,
+                                name=f"{name}-dsp", cb_latency=self._stats.latency(name))
+        stage.start()
+        self._dsp_stages.append(stage)
+        return stage
+
+    # ── 健康统计 ───────────────────────────────────────────────────────────────
+
+    def stats(self) -> dict:
+        """
+        采集健康快照：帧数、各队列丢弃、xrun/status 次数、零填充参考块、
+        队列最高水位、回调耗时分位数（微秒），双流模式下还有 drift_ppm。DSP 线程的原始采样溢出计入
+        drops["<name>_raw"]（单位：交错采样数）。
+        """
+        snap = self._stats.snapshot()
+        for st in self._dsp_stages:
+            if st.dropped:
+                snap["drops"][f"{st.name.removesuffix('-dsp')}_raw"] = st.dropped
+        snap["audio_q_maxsize"] = self._audio_q.maxsize
+        if self._aligner is not None:
+            snap["drift_ppm"] = round(self._aligner.drift_ppm, 2)
+        aec = getattr(self, "_aec_obj", None)
+        if hasattr(aec, "gate_stats"):
+            snap["aec_gate"] = aec.gate_stats()
+        return snap
+
+    def _start_stats_reporter(self):
+        """每 CAPTURE_STATS_INTERVAL_SEC 秒把 stats() 写入日志"""
+        def _report():
+            while not self._stats_stop.wait(CAPTURE_STATS_INTERVAL_SEC):
+                log.info("[采集统计] %s", self.stats())
+
+        threading.Thread(target=_report, daemon=True, name="capture-stats").start()
 
     # ── 停止 ───────────────────────────────────────────────────────────────────
 
@@ -454,6 +1028,12 @@ class AudioCapture:
         if hasattr(self, "_mix_stop"):
             self._mix_stop.set()
 
+        if hasattr(self, "_file_stop"):
+            self._file_stop.set()
+
+        self._stats_stop.set()
+        log.info("[采集统计] 停止时: %s", self.stats())
+
         if self._stream is not None:
             try:
                 if hasattr(self._stream, "stop_stream"):
@@ -480,3 +1060,7 @@ class AudioCapture:
             except Exception:
                 pass
             self._pa = None
+
+        for stage in self._dsp_stages:
+            stage.stop()
+        self._dsp_stages = []
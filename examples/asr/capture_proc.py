@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+采集子进程：AudioCapture 在独立进程中运行，音频经共享内存环形缓冲交给主进程
+
+主进程里 SenseVoice 推理、VAD、界面共用一个解释器，推理长时间持有 GIL 时
+PortAudio 回调拿不到 GIL，回调超时 → 输入溢出，audio_q 也会因消费停顿而丢帧。
+把采集（回调 + 重采样 + AEC / 混音）整体移到子进程后：
+
+  子进程 : AudioCapture → _RingSink（伪装成 audio_q）→ SharedRingBuffer.write
+  主进程 : VAD 线程直接 peek / advance 共享环形缓冲（零拷贝视图）
+
+CaptureProcess 对外提供与 AudioCapture 相同的 start_* / stop / stats 接口，
+RealtimeSubtitle 按 capture_process 开关二选一即可。
+"""
+
+import queue
+import threading
+import time
+import logging
+import multiprocessing as mp
+
+from config import VAD_CHUNK, VAD_BATCH_FRAMES, SHM_RING_CAPACITY, CAPTURE_PROC_START_SEC
+from ringbuf import SharedRingBuffer
+
+log = logging.getLogger("subtitle")
+
+_STATS_PUSH_SEC = 1.0     # 子进程向主进程推送 stats() 快照的间隔
+
+
+# ─── 子进程 ────────────────────────────────────────────────────────────────────
+
+class _RingSink:
+    """
+    把共享环形缓冲包装成 AudioCapture 所需的 audio_q 接口
+    （put_nowait / put / qsize / maxsize）。放不下时整块丢弃并抛 queue.Full，
+    与 queue.Queue 语义一致，丢弃计入 CaptureStats.drops["audio_q"]。
+    """
+
+    def __init__(self, ring: SharedRingBuffer):
+        self._ring   = ring
+        self.maxsize = ring.capacity // VAD_CHUNK
+
+    def qsize(self) -> int:
+        return len(self._ring) // VAD_CHUNK
+
+    def put_nowait(self, item):
+        if self._ring.free < len(item):
+            raise queue.Full
+        self._ring.write(item)
+
+    def put(self, item, timeout: float | None = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._ring.free < len(item):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise queue.Full
+            time.sleep(0.002)
+        self._ring.write(item)
+
+
+def _child_main(ring_name: str, capacity: int, block: int, method: str,
+                args: tuple, kwargs: dict, events, stop_evt):
+    """子进程入口：打开共享环形缓冲，启动采集，定期回传统计，直到 stop_evt 置位"""
+    from capture import AudioCapture
+
+    ring = SharedRingBuffer(capacity, block, name=ring_name, create=False)
+    cap  = AudioCapture(audio_q=_RingSink(ring),
+                        on_error=lambda msg: events.put(("error", msg)))
+    try:
+        getattr(cap, method)(*args, **kwargs)
+    except Exception as e:
+        events.put(("failed", f"{type(e).__name__}: {e}"))
+        ring.close()
+        return
+    events.put(("started", None))
+
+    file_done = getattr(cap, "file_done", None)
+    while not stop_evt.wait(_STATS_PUSH_SEC):
+        events.put(("stats", cap.stats()))
+        if file_done is not None and file_done.is_set():
+            events.put(("file_done", None))
+            file_done = None
+
+    cap.stop()
+    events.put(("stats", cap.stats()))
+    ring.close()
+
+
+# ─── 主进程侧 ──────────────────────────────────────────────────────────────────
+
+class CaptureProcess:
+    """
+    子进程采集的主进程代理，接口对齐 AudioCapture。
+
+    ring      : 共享环形缓冲（主进程为创建方），VAD 线程从这里读 16kHz mono 音频
+    file_done : start_file 模式下回放结束（含静音尾）后置位
+    on_error  : 子进程上报的设备错误在主进程的转发线程里回调
+
+    start_* 在子进程启动失败（设备打不开等）时抛 RuntimeError，与进程内模式一样
+    由调用方处理；子进程用 spawn 方式启动，不继承主进程已加载的模型和线程。
+    """
+
+    def __init__(self, on_error=None, capacity: int = SHM_RING_CAPACITY):
+        self._on_error = on_error
+        # block 与 VAD 批量打分一致，VAD 线程可一次取出多帧的连续视图
+        self.ring      = SharedRingBuffer(capacity, block=VAD_CHUNK * VAD_BATCH_FRAMES)
+        self.file_done = threading.Event()
+        self._ctx      = mp.get_context("spawn")
+        self._events   = self._ctx.Queue()
+        self._stop_evt = self._ctx.Event()
+        self._proc     = None
+        self._relay_t  = None
+        self._stats    = {}
+
+    # ── 启动（与 AudioCapture.start_* 同名同参）────────────────────────────────
+
+    def start_input(self, *args, **kwargs):
+        self._spawn("start_input", args, kwargs)
+
+    def start_loopback(self, *args, **kwargs):
+        self._spawn("start_loopback", args, kwargs)
+
+    def start_mic_aec(self, *args, **kwargs):
+        self._spawn("start_mic_aec", args, kwargs)
+
+    def start_mix(self, *args, **kwargs):
+        self._spawn("start_mix", args, kwargs)
+
+    def start_file(self, *args, **kwargs):
+        self._spawn("start_file", args, kwargs)
+
+    def _spawn(self, method: str, args: tuple, kwargs: dict):
+        if self._proc is not None:
+            raise RuntimeError("CaptureProcess 只能启动一次")
+        self._proc = self._ctx.Process(
+            target=_child_main,
+            args=(self.ring.name, self.ring.capacity, self.ring.block, method, args, kwargs,
+                  self._events, self._stop_evt),
+            daemon=True, name="capture-proc",
+        )
+        self._proc.start()
+        log.info("采集子进程已启动: pid=%s mode=%s", self._proc.pid, method)
+
+        # 等待子进程打开设备
+        deadline = time.monotonic() + CAPTURE_PROC_START_SEC
+        while True:
+            try:
+                kind, payload = self._events.get(timeout=0.2)
+            except queue.Empty:
+                if not self._proc.is_alive():
+                    self.ring.close()
+                    raise RuntimeError(f"采集子进程意外退出 (exitcode={self._proc.exitcode})")
+                if time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"采集子进程 {CAPTURE_PROC_START_SEC}s 内未就绪")
+                continue
+            if kind == "started":
+                break
+            if kind == "failed":
+                self._proc.join(timeout=2)
+                self.ring.close()
+                raise RuntimeError(payload)
+            self._dispatch(kind, payload)
+
+        self._relay_t = threading.Thread(target=self._relay, daemon=True, name="capture-relay")
+        self._relay_t.start()
+
+    # ── 子进程事件转发 ─────────────────────────────────────────────────────────
+
+    def _dispatch(self, kind: str, payload):
+        if kind == "stats":
+            self._stats = payload
+        elif kind == "error":
+            if self._on_error:
+                self._on_error(payload)
+        elif kind == "file_done":
+            self.file_done.set()
+
+    def _relay(self):
+        """子进程存活期间持续转发事件；子进程退出且队列取空后结束"""
+        while True:
+            try:
+                kind, payload = self._events.get(timeout=0.5)
+            except queue.Empty:
+                if not self._proc.is_alive():
+                    return
+                continue
+            self._dispatch(kind, payload)
+
+    # ── 统计 / 停止 ────────────────────────────────────────────────────────────
+
+    def stats(self) -> dict:
+        """子进程最近一次推送的 AudioCapture.stats()，附加子进程与共享环形缓冲状态"""
+        snap = dict(self._stats)
+        snap["process"] = {
+            "pid":   self._proc.pid if self._proc else None,
+            "alive": bool(self._proc and self._proc.is_alive()),
+        }
+        snap["shm_ring"] = {
+            "capacity":  self.ring.capacity,
+            "fill":      len(self.ring),
+            "overflows": self.ring.overflows,
+        }
+        return snap
+
+    def stop(self):
+        """通知子进程停止采集并等待退出；共享内存名字随即删除（映射在回收前仍可读）"""
+        self._stop_evt.set()
+        if self._proc is not None:
+            self._proc.join(timeout=3)
+            if self._proc.is_alive():
+                log.warning("采集子进程未按时退出，强制终止")
+                self._proc.terminate()
+                self._proc.join(timeout=1)
+        if self._relay_t is not None:
+            self._relay_t.join(timeout=1)     # 取走子进程最后一次推送的统计
+        log.info("[采集统计] 停止时（子进程）: %s", self._stats)
+        self.ring.unlink()
@@ -18,13 +18,108 @@ PREVIEW_INTERVAL_SEC = 0.5    # 说话中每隔 0.5s 提交一次预览推理请
 # 最终推理（sentence_end）仍使用完整 buf
 PREVIEW_WINDOW_SEC   = 4.0    # 预览最多取最近 4s 音频（恢复原值，实时感更好）
 
+# 推理线程池：每个线程持有独立的 SenseVoiceEngine（AutoModel.generate 会改写自身 kwargs，
+# 不能跨线程共享一个实例），模型内存随线程数线性增加；final 乱序完成时仍按说话顺序显示
+INFER_WORKERS      = 1
+
+# 推理子进程：SenseVoice 在独立进程加载与推理（主进程不再导入 torch / funasr），
+# 音频经共享内存交付、结果经 Pipe 返回；子进程崩溃 / 无响应时自动重启
+ENGINE_PROCESS        = False
+ENGINE_PROC_START_SEC = 180     # 等待子进程加载模型的超时（首次运行含模型下载）
+ENGINE_PROC_CALL_SEC  = 30      # 单次推理超过此时长无响应视为卡死，强制重启
+
+# preview 调速：按实测推理耗时（实时因子）与 final 积压，逐级放宽 preview 间隔 / 缩短窗口，
+# 最后一级之后暂停 preview；负载回落后逐级恢复
+PREVIEW_GOVERNOR   = True
+GOV_LEVELS         = (                       # (间隔 s, 窗口 s)，第 0 级即上面的静态配置
+    (PREVIEW_INTERVAL_SEC, PREVIEW_WINDOW_SEC),
+    (1.0, 4.0),
+    (1.5, 3.0),
+    (2.0, 2.0),
+)
+GOV_TARGET_UTIL    = 0.6      # 推理线程目标占用率（preview 预测耗时 / 间隔 + final 实时因子）
+GOV_RESTORE_MARGIN = 0.7      # 预测占用率低于 目标 × 此系数 才恢复上一级（回差，防止来回抖动）
+GOV_HOLD_SEC       = 3.0      # 两次恢复之间的最短间隔
+GOV_PROBE_SEC      = 10.0     # 暂停 preview 后每隔多久试探恢复一次（暂停期间没有 preview 耗时样本）
+GOV_BACKLOG        = 2        # 待处理 final 达到此数时直接升一级
+GOV_EMA            = 0.2      # 耗时滑动平均系数
+
+# 线程时间线（main.py --trace）：内存中最多保留的事件数，满了丢最早的
+# （每个事件约 200 字节；实时会话每秒约 150 个事件，20 万约覆盖 20 分钟）
+TRACE_CAPACITY     = 200_000
+
+# 冷启动：有界面时控制面板先显示，VAD / 模型在后台线程加载，加载后用合成音频预热一次推理
+# （算子 JIT、内存分配等一次性开销不落在第一句话上）；启动时间线见 startup.timeline
+WARMUP             = True
+WARMUP_SEC         = 3.0      # 预热音频时长
+
+# 模型快照（main.py --snapshot DIR）：第一次启动把 SenseVoice 的配置 / 分词器 / 权重整理到本地目录，
+# 之后从快照加载：不解析 ModelScope 缓存、不做随机初始化，权重 mmap 映射（多进程共享页缓存）
+MODEL_SNAPSHOT_DIR = None     # None = 不用快照，每次按原路径加载
+
+# 离线批量转写（batch.py）：整个文件先做 VAD 切段，再按时长排序打包，多段一次 model.generate
+BATCH_MAX_SEC      = 120      # 一批的补齐后总时长上限：段数 × 批内最长段（秒）
+BATCH_PAD_MS       = 200      # 字幕时间轴：每段前后各扩展的时长（不越过相邻段）
+BATCH_PAD_RATIO    = 0.75     # 同一批内最短段 / 最长段不低于此比例（补齐浪费 ≤ 25%）
+BATCH_VAD_FRAMES   = 1024     # 整文件 VAD 每次打分的帧数（~33s）
+
+# 多会话字幕服务器（main.py --serve）：各会话独立 VAD，共用一个引擎；推理线程取到第一条请求后
+# 再等 SERVER_BATCH_WAIT_MS，把期间各会话到达的请求合成一次批量推理
+SERVER_HOST            = "127.0.0.1"
+SERVER_PORT            = 8765
+SERVER_BATCH_WAIT_MS   = 5
+SERVER_BATCH_MAX       = 16     # 一批最多请求数
+SERVER_BATCH_MAX_SEC   = 12     # 一批补齐后的总时长上限（秒）：批越长，其后到达的 final 等得越久
+SERVER_MAX_FRAME       = 1 << 20   # 单帧负载上限（字节，约 32s 音频）：长度头超限即断开，不按它分配内存
+
+# 增量流式识别：同一语音段的 preview / final 复用已提取的 fbank 特征，
+# 连续两次结果一致的前缀即确认（local agreement），之后只重算未确认的尾部
+# （状态保存在引擎里，只在 INFER_WORKERS = 1 时生效：多线程下同一段会分散到不同引擎）
+ENGINE_STREAMING      = True
+STREAM_CONTEXT_SEC    = 0.6     # 重算窗口在确认位置之前保留的左侧上下文
+STREAM_GUARD_SEC      = 0.3     # 窗口末尾这段内结束的 token 暂不确认（可能被截断）
+STREAM_MAX_WINDOW_SEC = PREVIEW_WINDOW_SEC   # 未确认尾部超过此长度时，窗口外的部分强制确认
+STREAM_FINAL_FULL     = False   # True = final 仍整段重新识别（最准，长句开销大）
+
 # 噪声门控：整段 buf 的 RMS 低于此值时跳过最终推理（静音/呼吸声漏出 VAD）
 NOISE_GATE_RMS       = 0.002  # 约 -54 dBFS，低于正常说话声
 
+# 采集 / VAD 线程内的环形缓冲容量（采样数），替代 np.concatenate 累积
+RING_CAPACITY        = VAD_CHUNK * 128   # 约 4s @ 16kHz，足够吸收一次调度抖动
+
+# VAD 后端："onnx" = silero_vad.onnx + onnxruntime（缺失时自动退回）| "torch" = TorchScript
+VAD_BACKEND          = "onnx"
+VAD_BATCH_FRAMES     = 16     # VAD 循环一次最多取多少个已对齐帧一起打分（~0.5s）
+
+# VAD 能量预门控：长时间静音时跳过 Silero VAD（待机场景省 CPU），见 vad.EnergyGate
+VAD_GATE             = True
+GATE_IDLE_SEC        = 2.0    # VAD 未触发且帧能量持续低于 底噪 + GATE_CLOSE_DB 这么久 → 空闲
+GATE_CLOSE_DB        = 6.0
+GATE_OPEN_DB         = 10.0   # 空闲中帧能量超过 底噪 + 此值 → 唤醒（开 / 关阈值之间为回差）
+GATE_ZCR             = 0.25   # 空闲中能量超过 底噪 + GATE_CLOSE_DB 且过零率达到此值也唤醒（清擦音）
+GATE_MIN_DBFS        = -70.0  # 底噪估计下限（数字静音时阈值不会无限降低）
+GATE_LOOKBACK_MS     = 320    # 唤醒时先把空闲中最近这么长的帧交给 VAD，语音起始不丢
+# 唤醒时 VAD 模型先走过回看帧之前最多这么长的空闲音频（只推进状态，概率丢弃）：Silero 的 LSTM
+# 状态记忆很长，清零或停在进入空闲时的状态，判定都会偏离不开门控时（误触发 / 漏检），见 bench.py idle
+GATE_WARMUP_MS       = 16000
+
 # 回环音频参数
 LOOPBACK_SAMPLE_RATE = 48000  # Windows 输出设备原生采样率
 LOOPBACK_BLOCKSIZE   = 1536   # = 512 × 3，48kHz→16kHz resample 后恰好 512 samples
 
+# 回环回调 → DSP 线程（下混 + 重采样）
+DSP_RING_BLOCKS            = 32   # 原始交错采样环形缓冲可容纳的回调块数（48k 下约 1s）
+
+# 采集健康统计（帧数 / 丢帧 / xrun / 队列水位 / 回调耗时）写入日志的间隔
+CAPTURE_STATS_INTERVAL_SEC = 30
+
+# 采集子进程：AudioCapture 在独立进程运行，经共享内存环形缓冲把音频交给主进程，
+# 推理长时间占用 GIL 时音频回调不再被饿死
+CAPTURE_PROCESS        = False
+SHM_RING_CAPACITY      = VAD_CHUNK * 256   # 约 8s @ 16kHz
+SHM_POLL_MS            = 5                 # VAD 线程轮询共享环形缓冲的间隔
+CAPTURE_PROC_START_SEC = 15                # 等待子进程启动并打开设备的超时
+
 # 静音动画参数
 SILENCE_ANIM_THRESHOLD = 10   # 静音超过此秒数触发闪烁动画
 IDLE_CLEAR_SEC         = 120  # 静音超过此秒数自动清空字幕
@@ -46,3 +141,17 @@ DEVICE_REFRESH_MS = 3000
 # AEC 参数
 AEC_FILTER_BLOCKS = 8
 AEC_MU            = 0.01
+AEC_MDF_MU        = 0.3       # PartitionedBlockAEC 步长（按全部分区功率归一化，量级与 AEC_MU 不同）
+AEC_ENGINE        = "fdaf"    # "fdaf"=FreqDomainAEC（单块大 FFT）| "mdf"=PartitionedBlockAEC（分块，长回声尾更省）
+
+# FreqDomainAEC 远端活动 / 双讲门控
+AEC_GATE            = True
+AEC_REF_SILENCE_RMS = 1e-4    # 约 -80 dBFS：参考窗口低于此值视为无远端声音，整块跳过
+AEC_DTD_GEIGEL      = 0.5     # Geigel 双讲阈值：max|mic| 超过参考峰值的此倍数时暂停自适应
+
+# 双流对齐 / 时钟漂移补偿（AEC、混音模式）
+ALIGN_DRIFT_TC_SEC  = 60      # 采样率回归的时间常数（秒），越长越稳、跟踪越慢
+ALIGN_WARMUP_SEC    = 10      # 观测满此时长后才开始补偿漂移
+ALIGN_MAX_DRIFT_PPM = 1000    # 漂移估计限幅（正常声卡 < 200ppm）
+ALIGN_GAP_SEC       = 0.1     # 回调间隔超出块时长此值视为断流（回环无声时会停回调）
+ALIGN_MAX_WAIT_MS   = 96      # 参考信号滞后时麦克风最多等待多久再用零填充
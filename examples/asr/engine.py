@@ -1,16 +1,186 @@
 #!/usr/bin/env python3
-"""SenseVoice-Small 语音识别引擎（中英双语，内置标点）"""
+"""
+SenseVoice-Small 语音识别引擎（中英双语，内置标点）
 
+  transcribe        : 整段推理一次（funasr AutoModel.generate）
+  transcribe_stream : 同一语音段反复调用的增量模式（preview 每 0.5s 一次 + final）
+  transcribe_many   : 多段音频按长度排序分批，每批一次 model.generate（离线转写 / 多会话）
+
+SenseVoice 编码器是整句自注意力，编码器状态无法跨调用复用；增量模式复用的是
+  - 前端 fbank 特征：逐帧独立，只对新到的采样计算，缓存到段结束
+  - 已确认的文本前缀：CTC 贪心解码自带逐帧对齐，连续两次解码一致、且不在窗口末尾
+    STREAM_GUARD_SEC 内的 token 即确认（local agreement），记下其结束帧；
+    之后每次只把 [确认位置 - STREAM_CONTEXT_SEC, 当前末尾] 送进编码器
+
+模型快照（snapshot=目录）：第一次按原路径从 ModelScope 缓存加载后，把配置 / 分词器 / cmvn
+和权重整理到该目录；之后直接从快照建图（跳过缓存解析与随机初始化），权重用 mmap 映射
+进来原地作为参数 —— 不再读入私有内存，同一台机器上的多个进程共享同一份页缓存。
+"""
+
+import os
+import json
+import time
+import shutil
 import logging
+import tempfile
+import threading
+from contextlib import contextmanager
 
 import numpy as np
 import torch
 from funasr import AutoModel
 
-from config import SENSEVOICE_MODEL
+from config import (
+    SENSEVOICE_MODEL,
+    SAMPLE_RATE,
+    PREVIEW_WINDOW_SEC,
+    STREAM_CONTEXT_SEC,
+    STREAM_GUARD_SEC,
+    STREAM_MAX_WINDOW_SEC,
+    STREAM_FINAL_FULL,
+    BATCH_MAX_SEC,
+    BATCH_PAD_RATIO,
+    MODEL_SNAPSHOT_DIR,
+)
 
 log = logging.getLogger("subtitle")
 
+# SenseVoice 前端：fbank 帧移 10ms / 帧长 25ms，LFR 每 6 帧拼 1 帧 → 编码器每帧 60ms
+_HOP     = SAMPLE_RATE // 100
+_WIN     = SAMPLE_RATE * 25 // 1000
+_LFR_N   = 6
+_N_QUERY = 4          # 编码器输入前拼接的 language / event / emotion / textnorm 查询帧
+
+
+def _sec_to_lfr(sec: float) -> int:
+    return int(round(sec * SAMPLE_RATE / (_HOP * _LFR_N)))
+
+
+def pack_batches(lengths: list[int], max_samples: int, pad_ratio: float = 0.0) -> list[list[int]]:
+    """
+    按长度升序把下标分批：批内段数 × 最长段 ≤ max_samples，且最短段 ≥ 最长段 × pad_ratio
+    （单段超限时独占一批）。排序后相邻段长度接近，补齐到最长段的浪费最小。
+    """
+    batches, cur = [], []
+    for i in sorted(range(len(lengths)), key=lengths.__getitem__):
+        if cur and (lengths[i] * (len(cur) + 1) > max_samples
+                    or lengths[cur[0]] < lengths[i] * pad_ratio):
+            batches.append(cur)
+            cur = []
+        cur.append(i)
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+# ─── 模型快照 ──────────────────────────────────────────────────────────────────
+
+_SNAPSHOT_MANIFEST = "snapshot.json"
+_SNAPSHOT_WEIGHTS  = "weights.pt"
+
+# 建图互斥：_skip_init 临时替换的是全局的 torch.nn.init，不能与其他线程的建图重叠
+_build_lock = threading.Lock()
+
+
+@contextmanager
+def _skip_init():
+    """建图期间 torch.nn.init.* 为空操作：权重随后整体被快照替换，随机初始化纯属浪费"""
+    init  = torch.nn.init
+    names = [n for n in dir(init) if n.endswith("_") and not n.startswith("_")]
+    saved = {n: getattr(init, n) for n in names}
+    for n in names:
+        setattr(init, n, lambda tensor, *args, **kwargs: tensor)
+    try:
+        yield
+    finally:
+        for n, fn in saved.items():
+            setattr(init, n, fn)
+
+
+def snapshot_ok(path: str) -> bool:
+    """path 是否为当前 SENSEVOICE_MODEL 的完整快照（清单最后写入，存在即完整）"""
+    try:
+        with open(os.path.join(path, _SNAPSHOT_MANIFEST), encoding="utf-8") as f:
+            return json.load(f).get("model") == SENSEVOICE_MODEL
+    except (OSError, ValueError):
+        return False
+
+
+def _snapshot_replaceable(path: str) -> bool:
+    """path 是空目录，或带清单的快照目录（任意模型）：可以整体替换"""
+    if not os.path.isdir(path):
+        return False
+    names = os.listdir(path)
+    return not names or _SNAPSHOT_MANIFEST in names
+
+
+def write_snapshot(model: AutoModel, path: str):
+    """
+    把已加载的 AutoModel 整理成快照目录：模型目录里除 model.pt 外的文件（配置 / 分词器 /
+    cmvn）原样复制，权重以 state_dict 重新保存为 weights.pt（torch.save 的 zip 格式，可 mmap），
+    最后写清单。先写到同级临时目录再改名，并发写入或中途退出都不会留下半个快照。
+    path 已存在时只替换旧快照（有清单）或空目录；其他非空目录拒绝写入，不会删除用户文件。
+    """
+    src = model.kwargs.get("model_path")
+    if not src or not os.path.isdir(src):
+        raise RuntimeError(f"找不到模型目录: {src!r}")
+    path   = os.path.abspath(path)
+    if os.path.exists(path) and not _snapshot_replaceable(path):
+        raise RuntimeError(f"{path} 已存在且不是模型快照目录，拒绝覆盖（请指定新目录）")
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".snapshot-", dir=parent)
+    try:
+        for name in os.listdir(src):
+            if name != "model.pt" and os.path.isfile(os.path.join(src, name)):
+                shutil.copy2(os.path.join(src, name), tmp)
+        state = {k: v.detach().cpu() for k, v in model.model.state_dict().items()}
+        torch.save(state, os.path.join(tmp, _SNAPSHOT_WEIGHTS))
+        with open(os.path.join(tmp, _SNAPSHOT_MANIFEST), "w", encoding="utf-8") as f:
+            json.dump({"model": SENSEVOICE_MODEL, "source": src, "torch": torch.__version__,
+                       "tensors": len(state), "created": time.strftime("%Y-%m-%d %H:%M:%S")},
+                      f, ensure_ascii=False, indent=1)
+        if os.path.isdir(path) and not snapshot_ok(path):
+            if not _snapshot_replaceable(path):      # 写入期间目录里多了别的文件
+                raise RuntimeError(f"{path} 已存在且不是模型快照目录，拒绝覆盖")
+            shutil.rmtree(path)                      # 其他模型 / 旧版本的快照，或空目录
+        os.replace(tmp, path)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not snapshot_ok(path):                    # 另一个进程抢先写好了就不算失败
+            raise
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def load_snapshot(path: str, device: str) -> AutoModel:
+    """
+    从快照建 AutoModel：快照目录没有 model.pt，AutoModel 只建图、不加载权重；
+    随后 weights.pt 以 mmap 方式载入，assign=True 让参数直接引用映射的页（不复制）。
+    需要 torch >= 2.1（mmap / assign）；权重与模型结构不一致时抛异常。
+    """
+    with _build_lock, _skip_init():
+        model = AutoModel(model=path, device=device, disable_update=True, disable_log=True)
+    state = torch.load(os.path.join(path, _SNAPSHOT_WEIGHTS), map_location="cpu",
+                       mmap=True, weights_only=True)
+    model.model.load_state_dict(state, strict=True, assign=True)
+    if device != "cpu":
+        model.model.to(device)
+    model.model.eval()
+    return model
+
+
+class _StreamState:
+    """一个语音段的增量识别状态"""
+
+    def __init__(self, seg):
+        self.seg        = seg
+        self.fbank      = None   # (T, 80) 已提取的 fbank 帧（torch，CPU）
+        self.committed  = []     # 已确认的 token id
+        self.commit_lfr = 0      # 已确认部分结束后的第一个 LFR 帧（段内绝对位置）
+        self.pending    = []     # 上次解码中确认位置之后的 (token, 起始帧, 结束帧)
+
 
 class SenseVoiceEngine:
     """
@@ -19,17 +189,44 @@ class SenseVoiceEngine:
     支持中文、英文及中英混用，自动语言检测。
     """
 
-    def __init__(self):
+    def __init__(self, snapshot: str | None = MODEL_SNAPSHOT_DIR):
+        """snapshot: 模型快照目录（见模块说明），None = 每次按原路径加载"""
         log.info("正在加载 SenseVoice 模型，请稍候...")
         try:
             self._device = "cuda" if torch.cuda.is_available() else "cpu"
-            self.model = AutoModel(
-                model=SENSEVOICE_MODEL,
-                device=self._device,
-                disable_update=True,
-                disable_log=True,
-            )
-            log.info("SenseVoice 模型加载完成 (device=%s)", self._device)
+            self.model   = None
+            self.source  = "hub"
+            if snapshot and snapshot_ok(snapshot):
+                try:
+                    self.model  = load_snapshot(snapshot, self._device)
+                    self.source = "snapshot"
+                except Exception as e:
+                    log.warning("模型快照加载失败，改按原路径加载: %s", e)
+            if self.model is None:
+                with _build_lock:
+                    self.model = AutoModel(
+                        model=SENSEVOICE_MODEL,
+                        device=self._device,
+                        disable_update=True,
+                        disable_log=True,
+                    )
+                if snapshot and not snapshot_ok(snapshot):
+                    t0 = time.perf_counter()
+                    try:
+                        write_snapshot(self.model, snapshot)
+                        log.info("模型快照已写入 %s（%.1fs）", snapshot, time.perf_counter() - t0)
+                    except Exception as e:
+                        log.warning("模型快照写入失败（不影响本次运行）: %s", e)
+            log.info("SenseVoice 模型加载完成 (device=%s, 来源=%s)", self._device, self.source)
+
+            # 增量识别直接调用底层模块：SenseVoiceSmall / WavFrontend / tokenizer
+            self._sv         = self.model.model
+            self._frontend   = self.model.kwargs.get("frontend")
+            self._tokenizer  = self.model.kwargs.get("tokenizer")
+            self._stream_ok  = self._frontend is not None and self._tokenizer is not None
+            self._stream     = None
+            self._batch_ok   = True
+            self.last_batches = []   # 最近一次 transcribe_many 的每批统计
         except Exception as e:
             log.exception("SenseVoice 模型加载失败: %s", e)
             raise
@@ -58,6 +255,169 @@ class SenseVoiceEngine:
             log.warning("SenseVoice 推理异常: %s", e)
         return ""
 
+    def transcribe_batch(self, audios: list[np.ndarray]) -> list[str]:
+        """
+        多段音频一次 model.generate（SenseVoice 在批内补齐到最长段），按输入顺序返回文本
+        （含 SenseVoice 标签）。批内各段长度应相近，补齐的部分同样要算。
+        """
+        if not audios:
+            return []
+        result = self.model.generate(
+            input=list(audios),
+            cache={},
+            language="auto",
+            use_itn=True,
+            batch_size=len(audios),
+        )
+        if len(result) != len(audios):
+            raise RuntimeError(f"批量推理返回 {len(result)} 条结果，输入 {len(audios)} 段")
+        return [r.get("text", "").strip() for r in result]
+
+    def transcribe_many(self, audios: list[np.ndarray], max_sec: float = BATCH_MAX_SEC,
+                        pad_ratio: float = BATCH_PAD_RATIO) -> list[str]:
+        """
+        多段音频批量推理，按输入顺序返回文本（含 SenseVoice 标签）。
+
+        按长度排序分批（见 pack_batches），每批一次 transcribe_batch。每批的段数、最长段、
+        补齐占比与耗时记入 last_batches 并写 debug 日志。批量接口不可用时
+        （funasr 版本差异等）退回逐段 transcribe，之后不再尝试。
+        """
+        out = [""] * len(audios)
+        self.last_batches = []
+        for idx in pack_batches([len(a) for a in audios], int(max_sec * SAMPLE_RATE), pad_ratio):
+            clips = [audios[i] for i in idx]
+            t0    = time.perf_counter()
+            texts = None
+            if self._batch_ok and len(clips) > 1:
+                try:
+                    texts = self.transcribe_batch(clips)
+                except Exception as e:
+                    self._batch_ok = False
+                    log.warning("批量推理不可用，退回逐段推理: %s", e)
+            if texts is None:
+                texts = [self.transcribe(c) for c in clips]
+            for i, text in zip(idx, texts):
+                out[i] = text
+
+            longest = max(len(c) for c in clips)
+            stat = {
+                "n":       len(clips),
+                "max_sec": round(longest / SAMPLE_RATE, 2),
+                "pad":     0.0 if longest == 0 else
+                           round(1 - sum(len(c) for c in clips) / (longest * len(clips)), 3),
+                "sec":     round(time.perf_counter() - t0, 3),
+            }
+            self.last_batches.append(stat)
+            log.debug("[批量] %d 段 × ≤%.1fs（补齐 %.0f%%）: %.0fms",
+                      stat["n"], stat["max_sec"], stat["pad"] * 100, stat["sec"] * 1e3)
+        return out
+
     def reset(self):
-        """SenseVoice 无状态，每次 generate 独立，此方法仅保留接口兼容"""
-        pass
+        """丢弃增量识别状态（整段推理本身无状态）"""
+        self._stream = None
+
+    # ── 增量流式识别 ──────────────────────────────────────────────────────────
+
+    def transcribe_stream(self, seg, audio: np.ndarray, final: bool = False) -> str:
+        """
+        增量识别同一语音段：audio 是该段从头到目前为止的全部采样（每次调用只增不减），
+        seg 为段标识，变化时自动开始新段；final=True 输出整段结果并结束该段。
+
+        返回格式与 transcribe 相同（含 SenseVoice 标签）。底层接口不可用时
+        （funasr 版本差异等）退回整段推理：preview 只取末尾 PREVIEW_WINDOW_SEC 秒。
+
+        final 总是覆盖整段：本引擎没见过该段的 preview（preview 被更新的顶替、调速暂停、
+        由别的推理线程 / 重启前的子进程处理）时，状态是新的，直接整段推理。
+        """
+        if self._stream is None or self._stream.seg != seg:
+            self._stream = _StreamState(seg)
+        st = self._stream
+        if final:
+            self._stream = None
+            if not st.committed and len(audio) > STREAM_MAX_WINDOW_SEC * SAMPLE_RATE:
+                return self.transcribe(audio)
+
+        if self._stream_ok and not (final and STREAM_FINAL_FULL):
+            try:
+                with torch.inference_mode():
+                    return self._stream_step(st, audio, final)
+            except Exception as e:
+                self._stream_ok = False
+                log.warning("增量识别不可用，退回整段推理: %s", e)
+        if not final:
+            audio = audio[-int(PREVIEW_WINDOW_SEC * SAMPLE_RATE):]
+        return self.transcribe(audio)
+
+    def _stream_step(self, st: _StreamState, audio: np.ndarray, final: bool) -> str:
+        # ── 1. fbank 只算新增的完整帧 ────────────────────────────────────────
+        done  = 0 if st.fbank is None else len(st.fbank)
+        total = 1 + (len(audio) - _WIN) // _HOP if len(audio) >= _WIN else 0
+        if total > done:
+            wav = torch.from_numpy(np.ascontiguousarray(audio[done * _HOP:(total - 1) * _HOP + _WIN]))
+            fb, _ = self._frontend.forward_fbank(wav[None, :], torch.tensor([len(wav)]))
+            fb = fb[0]
+            st.fbank = fb if st.fbank is None else torch.cat([st.fbank, fb])
+        if st.fbank is None:
+            return ""
+
+        # ── 2. 窗口：确认位置前留 STREAM_CONTEXT_SEC 上下文；preview 尾部过长时强制确认
+        #       （final 不截窗口：一直解码到段末，未确认的部分一个不丢）──────────────
+        n_lfr = -(-len(st.fbank) // _LFR_N)
+        start = max(0, st.commit_lfr - _sec_to_lfr(STREAM_CONTEXT_SEC))
+        if not final and n_lfr - start > _sec_to_lfr(STREAM_MAX_WINDOW_SEC):
+            start = n_lfr - _sec_to_lfr(STREAM_MAX_WINDOW_SEC)
+            keep  = [t for t in st.pending if t[2] < start]
+            self._commit(st, keep)
+
+        # ── 3. 编码 + CTC 贪心解码（带逐帧位置）──────────────────────────────
+        tags, hyp = self._decode(st.fbank[start * _LFR_N:], start)
+        hyp = [t for t in hyp if t[1] >= st.commit_lfr]
+
+        if final:
+            tokens = st.committed + [t[0] for t in hyp]
+        else:
+            # ── 4. local agreement：与上次一致、且不在窗口末尾的前缀确认 ─────────
+            guard = n_lfr - _sec_to_lfr(STREAM_GUARD_SEC)
+            k = 0
+            while (k < min(len(hyp), len(st.pending))
+                   and hyp[k][0] == st.pending[k][0] and hyp[k][2] < guard):
+                k += 1
+            self._commit(st, hyp[:k])
+            st.pending = hyp[k:]
+            tokens = st.committed + [t[0] for t in st.pending]
+
+        return self._tokenizer.decode(tags + tokens).strip()
+
+    @staticmethod
+    def _commit(st: _StreamState, toks: list):
+        if toks:
+            st.committed.extend(t[0] for t in toks)
+            st.commit_lfr = toks[-1][2] + 1
+
+    def _decode(self, fbank: torch.Tensor, offset: int) -> tuple[list, list]:
+        """
+        与 SenseVoiceSmall.inference 相同的查询拼接 + 编码 + CTC 贪心解码，
+        返回 (标签 token, [(token, 起始 LFR 帧, 结束 LFR 帧), ...])，帧号加上 offset。
+        """
+        m, dev = self._sv, self._device
+        feats, lens = self._frontend.forward_lfr_cmvn(fbank[None], torch.tensor([len(fbank)]))
+        feats = feats.to(dev)
+
+        embed = lambda ids: m.embed(torch.LongTensor([ids]).to(dev))
+        speech = torch.cat((embed([m.lid_dict["auto"]]), embed([1, 2]),
+                            embed([m.textnorm_dict["withitn"]]), feats), dim=1)
+        enc, enc_lens = m.encoder(speech, (lens + _N_QUERY).to(dev))
+        if isinstance(enc, tuple):
+            enc = enc[0]
+        ids = m.ctc.log_softmax(enc)[0, :enc_lens[0]].argmax(dim=-1).cpu().numpy()
+
+        blank = m.blank_id
+        tags  = [int(i) for i in ids[:_N_QUERY] if i != blank]
+        sp    = ids[_N_QUERY:]
+        if len(sp) == 0:
+            return tags, []
+        edges  = np.flatnonzero(np.r_[True, sp[1:] != sp[:-1]])
+        ends   = np.r_[edges[1:], len(sp)] - 1
+        hyp = [(int(sp[s]), s + offset, e + offset)
+               for s, e in zip(edges, ends) if sp[s] != blank]
+        return tags, hyp
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+推理子进程：SenseVoice 模型在独立进程里加载与推理
+
+主进程里 model.generate 是大段 Python + torch 调用，与 Tk 主循环、VAD 线程、
+采集回调争抢 GIL。EngineProcess 对外接口与 SenseVoiceEngine 相同
+（transcribe / transcribe_stream / reset），主进程不再导入 torch / funasr：
+
+  音频 : 写入主进程创建的共享内存（不经 pickle）；同一语音段的增量调用只追加新采样
+  请求 : Pipe 发送 (op, 采样数, seg, final)，子进程直接在共享内存视图上推理
+  结果 : 同一 Pipe 回传文本
+
+子进程崩溃或超过 ENGINE_PROC_CALL_SEC 无响应时强制重启并重试一次；
+restart() 为热重启：新进程在后台加载完成后再替换旧进程，期间请求仍由旧进程处理
+（仅 API：界面 / 命令行目前没有调用它的入口）。
+"""
+
+import os
+import atexit
+import logging
+import threading
+import importlib
+import multiprocessing as mp
+
+import numpy as np
+
+from config import SAMPLE_RATE, MAX_SEG_SEC, ENGINE_PROC_START_SEC, ENGINE_PROC_CALL_SEC
+
+log = logging.getLogger("subtitle")
+
+
+# ─── 子进程 ────────────────────────────────────────────────────────────────────
+
+def _attach(name: str, capacity: int):
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(capacity, dtype=np.float32, buffer=shm.buf)
+
+
+def _server_main(conn, factory: str, kwargs: dict, threads: int | None):
+    """
+    子进程入口：按 "模块:类名"(**kwargs) 创建引擎，之后逐条处理 Pipe 上的请求直到 stop / 断开。
+    共享内存在 ready 之后由主进程发来（"shm" 消息）：加载模型期间主进程可能已换了更大的一块。
+    """
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    try:
+        module, _, attr = factory.partition(":")
+        engine = getattr(importlib.import_module(module), attr)(**kwargs)
+    except Exception as e:
+        conn.send(("failed", f"{type(e).__name__}: {e}"))
+        return
+    shm, audio = None, None
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            break
+        op = msg[0]
+        if op == "stop":
+            break
+        if op == "shm":           # 首次交付 / 主进程换了更大的共享内存
+            if shm is not None:
+                del audio
+                shm.close()
+            shm, audio = _attach(*msg[1:])
+            continue
+        if op == "reset":
+            engine.reset()
+            continue
+
+        _, n, seg, final = msg
+        try:
+            if op == "stream":
+                text = engine.transcribe_stream(seg, audio[:n], final=final)
+            else:
+                text = engine.transcribe(audio[:n])
+            conn.send(("ok", text))
+        except Exception as e:
+            conn.send(("err", f"{type(e).__name__}: {e}"))
+
+    if shm is not None:
+        del audio
+        shm.close()
+
+
+# ─── 主进程侧 ──────────────────────────────────────────────────────────────────
+
+class _Server:
+    """一个推理子进程及其 Pipe"""
+
+    def __init__(self, ctx, factory: str, kwargs: dict, threads: int | None):
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_server_main,
+                                args=(child, factory, kwargs, threads),
+                                daemon=True, name="engine-proc")
+        self.proc.start()
+        child.close()
+
+    def wait_ready(self):
+        """等待子进程加载完模型；失败 / 超时抛 RuntimeError"""
+        if not self.conn.poll(ENGINE_PROC_START_SEC):
+            self.kill()
+            raise RuntimeError(f"推理子进程 {ENGINE_PROC_START_SEC}s 内未就绪")
+        try:
+            kind, payload = self.conn.recv()
+        except EOFError:
+            self.proc.join(timeout=1)
+            raise RuntimeError(f"推理子进程意外退出 (exitcode={self.proc.exitcode})")
+        if kind != "ready":
+            self.proc.join(timeout=2)
+            raise RuntimeError(payload)
+
+    def close(self):
+        try:
+            self.conn.send(("stop",))
+        except (OSError, ValueError):
+            pass
+        self.proc.join(timeout=3)
+        if self.proc.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self):
+        self.proc.kill()
+        self.proc.join(timeout=1)
+
+
+class EngineProcess:
+    """
+    子进程版 SenseVoiceEngine，接口相同，可直接交给 RealtimeSubtitle
+    （多推理线程时每个线程一个 EngineProcess，即一个子进程）。
+
+    factory  : 子进程里创建引擎的 "模块:类名"
+    kwargs   : 构造引擎的关键字参数（如 {"snapshot": 目录}，须可 pickle），None = 无参构造
+    threads  : 子进程 torch 计算线程数，None = torch 默认
+    capacity : 共享内存初始容量（采样数），更长的音频到来时自动换更大的一块
+
+    同一实例的调用串行执行（子进程一次只处理一个请求）。
+    """
+
+    def __init__(self, factory: str = "engine:SenseVoiceEngine", threads: int | None = None,
+                 capacity: int = (MAX_SEG_SEC + 1) * SAMPLE_RATE, kwargs: dict | None = None):
+        self._factory  = factory
+        self._kwargs   = kwargs or {}
+        self._threads  = threads
+        self._ctx      = mp.get_context("spawn")
+        self._lock     = threading.Lock()
+        self._shm      = None
+        self._seg      = None     # 共享内存里现存音频所属的语音段（增量调用）
+        self._copied   = 0        # 该段已写入共享内存的采样数
+        self.restarts  = 0
+        self.calls     = 0
+        self._alloc(capacity)
+
+        log.info("正在启动推理子进程...")
+        self._server = self._start_server()
+        log.info("推理子进程就绪: pid=%s", self._server.proc.pid)
+        atexit.register(self.close)
+
+    # ── 共享内存 / 子进程管理 ──────────────────────────────────────────────────
+
+    def _alloc(self, capacity: int):
+        from multiprocessing import shared_memory
+        old = self._shm
+        self._shm      = shared_memory.SharedMemory(create=True, size=capacity * 4)
+        self._buf      = np.ndarray(capacity, dtype=np.float32, buffer=self._shm.buf)
+        self._capacity = capacity
+        self._seg      = None
+        if old is not None:
+            old.close()
+            old.unlink()
+
+    def _start_server(self) -> _Server:
+        """拉起子进程并等它就绪，然后交付当前的共享内存（调用方持有 _lock 或尚未对外服务）"""
+        server = _Server(self._ctx, self._factory, self._kwargs, self._threads)
+        server.wait_ready()
+        server.conn.send(("shm", self._shm.name, self._capacity))
+        return server
+
+    def restart(self):
+        """
+        热重启：新子进程加载完成后替换旧进程（加载期间旧进程继续服务）。
+        仅 API，界面 / 命令行目前没有入口调用它。
+        """
+        log.info("推理子进程热重启...")
+        new = _Server(self._ctx, self._factory, self._kwargs, self._threads)
+        new.wait_ready()
+        with self._lock:
+            # 加载期间共享内存可能已扩容：交付替换时刻的那一块
+            new.conn.send(("shm", self._shm.name, self._capacity))
+            old, self._server = self._server, new
+            self._seg = None
+            self.restarts += 1
+        old.close()
+        log.info("推理子进程热重启完成: pid=%s", new.proc.pid)
+
+    def _crash_restart(self):
+        """子进程已退出或卡死：强制结束并同步拉起新进程（调用方持有 _lock）"""
+        self._server.kill()
+        self._server.conn.close()
+        self._seg = None
+        self._server = self._start_server()
+        self.restarts += 1
+        log.info("推理子进程已重启: pid=%s（累计 %d 次）", self._server.proc.pid, self.restarts)
+
+    # ── 推理接口（与 SenseVoiceEngine 相同）────────────────────────────────────
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        with self._lock:
+            return self._call("full", audio, None, False)
+
+    def transcribe_stream(self, seg, audio: np.ndarray, final: bool = False) -> str:
+        with self._lock:
+            return self._call("stream", audio, seg, final)
+
+    def reset(self):
+        with self._lock:
+            self._seg = None
+            try:
+                self._server.conn.send(("reset",))
+            except OSError:
+                pass
+
+    def _call(self, op: str, audio: np.ndarray, seg, final: bool) -> str:
+        n    = len(audio)
+        grow = n > self._capacity
+        if grow:
+            self._alloc(max(n, self._capacity * 2))
+
+        # 同一段的增量调用：audio 只增不减，只写入新增部分
+        start = 0
+        if op == "stream" and seg == self._seg and n >= self._copied > 0 \
+                and self._buf[self._copied - 1] == audio[self._copied - 1]:
+            start = self._copied
+        self._buf[start:n] = audio[start:]
+        self._seg, self._copied = (seg, n) if op == "stream" and not final else (None, 0)
+
+        for attempt in range(2):
+            conn = self._server.conn
+            try:
+                if grow:                      # 换了更大的共享内存（子进程已死时同样走重启）
+                    conn.send(("shm", self._shm.name, self._capacity))
+                    grow = False
+                conn.send((op, n, seg, final))
+                if not conn.poll(ENGINE_PROC_CALL_SEC):
+                    raise TimeoutError(f"{ENGINE_PROC_CALL_SEC}s 无响应")
+                kind, payload = conn.recv()
+            except (EOFError, OSError, TimeoutError) as e:
+                log.error("推理子进程失效（%s: %s），重启后%s", type(e).__name__, e,
+                          "重试" if attempt == 0 else "放弃本次请求")
+                self._crash_restart()         # 新子进程启动时已交付当前共享内存
+                grow = False
+                if op == "stream" and final:
+                    op = "full"               # 新子进程没有该段的增量状态：final 整段推理
+                continue
+            if kind == "ok":
+                self.calls += 1
+                return payload
+            log.warning("推理子进程异常: %s", payload)
+            return ""
+        return ""
+
+    # ── 统计 / 关闭 ────────────────────────────────────────────────────────────
+
+    def stats(self) -> dict:
+        proc = self._server.proc if self._server else None
+        return {
+            "pid":          proc.pid if proc else None,
+            "alive":        bool(proc and proc.is_alive()),
+            "restarts":     self.restarts,
+            "calls":        self.calls,
+            "shm_capacity": self._capacity,
+        }
+
+    def close(self):
+        """停止子进程并删除共享内存（可重复调用）"""
+        with self._lock:
+            if self._server is not None:
+                self._server.close()
+                self._server = None
+            if self._shm is not None:
+                del self._buf
+                self._shm.close()
+                self._shm.unlink()
+                self._shm = None
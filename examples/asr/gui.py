@@ -13,6 +13,7 @@ from config import (
     SILENCE_ANIM_THRESHOLD, IDLE_CLEAR_SEC,
 )
 from capture import list_input_devices, list_loopback_devices
+from tracing import tracer
 
 log = logging.getLogger("subtitle")
 
@@ -97,8 +98,11 @@ def build_subtitle_window(root: tk.Tk, subtitle,
 
     # 100ms 轮询：只显示流式文字，不显示历史字幕
     def refresh():
+        t0 = time.perf_counter()
         _, pending = subtitle.get_display()
         _redraw(pending)
+        subtitle.mark_drawn()
+        tracer.complete("gui:refresh", t0)
         win.after(100, refresh)
 
     win.after(100, refresh)
@@ -111,6 +115,7 @@ class ControlPanel:
     """
     音频源切换（麦克风 / 系统声音回环 / AEC）+ 设备选择 + 开始/停止控制。
     停止状态下每 3 秒自动刷新设备列表；长时间静音时状态点闪烁提示。
+    模型在后台加载时先禁用开始按钮，状态行显示加载进度，就绪后恢复。
     """
 
     _DOT = {
@@ -142,6 +147,8 @@ class ControlPanel:
         self._refresh_devices()
         self._schedule_auto_refresh()
         self._schedule_anim_tick()
+        self._load_t0 = time.monotonic()
+        self._poll_load()
 
     # ── UI 构建 ────────────────────────────────────────────────────────────────
 
@@ -326,6 +333,23 @@ class ControlPanel:
             self._refresh_devices()
         self.root.after(DEVICE_REFRESH_MS, self._schedule_auto_refresh)
 
+    # ── 模型加载进度（loader 线程写状态，这里 5Hz 轮询）──────────────────────
+
+    def _poll_load(self):
+        sub = self.subtitle
+        if sub.load_error is not None:
+            self._set_status("error", f"模型加载失败: {str(sub.load_error)[:40]}")
+            return
+        if sub.ready.is_set():
+            self.btn_start.config(state=tk.NORMAL)
+            if not self.running:
+                self._set_status("ready", "就绪，请选择设备后开始")
+            return
+        self.btn_start.config(state=tk.DISABLED)
+        elapsed = time.monotonic() - self._load_t0
+        self._set_status("warn", f"{sub.load_status or '正在加载...'}  {elapsed:.0f}s")
+        self.root.after(200, self._poll_load)
+
     # ── 静音动画定时器（1Hz）──────────────────────────────────────────────────
 
     def _schedule_anim_tick(self):
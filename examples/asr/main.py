@@ -6,11 +6,22 @@
   - 支持麦克风输入、系统声音回环、回声消除（AEC）三种音频源
   - SenseVoice-Small 引擎：中英双语，内置标点，VAD 触发推理
   - DPI 自适应字幕窗口定位
+  - --file 无界面回放音频文件，逐句打印字幕（离线测试 / CI 用）
+  - --transcribe 离线批量转写录音文件为 SRT / VTT / JSONL（整文件 VAD + 批量推理，远快于实时）
+  - --serve 多会话字幕服务器：多路 PCM 流共用一个引擎，跨会话合批推理（见 server.py）
+  - --engine-process 模型放到推理子进程，界面进程不再与推理争抢 GIL
+  - 冷启动：控制面板立即显示，模型在后台加载并预热；日志给出启动时间线与首条字幕时间
+  - --snapshot 模型快照：首次加载后写入本地目录，之后 mmap 加载（更快，多进程共享权重页）
 """
 
+import time
+_T0 = time.perf_counter()   # 启动时间线零点（见 startup.timeline）
+
 import os
 import sys
+import argparse
 import logging
+import multiprocessing
 
 # ── 镜像 & 模型缓存路径（必须在导入 funasr / modelscope 之前设置）──────────────
 os.environ.setdefault("HF_ENDPOINT", "https://hf-mirror.com")
@@ -28,13 +39,15 @@ if "MODELSCOPE_CACHE" not in os.environ:
         os.environ["MODELSCOPE_CACHE"] = _sys_drive + "\\modelscope_models"
 
 # ── 日志配置 ──────────────────────────────────────────────────────────────────
+# 采集 / 推理子进程（spawn）会重新导入本模块：只有主进程截断日志文件
+_is_child = multiprocessing.parent_process() is not None
 _log_fmt = "%(asctime)s [%(levelname)s] %(threadName)s - %(message)s"
 logging.basicConfig(
     level=logging.DEBUG,
     format=_log_fmt,
     handlers=[
         logging.StreamHandler(sys.stdout),
-        logging.FileHandler("subtitle.log", encoding="utf-8", mode="w"),
+        logging.FileHandler("subtitle.log", encoding="utf-8", mode="a" if _is_child else "w"),
     ],
 )
 log = logging.getLogger("subtitle")
@@ -48,27 +61,126 @@ for _lib in (
 ):
     logging.getLogger(_lib).setLevel(logging.WARNING)
 
-# ── 导入本地模块（日志配置完成后）────────────────────────────────────────────
-import tkinter as tk
 
-from engine import SenseVoiceEngine
-from subtitle import RealtimeSubtitle
-from gui import ControlPanel, build_subtitle_window
+def _parse_args():
+    p = argparse.ArgumentParser(description="实时语音识别悬浮字幕")
+    p.add_argument("--file",  metavar="PATH", help="无界面回放音频文件（不打开窗口与声卡）")
+    p.add_argument("--ref",   metavar="PATH", help="回放时的参考信号文件，非空时先做 AEC")
+    p.add_argument("--speed", type=float, default=1.0,
+                   help="回放倍速，0 = 不限速（默认 1.0 实时）")
+    p.add_argument("--capture-process", action="store_true",
+                   help="音频采集放到独立子进程，经共享内存交付（避免推理抢 GIL 导致丢帧）")
+    p.add_argument("--workers", type=int, default=None, metavar="N",
+                   help="推理线程数，每个线程加载一份模型（默认 config.INFER_WORKERS）")
+    p.add_argument("--engine-process", action="store_true",
+                   help="SenseVoice 在推理子进程中运行（每个推理线程一个子进程）")
+    p.add_argument("--transcribe", nargs="+", metavar="PATH",
+                   help="离线批量转写这些文件（不打开窗口与声卡），字幕写到文件旁或 --out")
+    p.add_argument("--out", metavar="DIR", help="--transcribe 的输出目录")
+    p.add_argument("--formats", default="srt,vtt,jsonl",
+                   help="--transcribe 输出格式，逗号分隔：srt / vtt / jsonl（默认全部）")
+    p.add_argument("--serve", action="store_true",
+                   help="无界面多会话字幕服务器（长度前缀 TCP，16kHz int16 PCM 进、JSON 字幕出）")
+    p.add_argument("--host", default=None, help="--serve 监听地址（默认 config.SERVER_HOST）")
+    p.add_argument("--port", type=int, default=None, help="--serve 端口（默认 config.SERVER_PORT）")
+    p.add_argument("--snapshot", metavar="DIR", default=None,
+                   help="模型快照目录：不存在时本次加载后写入，之后从快照 mmap 加载（须为新目录、空目录或已有快照；"
+                        "默认 config.MODEL_SNAPSHOT_DIR）")
+    p.add_argument("--trace", metavar="PATH",
+                   help="记录各线程时间线，退出时写出 Chrome trace JSON（Perfetto / chrome://tracing 打开）")
+    return p.parse_args()
+
+
+def run_file(subtitle, path: str, ref_path: str | None, speed: float):
+    """无界面回放：逐句打印最终字幕，文件回放完且队列处理完毕后返回"""
+    subtitle.on_final = lambda text: print(text, flush=True)
+    subtitle.start_stream(None, mode="file", file_path=path, speed=speed, ref_path=ref_path)
+    subtitle.wait_file_done()
+    subtitle.wait_idle()
+    subtitle.stop_stream()
 
 
 def main():
-    engine   = SenseVoiceEngine()
-    subtitle = RealtimeSubtitle(engine)
+    # 本地模块在此导入：采集 / 推理子进程（spawn）会重新导入本文件，但不需要这些模块
+    from config import INFER_WORKERS, ENGINE_PROCESS, SERVER_HOST, SERVER_PORT
+    from config import WARMUP, MODEL_SNAPSHOT_DIR
+    from subtitle import RealtimeSubtitle
+    from startup import timeline, warmup
+    from tracing import tracer
+    import batch
 
-    root  = tk.Tk()
-    panel = ControlPanel(root, subtitle)
-    win   = build_subtitle_window(root, subtitle, panel.font_size_var, panel.alpha_var)
-    panel.set_subtitle_win(win)
+    timeline.begin(_T0)
+    timeline.mark("imports")
+    args    = _parse_args()
+    if args.trace:
+        tracer.enable()
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    if bad := set(formats) - set(batch.FORMATS):
+        sys.exit(f"未知输出格式: {', '.join(sorted(bad))}（可选: {', '.join(batch.FORMATS)}）")
+    workers = max(1, args.workers or INFER_WORKERS)
+    # 多个引擎并行推理：torch 计算线程按核数均分，避免互相抢核
+    threads = max(1, (os.cpu_count() or 1) // workers) if workers > 1 else None
+    # 快照里的权重是 mmap 映射的：多个推理线程 / 子进程的引擎共享同一份页缓存
+    snapshot = args.snapshot or MODEL_SNAPSHOT_DIR
 
-    root.mainloop()
+    if args.engine_process or ENGINE_PROCESS:
+        # 主进程不导入 torch / funasr，模型只在推理子进程里加载
+        from engine_proc import EngineProcess
+        factory = lambda: EngineProcess(threads=threads, kwargs={"snapshot": snapshot})
+    else:
+        def factory():
+            # torch / funasr 在调用方线程导入（有界面时为 loader 线程，不阻塞窗口显示）
+            with timeline.stage("engine_import"):
+                from engine import SenseVoiceEngine
+                if threads:
+                    import torch
+                    torch.set_num_threads(threads)
+            return SenseVoiceEngine(snapshot=snapshot)
 
-    subtitle.stop_stream()
-    log.info("程序已退出")
+    if args.transcribe or args.serve:
+        with timeline.stage("model"):
+            engine = factory()
+        if args.transcribe:
+            batch.run(engine, args.transcribe, args.out, formats)
+            return
+        import server
+        if WARMUP:
+            with timeline.stage("warmup"):
+                warmup(engine)
+        timeline.mark("ready")
+        timeline.log()
+        server.serve(engine, args.host or SERVER_HOST, args.port or SERVER_PORT)
+        return
+    # 有界面时控制面板先出来，VAD / 模型在 loader 线程加载；--file 直接同步加载
+    subtitle = RealtimeSubtitle(workers=workers, engine_factory=factory, background=not args.file)
+    if args.capture_process:
+        subtitle.capture_process = True
+
+    try:
+        if args.file:
+            run_file(subtitle, args.file, args.ref, args.speed)
+            log.info("文件回放完成")
+            return
+
+        # 界面依赖只在有界面模式下导入（无显示环境也能跑 --file）
+        import tkinter as tk
+        from gui import ControlPanel, build_subtitle_window
+
+        root  = tk.Tk()
+        panel = ControlPanel(root, subtitle)
+        win   = build_subtitle_window(root, subtitle, panel.font_size_var, panel.alpha_var)
+        panel.set_subtitle_win(win)
+        root.after(0, timeline.mark, "gui")
+
+        root.mainloop()
+
+        subtitle.stop_stream()
+        log.info("程序已退出")
+    finally:
+        if args.trace:
+            tracer.disable()
+            n = tracer.write(args.trace)
+            log.info("时间线已写出: %s（%d 个事件，丢弃 %d）", args.trace, n, tracer.stats()["dropped"])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""运行时指标工具：固定窗口耗时采样 + 分位数"""
+
+import threading
+
+import numpy as np
+
+
+class LatencyWindow:
+    """
+    保留最近 size 个耗时样本（单位由调用方决定，采集端统一用微秒）。
+    add() 只做一次数组写入，可在音频回调里调用；percentiles() 在读取时计算。
+    """
+
+    def __init__(self, size: int = 4096):
+        self._buf = np.zeros(size)
+        self._n   = 0          # 累计样本数（含已被覆盖的）
+
+    def __len__(self) -> int:
+        return self._n
+
+    def add(self, value: float):
+        self._buf[self._n % len(self._buf)] = value
+        self._n += 1
+
+    def percentiles(self) -> dict:
+        """窗口内样本的 p50 / p95 / p99 / max，无样本时全为 0"""
+        n = min(self._n, len(self._buf))
+        if n == 0:
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+        data = self._buf[:n]
+        p50, p95, p99 = np.percentile(data, (50, 95, 99))
+        return {"p50": float(p50), "p95": float(p95), "p99": float(p99),
+                "max": float(data.max())}
+
+
+class StageTracer:
+    """
+    语音段在流水线各环节的时间戳（time.time()，秒）→ 分环节耗时分布（毫秒）。
+
+    每个推理请求带一个 ts 字典，各环节写入自己的时间戳：
+      vad_start   : VAD 判定开始说话（仅 final）
+      capture     : 请求中最新一帧音频进入程序的时刻（按 VAD 读取时的积压量倒推）
+      vad         : VAD 提交请求的判定时刻（final 为句尾 end 事件）
+      enqueue     : 进入调度器        dequeue    : 推理线程取出
+      infer_start : 开始推理          infer_end  : 推理结束
+      display     : 写入 finals / pending（final 含按序交付的等待）
+      draw        : 界面刷新把它画出来（无界面时没有这一环）
+
+    相邻且都存在的两个时间戳之差计入 (kind, "a→b")，另有汇总项：
+      end_to_display / end_to_draw : final 句尾判定 → 写入 / 画出
+      age_at_display / age_at_draw : 显示时距最新一帧音频进入程序已过多久
+    """
+
+    ORDER = ("vad_start", "capture", "vad", "enqueue", "dequeue",
+             "infer_start", "infer_end", "display", "draw")
+
+    _TOTALS = {
+        "end_to_display": ("vad", "display"),
+        "end_to_draw":    ("vad", "draw"),
+        "age_at_display": ("capture", "display"),
+        "age_at_draw":    ("capture", "draw"),
+    }
+
+    def __init__(self, size: int = 1024):
+        self._size = size
+        self._hist: dict[tuple[str, str], LatencyWindow] = {}
+        # add 来自各推理线程与 Tk 线程（mark_drawn），summary / reset 来自 stats / start_stream
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, stage: str, ms: float):
+        with self._lock:
+            win = self._hist.get((kind, stage))
+            if win is None:
+                win = self._hist[(kind, stage)] = LatencyWindow(self._size)
+            win.add(ms)
+
+    def record(self, kind: str, ts: dict, upto: str = "display"):
+        """把 ts 中截至 upto 的相邻环节计入分布；draw 时以 upto="draw" 只补最后一环与汇总项"""
+        if upto == "draw":
+            stages = ("display", "draw")
+        else:
+            stages = self.ORDER[:self.ORDER.index(upto) + 1]
+        prev = None
+        for name in stages:
+            t = ts.get(name)
+            if t is None:
+                continue
+            if prev is not None:
+                self.add(kind, f"{prev[0]}→{name}", (t - prev[1]) * 1000)
+            prev = (name, t)
+        for total, (a, b) in self._TOTALS.items():
+            if b == upto and a in ts and b in ts and (kind == "final" or a == "capture"):
+                self.add(kind, total, (ts[b] - ts[a]) * 1000)
+
+    def summary(self) -> dict:
+        """{kind: {stage: {n, p50, p95, p99, max}}}，环节按流水线顺序排列"""
+        order = {f"{a}→{b}": i for i, a in enumerate(self.ORDER) for b in self.ORDER[i + 1:]}
+        out: dict[str, dict] = {}
+        with self._lock:
+            for (kind, stage), win in sorted(self._hist.items(),
+                                             key=lambda kv: (kv[0][0], order.get(kv[0][1], 99), kv[0][1])):
+                out.setdefault(kind, {})[stage] = {"n": len(win), **win.percentiles()}
+        return out
+
+    def format(self) -> list[str]:
+        """summary() 的表格形式（每行一个环节），用于日志"""
+        lines = []
+        for kind, stages in self.summary().items():
+            for stage, p in stages.items():
+                lines.append(f"{kind:<7} {stage:<22} n={p['n']:<5} p50={p['p50']:7.1f} "
+                             f"p95={p['p95']:7.1f} p99={p['p99']:7.1f} max={p['max']:7.1f} ms")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._hist.clear()
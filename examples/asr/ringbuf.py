@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""实时音频路径的 float32 缓冲：SPSC 环形缓冲（稳态零分配）+ 语音段缓冲"""
+
+import numpy as np
+
+from config import SAMPLE_RATE, VAD_CHUNK, RING_CAPACITY, MAX_SEG_SEC
+
+
+class RingBuffer:
+    """
+    固定容量的 SPSC 环形缓冲，替代 np.concatenate + 切片的累积方式。
+
+    线程模型：
+      _w 只由生产者 (write) 修改，_r 只由消费者 (peek/advance/read_into) 修改，
+      两者都是单调递增的整数，CPython 下整数赋值是原子的，故无需加锁。
+
+    零拷贝读：
+      存储区末尾额外镜像 block 个采样（写入头部时同步写一份到尾部），
+      因此从任意位置读取不超过 block 个采样都是一段连续内存，可直接返回视图。
+
+    溢出：
+      缓冲写满时丢弃本次写入中放不下的部分（保留较早的音频，不覆盖未读数据），
+      丢弃的采样数 / 次数累计在 dropped / overflows。
+    """
+
+    def __init__(self, capacity: int = RING_CAPACITY, block: int = VAD_CHUNK):
+        if capacity < block:
+            raise ValueError(f"capacity ({capacity}) 不能小于 block ({block})")
+        self.capacity  = capacity
+        self.block     = block
+        self._data     = np.zeros(capacity + block, dtype=np.float32)
+        self._w        = 0        # 累计写入采样数（生产者）
+        self._r        = 0        # 累计读出采样数（消费者）
+        self.overflows = 0        # 发生溢出的 write 次数
+        self.dropped   = 0        # 因溢出丢弃的采样数
+
+    def __len__(self) -> int:
+        """当前可读采样数"""
+        return self._w - self._r
+
+    @property
+    def free(self) -> int:
+        """当前可写采样数"""
+        return self.capacity - (self._w - self._r)
+
+    # ── 生产者 ─────────────────────────────────────────────────────────────────
+
+    def write(self, data: np.ndarray) -> int:
+        """写入一段采样，返回实际写入数（不足 len(data) 说明发生了溢出）"""
+        n    = len(data)
+        room = self.capacity - (self._w - self._r)
+        if n > room:
+            self.overflows += 1
+            self.dropped   += n - room
+            n = room
+        if n == 0:
+            return 0
+
+        cap   = self.capacity
+        start = self._w % cap
+        first = min(n, cap - start)
+        self._data[start:start + first] = data[:first]
+        if first < n:
+            self._data[:n - first] = data[first:n]
+
+        # 同步头部 block 个采样的镜像，保证跨尾部的短读连续
+        lo, hi = start, start + n
+        if lo < self.block:
+            m = min(hi, self.block)
+            self._data[cap + lo:cap + m] = self._data[lo:m]
+        if hi > cap:
+            m = min(hi - cap, self.block)
+            self._data[cap:cap + m] = self._data[:m]
+
+        self._w += n
+        return n
+
+    # ── 消费者 ─────────────────────────────────────────────────────────────────
+
+    def peek(self, n: int | None = None) -> np.ndarray:
+        """
+        返回接下来 n 个采样（默认 block）的零拷贝视图，不消费。
+        调用方需保证 len(self) >= n 且 n <= block；视图在 advance 之前有效，
+        不要修改其内容。
+        """
+        n = self.block if n is None else n
+        if n > self.block or n > len(self):
+            raise ValueError(f"peek({n}) 超出可读范围（可读 {len(self)}，block {self.block}）")
+        start = self._r % self.capacity
+        return self._data[start:start + n]
+
+    def advance(self, n: int | None = None):
+        """消费 n 个采样（默认 block）"""
+        n = self.block if n is None else n
+        self._r += min(n, len(self))
+
+    def read_into(self, out: np.ndarray) -> int:
+        """把最多 len(out) 个采样拷贝到 out 并消费，返回拷贝数"""
+        n = min(len(out), len(self))
+        if n == 0:
+            return 0
+        cap   = self.capacity
+        start = self._r % cap
+        first = min(n, cap - start)
+        out[:first] = self._data[start:start + first]
+        if first < n:
+            out[first:n] = self._data[:n - first]
+        self._r += n
+        return n
+
+    def clear(self):
+        """丢弃全部未读数据（仅消费者调用）"""
+        self._r = self._w
+
+
+class SharedRingBuffer(RingBuffer):
+    """
+    跨进程版 RingBuffer：采样区和读写下标都放在 multiprocessing.shared_memory 里，
+    采集子进程 write、主进程 peek/advance，接口与 RingBuffer 完全相同。
+
+    共享内存布局：int64[4] 头部（_w, _r, overflows, dropped）+ float32[capacity + block]。
+    下标是 8 字节对齐的 int64，单次读写不会撕裂；仍然只允许一个生产者、一个消费者。
+
+    create=True 的一方（主进程）负责 unlink；附着方（子进程）用 name 打开。
+    unlink 只删除名字，已建立的映射在各自 close() / 对象回收前保持有效，
+    因此消费者线程手里残留的 peek 视图不会因为采集停止而失效。
+    """
+
+    _HDR = 4
+    _shm = None
+
+    def __init__(self, capacity: int = RING_CAPACITY, block: int = VAD_CHUNK,
+                 name: str | None = None, create: bool = True):
+        from multiprocessing import shared_memory
+
+        if capacity < block:
+            raise ValueError(f"capacity ({capacity}) 不能小于 block ({block})")
+        nbytes = self._HDR * 8 + (capacity + block) * 4
+        if create:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=nbytes)
+        else:
+            # multiprocessing 子进程与父进程共用 resource_tracker，附着方无需撤销登记
+            shm = shared_memory.SharedMemory(name=name)
+
+        self.capacity = capacity
+        self.block    = block
+        self._owner   = create
+        self._hdr     = np.ndarray(self._HDR, dtype=np.int64, buffer=shm.buf)
+        self._data    = np.ndarray(capacity + block, dtype=np.float32,
+                                   buffer=shm.buf, offset=self._HDR * 8)
+        self._shm     = shm
+        self.name     = shm.name
+        if create:
+            self._hdr[:] = 0
+
+    # 头部字段映射为属性，RingBuffer 的方法无需改动
+    def _field(i):
+        return property(lambda self: int(self._hdr[i]),
+                        lambda self, v: self._hdr.__setitem__(i, v))
+
+    _w        = _field(0)
+    _r        = _field(1)
+    overflows = _field(2)
+    dropped   = _field(3)
+    del _field
+
+    def unlink(self):
+        """删除共享内存名字（仅创建方调用）；本进程的映射仍然可用"""
+        if self._owner:
+            self._owner = False
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        """解除本进程的映射（创建方同时 unlink），之后不能再访问本对象"""
+        if self._shm is None:
+            return
+        self.unlink()
+        self._hdr = self._data = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass      # 仍有外部视图：映射随视图一起被回收
+        self._shm = None
+
+    def __del__(self):
+        self.close()
+
+
+class SegmentBuffer:
+    """
+    当前语音段的定长线性缓冲，替代 list.append(frame.copy()) + np.concatenate。
+
+      append(frame) : 拷贝进预分配数组，同时累计平方和
+      tail(n)       : 末尾 n 个采样的视图 —— preview 请求的代价与段长无关
+      rms           : 由累计平方和 O(1) 得出，噪声门控不再扫描整段
+      take()        : 把整段作为一个连续数组交给 final 请求（不再拷贝），
+                      随后换一块新的存储区
+
+    已交出的视图（preview 的 tail、final 的 take）可能还在推理队列里，
+    所以 take() / clear() 都换新存储区而不是原地覆盖；np.empty 不清零，
+    大块内存按页惰性分配，换区本身几乎没有开销。
+
+    容量默认 MAX_SEG_SEC + 1 秒；full 为真时调用方应强制切段
+    （文件不限速回放时墙钟计时的 MAX_SEG_SEC 会远长于音频时长）。
+    """
+
+    def __init__(self, capacity: int = (MAX_SEG_SEC + 1) * SAMPLE_RATE):
+        self.capacity = capacity
+        self._data    = np.empty(capacity, dtype=np.float32)
+        self._n       = 0
+        self._sumsq   = 0.0
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def full(self) -> bool:
+        """剩余空间不足一帧"""
+        return self.capacity - self._n < VAD_CHUNK
+
+    @property
+    def rms(self) -> float:
+        return float(np.sqrt(self._sumsq / self._n)) if self._n else 0.0
+
+    def append(self, frame: np.ndarray):
+        """追加一帧；超出容量的部分丢弃（调用方在 full 时切段，正常不会发生）"""
+        k = min(len(frame), self.capacity - self._n)
+        seg = self._data[self._n:self._n + k]
+        seg[:] = frame[:k]
+        self._sumsq += float(np.dot(seg, seg))
+        self._n     += k
+
+    def tail(self, n: int) -> np.ndarray:
+        """最近 n 个采样（不足时为整段）的视图，调用方不要修改"""
+        return self._data[max(0, self._n - n):self._n]
+
+    def take(self) -> np.ndarray:
+        """取走整段（连续数组，不拷贝），缓冲清空"""
+        out = self._data[:self._n]
+        self._detach()
+        return out
+
+    def clear(self):
+        """丢弃当前段"""
+        if self._n:
+            self._detach()
+
+    def _detach(self):
+        self._data  = np.empty(self.capacity, dtype=np.float32)
+        self._n     = 0
+        self._sumsq = 0.0
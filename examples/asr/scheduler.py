@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+推理请求调度：final 严格 FIFO 通道 + preview 只保留最新一条的单槽
+
+替代原来的单 FIFO _infer_q（取 preview 时排空队列、把非 preview 放回队尾，
+会打乱 final 的顺序，final 还要排在已入队的 preview 之后）：
+
+  - final  ：按提交顺序逐条处理，总是先于任何待处理的 preview；提交时编号 seq
+             （代次内从 0 递增），多个推理线程乱序完成时按 seq 顺序显示
+  - preview：新的覆盖旧的；同段（或更早段）的 final 入队后，待处理 preview 直接作废
+  - 代次  ：new_generation() 之后旧代次的请求在入口处丢弃，已入队的一并清空
+  - 正在推理的 preview 结果是否还要显示，由 is_stale() 在写入字幕前判断
+
+task_done / join 语义与 queue.Queue 相同（被覆盖、作废的请求自动计为完成）。
+
+PreviewGovernor 按实测推理耗时决定 preview 的提交间隔与窗口（见 GOV_* 配置）。
+"""
+
+import time
+import logging
+import threading
+from collections import deque, defaultdict
+from typing import NamedTuple
+
+import numpy as np
+
+from config import (
+    GOV_LEVELS, GOV_TARGET_UTIL, GOV_RESTORE_MARGIN, GOV_HOLD_SEC, GOV_PROBE_SEC,
+    GOV_BACKLOG, GOV_EMA,
+)
+
+log = logging.getLogger("subtitle")
+
+
+class InferRequest(NamedTuple):
+    kind:  str           # "preview" | "final"
+    audio: np.ndarray
+    gen:   int           # 会话代次
+    seg:   int           # 语音段序号
+    t:     float         # 提交时刻 time.time()（final 为检测到句尾的时刻）
+    seq:   int = -1      # final 序号（调度器提交时分配），preview 为 -1
+    ts:    dict | None = None   # 各环节时间戳（见 metrics.StageTracer），调度器写入 enqueue / dequeue
+
+
+class InferenceScheduler:
+
+    def __init__(self):
+        self._cond       = threading.Condition()
+        self._finals     = deque()
+        self._preview    = None
+        self._gen        = 0
+        self._final_seg  = -1          # 已提交 final 的最大段序号（当前代次）
+        self._final_seq  = 0           # 下一个 final 的序号（当前代次）
+        self._unfinished = 0
+        self.dropped     = defaultdict(int)   # stale / superseded / preempted
+
+    # ── 代次 ───────────────────────────────────────────────────────────────────
+
+    def new_generation(self) -> int:
+        """开始新代次（流重启 / 停止）：清空所有待处理请求，返回新代次号"""
+        with self._cond:
+            self._gen += 1
+            n = len(self._finals) + (self._preview is not None)
+            self.dropped["stale"] += n
+            self._finals.clear()
+            self._preview    = None
+            self._final_seg  = -1
+            self._final_seq  = 0
+            self._done(n)
+            return self._gen
+
+    def is_stale(self, req: InferRequest) -> bool:
+        """代次已过期，或 preview 所属段的 final 已经提交"""
+        return req.gen != self._gen or (req.kind == "preview" and req.seg <= self._final_seg)
+
+    # ── 生产者 ─────────────────────────────────────────────────────────────────
+
+    def submit(self, req: InferRequest):
+        with self._cond:
+            if req.gen != self._gen:
+                self.dropped["stale"] += 1
+                return
+            if req.ts is not None:
+                req.ts["enqueue"] = time.time()
+            if req.kind == "final":
+                self._finals.append(req._replace(seq=self._final_seq))
+                self._final_seq += 1
+                self._unfinished += 1
+                self._final_seg = max(self._final_seg, req.seg)
+                if self._preview is not None and self._preview.seg <= req.seg:
+                    self._preview = None
+                    self.dropped["preempted"] += 1
+                    self._done(1)
+            else:
+                if self._preview is not None:
+                    self.dropped["superseded"] += 1
+                else:
+                    self._unfinished += 1
+                self._preview = req
+            self._cond.notify()
+
+    # ── 消费者 ─────────────────────────────────────────────────────────────────
+
+    def get(self, timeout: float | None = None) -> InferRequest | None:
+        """取下一条请求（final 优先）；超时返回 None"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._finals or self._preview is not None, timeout):
+                return None
+            if self._finals:
+                req = self._finals.popleft()
+            else:
+                req, self._preview = self._preview, None
+            if req.ts is not None:
+                req.ts["dequeue"] = time.time()
+            return req
+
+    def task_done(self):
+        with self._cond:
+            self._done(1)
+
+    def join(self):
+        """阻塞直到所有已提交的请求都处理完（或被作废）"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._unfinished == 0)
+
+    def qsize(self) -> int:
+        with self._cond:
+            return len(self._finals) + (self._preview is not None)
+
+    @property
+    def final_backlog(self) -> int:
+        """待处理的 final 数（不含正在推理的）"""
+        return len(self._finals)
+
+    def _done(self, n: int):
+        self._unfinished -= n
+        if self._unfinished <= 0:
+            self._unfinished = 0
+            self._cond.notify_all()
+
+
+class PreviewGovernor:
+    """
+    preview 调速器：推理线程每完成一次请求调用 observe()，VAD 线程读取
+    interval / window / suspended 决定何时、用多长音频提交 preview。
+
+    负载模型（滑动平均）：
+      final 实时因子 f_rtf = 推理耗时 / 音频时长   —— 每秒语音固定要花在 final 上的时间
+      preview 耗时        = 每秒音频耗时 × 窗口（窗口式）或单次耗时（增量识别，与窗口无关）
+      预测占用率 util(级) = (preview 耗时 / 间隔 + f_rtf) / 推理线程数
+
+    选级：
+      - 当前级 util 超过 GOV_TARGET_UTIL，或 final 积压达到 GOV_BACKLOG → 立即升级
+        （可跨级；所有级都不满足时暂停 preview）
+      - 上一级 util 低于 目标 × GOV_RESTORE_MARGIN 且距上次变化超过 GOV_HOLD_SEC → 降一级
+      - 暂停期间没有 preview 样本，每 GOV_PROBE_SEC 试探恢复到最后一级
+
+    暂停只影响实时显示，不影响 final 文本：增量识别的 final 不截窗口，引擎没有该段的
+    preview 状态时整段推理（见 SenseVoiceEngine.transcribe_stream）。
+
+    每次换级写一条 info 日志，stats() 给出当前级与负载估计。
+    """
+
+    def __init__(self, windowed: bool = True, levels=GOV_LEVELS,
+                 hold_sec: float = GOV_HOLD_SEC, probe_sec: float = GOV_PROBE_SEC,
+                 workers: int = 1):
+        self._levels   = levels
+        self._workers  = workers
+        self._hold     = hold_sec
+        self._probe    = probe_sec
+        self._windowed = windowed       # preview 耗时是否随窗口变化（增量识别时为 False）
+        self._p_cost   = 0.0            # 窗口式：每秒音频的 preview 耗时；增量：单次耗时
+        self._f_rtf    = 0.0
+        self._changed  = time.monotonic()
+        self.changes   = 0
+        self._set(0, "")
+
+    @property
+    def suspended(self) -> bool:
+        return self.level >= len(self._levels)
+
+    def _util(self, level: int) -> float:
+        interval, window = self._levels[level]
+        cost = self._p_cost * window if self._windowed else self._p_cost
+        return (cost / interval + self._f_rtf) / self._workers
+
+    def _set(self, level: int, reason: str):
+        self.level = level
+        if level < len(self._levels):
+            self.interval, self.window = self._levels[level]
+        if reason:
+            self.changes += 1
+            self._changed = time.monotonic()
+            if self.suspended:
+                log.info("[调速] 暂停 preview（%s）", reason)
+            else:
+                log.info("[调速] 第 %d 级: 间隔 %.1fs 窗口 %.1fs（%s）",
+                         level, self.interval, self.window, reason)
+
+    def observe(self, kind: str, audio_sec: float, elapsed: float, backlog: int = 0):
+        """记录一次推理耗时（秒）并重新选级；backlog 为此刻待处理的 final 数"""
+        a = GOV_EMA
+        if kind == "final":
+            self._f_rtf = (1 - a) * self._f_rtf + a * elapsed / max(audio_sec, 1e-3)
+        else:
+            cost = elapsed / max(audio_sec, 1e-3) if self._windowed else elapsed
+            self._p_cost = (1 - a) * self._p_cost + a * cost
+
+        n, level = len(self._levels), self.level
+        if backlog >= GOV_BACKLOG and level < n:
+            self._set(level + 1, f"final 积压 {backlog}")
+            return
+
+        # 当前级（暂停时视为最后一级之后）超载 → 升到第一个满足目标的级
+        if level < n and self._util(level) > GOV_TARGET_UTIL:
+            up = next((l for l in range(level + 1, n) if self._util(l) <= GOV_TARGET_UTIL), n)
+            self._set(up, f"预测占用率 {self._util(level):.2f}")
+            return
+
+        quiet = time.monotonic() - self._changed
+        if level == n:
+            if quiet >= self._probe and self._f_rtf / self._workers < GOV_TARGET_UTIL:
+                self._set(n - 1, "试探恢复")
+        elif level > 0 and quiet >= self._hold \
+                and self._util(level - 1) <= GOV_TARGET_UTIL * GOV_RESTORE_MARGIN:
+            self._set(level - 1, f"预测占用率 {self._util(level - 1):.2f}")
+
+    def stats(self) -> dict:
+        return {
+            "level":     self.level,
+            "suspended": self.suspended,
+            "interval":  None if self.suspended else self.interval,
+            "window":    None if self.suspended else self.window,
+            "final_rtf": round(self._f_rtf, 3),
+            "util":      round(self._util(min(self.level, len(self._levels) - 1)), 3),
+            "changes":   self.changes,
+        }
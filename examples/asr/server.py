@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+多会话字幕服务器：一个 SenseVoice 引擎同时为多个房间 / 客户端出字幕（main.py --serve）
+
+协议（TCP，默认只监听 127.0.0.1）：每帧 = 4 字节大端长度 + 负载
+  客户端 → 服务器 : 16kHz mono int16 小端 PCM，帧长任意（奇数字节时末尾 1 字节并入下一帧），
+                    单帧不超过 SERVER_MAX_FRAME 字节（超过即断开）；长度为 0 的帧表示音频结束
+  服务器 → 客户端 : UTF-8 JSON
+      {"type": "partial", "seg": 3, "start": 12.30, "text": "..."}
+      {"type": "final",   "seg": 3, "start": 12.30, "end": 15.10, "text": "...", "raw": "..."}
+      {"type": "end"}                 —— 音频结束且所有 final 都已发出，随后服务器关闭连接
+  start / end 为该会话音频流内的秒数；end 为判定句尾（或强制切断）的位置。
+
+每个连接一个线程（Session）：独立的 VAD 模型状态与断句状态机，preview / final 规则与
+实时字幕相同（PREVIEW_INTERVAL_SEC / PREVIEW_WINDOW_SEC / MAX_SEG_SEC / 噪声门控），
+只是按音频时间而不是墙钟计时。推理请求全部交给共享的 BatchEngine。
+
+BatchEngine：单个推理线程持有引擎，取到第一条请求后再等 SERVER_BATCH_WAIT_MS，
+把这段时间里各会话到达的请求合成一次 engine.transcribe_batch：
+  - final 优先，final 与 preview 不混批（preview 只有几秒，混批会被补齐到 final 的长度）
+  - preview 每个会话只保留最新一条；同段 final 提交后该段待处理的 preview 作废
+  - 只合并长度相近的请求（BATCH_PAD_RATIO），补齐部分同样要算
+  - 一批最多 SERVER_BATCH_MAX 条，补齐后总时长不超过 SERVER_BATCH_MAX_SEC（限制 final 的队头阻塞）
+推理线程忙时新请求自然积压，下一批更大：负载越高批越大。
+"""
+
+import json
+import time
+import socket
+import struct
+import logging
+import threading
+import socketserver
+from collections import deque, defaultdict
+from typing import NamedTuple
+
+import numpy as np
+
+from config import (
+    SAMPLE_RATE, VAD_CHUNK, SILENCE_MS, MAX_SEG_SEC, NOISE_GATE_RMS, VAD_BATCH_FRAMES,
+    PREVIEW_INTERVAL_SEC, PREVIEW_WINDOW_SEC,
+    BATCH_PAD_RATIO, SERVER_HOST, SERVER_PORT, SERVER_BATCH_WAIT_MS, SERVER_BATCH_MAX,
+    SERVER_BATCH_MAX_SEC, SERVER_MAX_FRAME,
+)
+from ringbuf import RingBuffer, SegmentBuffer
+from subtitle import _TAG_RE
+from vad import make_vad_backend, VADSegmenter
+
+log = logging.getLogger("subtitle")
+
+_LEN = struct.Struct(">I")
+
+
+# ─── 分帧 ──────────────────────────────────────────────────────────────────────
+
+def send_frame(sock: socket.socket, payload: bytes):
+    sock.sendall(_LEN.pack(len(payload)) + payload)
+
+
+def recv_frame(sock: socket.socket, max_len: int = SERVER_MAX_FRAME) -> bytes | None:
+    """读取一帧负载；对端关闭返回 None，长度头超过 max_len 抛 ConnectionError（不分配）"""
+    head = _recv_exact(sock, _LEN.size)
+    if head is None:
+        return None
+    n = _LEN.unpack(head)[0]
+    if n > max_len:
+        raise ConnectionError(f"帧长 {n} 字节超过上限 {max_len}")
+    return _recv_exact(sock, n)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes | None:
+    buf  = bytearray(n)
+    view = memoryview(buf)
+    got  = 0
+    while got < n:
+        k = sock.recv_into(view[got:])
+        if not k:
+            return None
+        got += k
+    return bytes(buf)
+
+
+# ─── 跨会话批量推理 ────────────────────────────────────────────────────────────
+
+class _Request(NamedTuple):
+    session: "Session"
+    kind:    str           # "preview" | "final"
+    audio:   np.ndarray
+    seg:     int
+    start:   float         # 段起点（流内秒数）
+    end:     float         # 提交位置（流内秒数）
+    t:       float         # 提交时刻 time.perf_counter()
+
+
+class BatchEngine:
+    """
+    多个会话共用的推理线程。submit() 可在任意线程调用；结果通过 session.deliver() 回传，
+    同一会话的 final 按提交顺序交付。
+
+    engine 没有 transcribe_batch（EngineProcess 等）或批量调用失败时逐条推理。
+    """
+
+    def __init__(self, engine, wait_ms: float = SERVER_BATCH_WAIT_MS,
+                 max_items: int = SERVER_BATCH_MAX, max_sec: float = SERVER_BATCH_MAX_SEC,
+                 pad_ratio: float = BATCH_PAD_RATIO):
+        self._engine    = engine
+        self._batched   = hasattr(engine, "transcribe_batch")
+        self._wait      = wait_ms / 1000
+        self._max_items = max(1, max_items)
+        self._max_len   = int(max_sec * SAMPLE_RATE)
+        self._pad_ratio = pad_ratio
+        self._cond      = threading.Condition()
+        self._finals    = deque()
+        self._previews  = {}                    # session → 最新 preview
+        self.sizes      = defaultdict(int)      # 批大小 → 批数
+        self.dropped    = defaultdict(int)      # superseded / preempted
+        self.busy       = 0.0                   # 推理累计耗时（秒）
+        self._t0        = time.perf_counter()
+        threading.Thread(target=self._run, daemon=True, name="batch").start()
+
+    def submit(self, req: _Request):
+        with self._cond:
+            if req.kind == "final":
+                self._finals.append(req)
+                old = self._previews.get(req.session)
+                if old is not None and old.seg <= req.seg:
+                    del self._previews[req.session]
+                    self.dropped["preempted"] += 1
+            else:
+                if req.session in self._previews:
+                    self.dropped["superseded"] += 1
+                self._previews[req.session] = req
+            self._cond.notify()
+
+    def _pending(self) -> int:
+        return len(self._finals) + len(self._previews)
+
+    def _take(self) -> list[_Request]:
+        """
+        取一批（调用方持有 _cond）：有 final 时只取 final，否则只取 preview。
+        以最早的一条为基准，只并入长度相近（短 / 长 ≥ BATCH_PAD_RATIO）的请求，
+        补齐浪费有上限；同一会话的 final 一旦有一条没并入，其后的也不并入（保持顺序）。
+        """
+        finals = bool(self._finals)
+        src    = list(self._finals) if finals else sorted(self._previews.values(), key=lambda r: r.t)
+        lo = hi = len(src[0].audio)
+        batch, skipped = [src[0]], set()
+        for req in src[1:]:
+            if len(batch) >= self._max_items:
+                break
+            n = len(req.audio)
+            if req.session in skipped or min(lo, n) < self._pad_ratio * max(hi, n) \
+                    or max(hi, n) * (len(batch) + 1) > self._max_len:
+                skipped.add(req.session)
+                continue
+            batch.append(req)
+            lo, hi = min(lo, n), max(hi, n)
+        if finals:
+            taken = set(map(id, batch))
+            self._finals = deque(r for r in self._finals if id(r) not in taken)
+        else:
+            for req in batch:
+                del self._previews[req.session]
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(self._pending)
+                if self._wait > 0 and self._pending() < self._max_items:
+                    self._cond.wait_for(lambda: self._pending() >= self._max_items, self._wait)
+                batch = self._take()
+
+            t0    = time.perf_counter()
+            texts = self._infer([r.audio for r in batch])
+            self.busy += time.perf_counter() - t0
+            self.sizes[len(batch)] += 1
+            for req, raw in zip(batch, texts):
+                req.session.deliver(req, raw)
+
+    def _infer(self, audios: list[np.ndarray]) -> list[str]:
+        if self._batched and len(audios) > 1:
+            try:
+                return self._engine.transcribe_batch(audios)
+            except Exception as e:
+                log.warning("批量推理失败，改为逐条推理: %s", e)
+                self._batched = False
+        texts = []
+        for audio in audios:
+            try:
+                texts.append(self._engine.transcribe(audio))
+            except Exception as e:
+                # final 仍需交付（哪怕为空），否则会话结束时一直等它
+                log.exception("推理异常: %s", e)
+                texts.append("")
+        return texts
+
+    def stats(self) -> dict:
+        n     = sum(self.sizes.values())
+        items = sum(k * v for k, v in self.sizes.items())
+        return {
+            "batches":    n,
+            "requests":   items,
+            "mean_batch": round(items / n, 2) if n else 0.0,
+            "max_batch":  max(self.sizes, default=0),
+            "busy":       round(self.busy / max(time.perf_counter() - self._t0, 1e-9), 3),
+            "dropped":    dict(self.dropped),
+        }
+
+
+# ─── 会话 ──────────────────────────────────────────────────────────────────────
+
+class Session:
+    """
+    一个客户端连接：run() 在连接线程里读音频、逐帧 VAD 并提交请求，deliver() 在推理线程里回写结果。
+    """
+
+    def __init__(self, sid: int, sock: socket.socket, batcher: BatchEngine, vad):
+        self.sid        = sid
+        self._sock      = sock
+        self._batcher   = batcher
+        self._vad       = vad
+        self._segmenter = VADSegmenter(threshold=0.5, min_silence_ms=SILENCE_MS)
+        self._ring      = RingBuffer(block=VAD_CHUNK * VAD_BATCH_FRAMES)
+        self._buf       = SegmentBuffer()
+        self._send_lock = threading.Lock()
+        self._cond      = threading.Condition()
+        self._pos       = 0          # 已打分的采样数（流内位置）
+        self._odd       = b""        # 上一帧末尾不成对的 1 字节（帧长为奇数时）
+        self._seg       = 0
+        self._seg_start = 0
+        self._last_prev = 0
+        self._pending   = 0          # 已提交、尚未交付的 final 数
+        self.speaking   = False
+        self.final_seg  = -1         # 已提交 final 的最大段号
+        self.closed     = False
+        self.partials   = 0
+        self.finals     = 0
+        vad.reset()
+
+    # ── 连接线程 ──────────────────────────────────────────────────────────────
+
+    def run(self):
+        """读取音频直到结束帧或断开；结束帧之后等所有 final 发出再回 end"""
+        step = VAD_CHUNK * VAD_BATCH_FRAMES
+        while not self.closed:
+            payload = recv_frame(self._sock)
+            if payload is None:
+                self.closed = True
+                return
+            if not payload:
+                self._finish()
+                return
+            if self._odd:
+                payload, self._odd = self._odd + payload, b""
+            if len(payload) % 2:
+                payload, self._odd = payload[:-1], payload[-1:]
+            pcm = np.frombuffer(payload, dtype="<i2").astype(np.float32) / 32768.0
+            for k in range(0, len(pcm), step):
+                self._ring.write(pcm[k:k + step])
+                self._score()
+
+    def _score(self):
+        ring, seg = self._ring, self._segmenter
+        while len(ring) >= VAD_CHUNK:
+            n      = min(len(ring) // VAD_CHUNK, VAD_BATCH_FRAMES)
+            frames = ring.peek(n * VAD_CHUNK).reshape(n, VAD_CHUNK)
+            probs  = self._vad.probs(frames)
+            used   = n
+            for i in range(n):
+                event      = seg.step(probs[i])
+                self._pos += VAD_CHUNK
+                cut        = False
+                if event == "start":
+                    self.speaking   = True
+                    self._seg      += 1
+                    self._seg_start = self._pos - VAD_CHUNK
+                    self._last_prev = self._pos
+                    self._buf.clear()
+                elif event == "end" and self.speaking:
+                    self.speaking = False
+                    cut = True
+                if self.speaking:
+                    self._buf.append(frames[i])
+                    if self._pos - self._seg_start > MAX_SEG_SEC * SAMPLE_RATE or self._buf.full:
+                        cut = True
+
+                if cut:
+                    self._submit_final()
+                    if self.speaking:
+                        # 强制切断：与实时字幕一致，模型状态清零，剩余帧用新状态重新打分
+                        self._vad.reset()
+                        seg.reset()
+                        self.speaking = False
+                        used = i + 1
+                        break
+                elif self.speaking and self._pos - self._last_prev >= PREVIEW_INTERVAL_SEC * SAMPLE_RATE:
+                    self._submit("preview", self._buf.tail(int(PREVIEW_WINDOW_SEC * SAMPLE_RATE)))
+                    self._last_prev = self._pos
+            ring.advance(used * VAD_CHUNK)
+
+    def _submit_final(self):
+        if not len(self._buf):
+            return
+        if self._buf.rms < NOISE_GATE_RMS:
+            self._buf.clear()
+            return
+        self.final_seg = self._seg
+        with self._cond:
+            self._pending += 1
+        self._submit("final", self._buf.take())
+
+    def _submit(self, kind: str, audio: np.ndarray):
+        self._batcher.submit(_Request(self, kind, audio, self._seg, self._seg_start / SAMPLE_RATE,
+                                      self._pos / SAMPLE_RATE, time.perf_counter()))
+
+    def _finish(self):
+        self._score()
+        if self.speaking:
+            self.speaking = False
+            self._submit_final()
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending == 0 or self.closed)
+        self._send({"type": "end"})
+
+    # ── 推理线程 ──────────────────────────────────────────────────────────────
+
+    def deliver(self, req: _Request, raw: str):
+        text = _TAG_RE.sub("", raw).strip()
+        if req.kind == "final":
+            if text:
+                self.finals += 1
+                self._send({"type": "final", "seg": req.seg, "start": round(req.start, 3),
+                            "end": round(req.end, 3), "text": text, "raw": raw})
+            with self._cond:
+                self._pending -= 1
+                self._cond.notify_all()
+        elif text and req.seg > self.final_seg and not self.closed:
+            self.partials += 1
+            self._send({"type": "partial", "seg": req.seg, "start": round(req.start, 3), "text": text})
+
+    def _send(self, msg: dict):
+        if self.closed:
+            return
+        try:
+            with self._send_lock:
+                send_frame(self._sock, json.dumps(msg, ensure_ascii=False).encode("utf-8"))
+        except OSError as e:
+            log.info("[服务] 会话 %d 发送失败，断开: %s", self.sid, e)
+            self.closed = True
+            with self._cond:
+                self._cond.notify_all()
+
+
+# ─── 服务器 ────────────────────────────────────────────────────────────────────
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        server = self.server
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        session = server.open_session(self.request)
+        log.info("[服务] 会话 %d 接入: %s:%d", session.sid, *self.client_address[:2])
+        try:
+            session.run()
+        except OSError as e:
+            log.info("[服务] 会话 %d 连接异常: %s", session.sid, e)
+        finally:
+            session.closed = True
+            server.close_session(session)
+            log.info("[服务] 会话 %d 结束: %d 条 final，%d 条 partial",
+                     session.sid, session.finals, session.partials)
+
+
+class SubtitleServer(socketserver.ThreadingTCPServer):
+    """
+    每个连接一个线程 + 一个 VAD 模型实例（vad_factory()），所有会话共用 engine。
+    port=0 时由系统分配端口（见 server_address）。
+    """
+
+    daemon_threads      = True
+    allow_reuse_address = True
+
+    def __init__(self, engine, host: str = SERVER_HOST, port: int = SERVER_PORT,
+                 vad_factory=make_vad_backend, **batch_kw):
+        super().__init__((host, port), _Handler)
+        self.batcher      = BatchEngine(engine, **batch_kw)
+        self._vad_factory = vad_factory
+        self._lock        = threading.Lock()
+        self._next_sid    = 0
+        self.sessions     = {}
+
+    def open_session(self, sock: socket.socket) -> Session:
+        with self._lock:
+            self._next_sid += 1
+            sid = self._next_sid
+        session = Session(sid, sock, self.batcher, self._vad_factory())
+        with self._lock:
+            self.sessions[sid] = session
+        return session
+
+    def close_session(self, session: Session):
+        with self._lock:
+            self.sessions.pop(session.sid, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            n = len(self.sessions)
+        return {"sessions": n, **self.batcher.stats()}
+
+
+def serve(engine, host: str = SERVER_HOST, port: int = SERVER_PORT):
+    """前台运行服务器直到 Ctrl+C"""
+    with SubtitleServer(engine, host, port) as srv:
+        log.info("[服务] 监听 %s:%d（批等待 %dms，每批最多 %d 条）",
+                 *srv.server_address[:2], SERVER_BATCH_WAIT_MS, SERVER_BATCH_MAX)
+        try:
+            srv.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        log.info("[服务] 退出: %s", srv.stats())
+
+
+# ─── 客户端 ────────────────────────────────────────────────────────────────────
+
+class SubtitleClient:
+    """
+    最小客户端（测试 / 压测用）：send() 发送 float32 或 int16 音频，
+    收到的消息在接收线程里交给 on_message(dict)；finish() 发送结束帧并等待 end。
+    """
+
+    def __init__(self, host: str = SERVER_HOST, port: int = SERVER_PORT, on_message=None):
+        self._sock = socket.create_connection((host, port))
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._on_message = on_message or (lambda msg: None)
+        self._done = threading.Event()
+        threading.Thread(target=self._recv_loop, daemon=True, name="client-recv").start()
+
+    def send(self, audio: np.ndarray):
+        if audio.dtype != np.int16:
+            audio = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+        send_frame(self._sock, audio.astype("<i2", copy=False).tobytes())
+
+    def finish(self, timeout: float | None = None) -> bool:
+        send_frame(self._sock, b"")
+        ok = self._done.wait(timeout)
+        self._sock.close()
+        return ok
+
+    def _recv_loop(self):
+        try:
+            while (payload := recv_frame(self._sock)) is not None:
+                msg = json.loads(payload)
+                if msg["type"] == "end":
+                    break
+                self._on_message(msg)
+        except OSError:
+            pass
+        self._done.set()
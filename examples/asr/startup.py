@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+冷启动：启动时间线 + 模型预热
+
+  timeline.begin(t0)               # 进程入口处的 perf_counter()（main.py 最先记录）
+  with timeline.stage("model"): …  # 一个阶段（只记第一次：多个推理线程各建引擎时不重复）
+  timeline.mark("first_subtitle")  # 一个时刻
+  timeline.log()                   # 写一行日志：各阶段起止 + 首条字幕时间
+
+阶段 / 时刻名称：
+  imports        : 入口 → 本地模块导入完成（界面 / 识别核心，不含 torch / funasr）
+  gui            : 控制面板进入主循环（有界面时）
+  vad            : Silero VAD 加载
+  engine_import  : torch / funasr 导入（推理子进程模式下在子进程里，不计入）
+  model          : 引擎创建（含 engine_import 与模型加载）
+  warmup         : 合成音频预热推理（见 warmup）
+  ready          : 可以开始识别
+  stream_start   : 第一次 start_stream
+  first_subtitle : 第一条字幕（preview 或 final）写入显示
+
+首次推理要付出的一次性开销（算子 JIT / 内存分配器扩容 / 前端初始化）由 warmup 在加载阶段
+提前付掉，不落在第一句话上。
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from config import SAMPLE_RATE, WARMUP_SEC
+from tracing import tracer
+
+log = logging.getLogger("subtitle")
+
+
+class StartupTimeline:
+    """进程启动各阶段的起止时刻（相对 begin 的秒数），每个名称只记录第一次"""
+
+    _LABELS = {
+        "imports":        "导入",
+        "gui":            "界面",
+        "vad":            "VAD",
+        "engine_import":  "torch/funasr",
+        "model":          "模型",
+        "warmup":         "预热",
+        "ready":          "就绪",
+        "stream_start":   "开始识别",
+        "first_subtitle": "首条字幕",
+    }
+
+    def __init__(self):
+        self._origin = time.perf_counter()
+        self._spans  = {}          # name → (开始秒, 结束秒)；时刻的开始 = 结束
+        self._lock   = threading.Lock()
+
+    def begin(self, origin: float):
+        """以 origin（perf_counter）为零点；进程入口调用一次"""
+        self._origin = origin
+
+    def _put(self, name: str, t0: float, t1: float) -> bool:
+        with self._lock:
+            if name in self._spans:
+                return False
+            self._spans[name] = (t0 - self._origin, t1 - self._origin)
+            return True
+
+    def mark(self, name: str) -> bool:
+        """记录一个时刻；已记录过返回 False"""
+        t = time.perf_counter()
+        return self._put(name, t, t)
+
+    def has(self, name: str) -> bool:
+        return name in self._spans
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self._put(name, t0, time.perf_counter()):
+                tracer.complete(f"startup:{name}", t0)
+
+    def summary(self) -> dict:
+        """{name: {"start": 秒, "end": 秒}}，另附 time_to_first_subtitle（及开始识别之后的部分）"""
+        with self._lock:
+            spans = dict(self._spans)
+        out = {k: {"start": round(a, 3), "end": round(b, 3)} for k, (a, b) in spans.items()}
+        if "first_subtitle" in spans:
+            first = spans["first_subtitle"][1]
+            out["time_to_first_subtitle"] = round(first, 3)
+            if "stream_start" in spans:
+                out["first_subtitle_after_start"] = round(first - spans["stream_start"][1], 3)
+        return out
+
+    def format(self) -> str:
+        with self._lock:
+            spans = sorted(self._spans.items(), key=lambda kv: kv[1])
+        parts = []
+        for name, (a, b) in spans:
+            label = self._LABELS.get(name, name)
+            parts.append(f"{label} {b:.2f}s" if a == b else f"{label} {a:.2f}→{b:.2f}s（{b - a:.2f}s）")
+        return "  ".join(parts)
+
+    def log(self):
+        log.info("[启动] %s", self.format())
+
+
+timeline = StartupTimeline()
+
+
+# ─── 预热 ──────────────────────────────────────────────────────────────────────
+
+def _synth_voice(seconds: float) -> "np.ndarray":
+    """类语音的合成信号：基频缓慢起伏的谐波 + 音节包络 + 少量噪声（不求识别出内容，只走一遍完整计算）"""
+    import numpy as np
+    rng = np.random.default_rng(0)
+    t   = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    f0  = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    ph  = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    x   = sum(np.sin(k * ph) / k for k in range(1, 8))
+    x  *= 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    x  += 0.02 * rng.standard_normal(len(t))
+    return (0.1 * x / np.abs(x).max()).astype(np.float32)
+
+
+def warmup(engine, seconds: float = WARMUP_SEC) -> float:
+    """
+    用合成音频把 engine 要走的推理路径各跑一次（整段 transcribe；有增量识别时再做
+    一次 preview + final），结果丢弃。返回耗时（秒）。推理子进程引擎同样适用（预热的是子进程）。
+    """
+    audio = _synth_voice(seconds)
+    t0    = time.perf_counter()
+    try:
+        engine.transcribe(audio)
+        if hasattr(engine, "transcribe_stream"):
+            half = len(audio) // 2
+            engine.transcribe_stream("warmup", audio[:half])
+            engine.transcribe_stream("warmup", audio, final=True)
+            engine.reset()
+    except Exception as e:
+        log.warning("模型预热失败（不影响识别）: %s", e)
+    sec = time.perf_counter() - t0
+    log.info("模型预热完成 %.2fs", sec)
+    return sec
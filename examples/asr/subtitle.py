@@ -1,20 +1,23 @@
 #!/usr/bin/env python3
 """
-识别核心：VAD 循环 + 后台推理线程（双线程解耦）
+识别核心：VAD 循环 + 后台推理线程池（VAD 与推理解耦）
 
 架构：
-  inference 线程 (_vad_loop)   ── 仅做帧级 VAD，提交推理请求到 _infer_q
-  infer     线程 (_infer_worker) ── 后台调用 engine.transcribe()，不阻塞 VAD
+  inference 线程 (_vad_loop)   ── 仅做帧级 VAD，提交推理请求到调度器 _sched
+  infer     线程 (_infer_worker) ── 后台调用 engine.transcribe()，不阻塞 VAD；
+                                    INFER_WORKERS > 1 时为 infer-0..N-1，各持一个引擎
 
 好处：
   - VAD 循环不再因 ML 推理（200-500ms）阻塞，音频帧不积压
-  - preview 请求可合并（队列中存在更新的 preview 时跳过旧的）
+  - final 走严格 FIFO 通道、优先于 preview；preview 只保留最新一条（见 scheduler）
   - 字幕显示前剥离 SenseVoice 标签，日志保留原始文本供调试
 
 # TODO 状态
 # [x] 动态 preview 窗口：预览只用 buf 末尾 PREVIEW_WINDOW_SEC 秒（已实现）
 # [x] 滑动窗口流式：0.3s 间隔 + 后台线程 + 4s 动态窗口，近似逐字更新（已实现）
 # [x] 噪声门控：RMS < NOISE_GATE_RMS 时跳过最终推理，减少幻觉（已实现）
+# [x] preview 调速：推理变慢时放宽间隔 / 缩短窗口 / 暂停 preview（已实现，见 PreviewGovernor）
+# [x] 静音预门控：长时间静音时跳过 Silero VAD，唤醒时回放最近的帧（已实现，见 EnergyGate）
 # [ ] 情感/语言标签可选显示：将 _TAG_RE 结果单独呈现为小字提示（暂跳过）
 """
 
@@ -25,21 +28,30 @@ import time
 import logging
 from collections import deque
 
-import numpy as np
-import torch
-from silero_vad import load_silero_vad, VADIterator
-
 from config import (
     SAMPLE_RATE,
     VAD_CHUNK,
     SILENCE_MS,
     MAX_SEG_SEC,
     MAX_DISPLAY_LINES,
-    PREVIEW_INTERVAL_SEC,
-    PREVIEW_WINDOW_SEC,
     NOISE_GATE_RMS,
+    PREVIEW_GOVERNOR,
+    INFER_WORKERS,
+    ENGINE_STREAMING,
+    CAPTURE_PROCESS,
+    SHM_POLL_MS,
+    VAD_BATCH_FRAMES,
+    VAD_GATE,
+    WARMUP,
 )
 from capture import AudioCapture
+from capture_proc import CaptureProcess
+from metrics import StageTracer
+from ringbuf import RingBuffer, SegmentBuffer
+from scheduler import InferenceScheduler, InferRequest, PreviewGovernor
+from startup import timeline, warmup
+from tracing import tracer
+from vad import make_vad_backend, VADSegmenter, EnergyGate
 
 log = logging.getLogger("subtitle")
 
@@ -52,16 +64,29 @@ _LANG_RE = re.compile(r"<\|([a-z]{2,3})\|>")
 
 class RealtimeSubtitle:
     """
-    识别核心：SenseVoice + Silero VAD 触发断句，双线程架构。
+    识别核心：SenseVoice + Silero VAD 触发断句，VAD 线程 + 推理线程池。
     音频流通过 start_stream / stop_stream 管理。
+
+    workers > 1 时第 0 个推理线程使用 engine，其余线程各自调用 engine_factory()
+    （默认 type(engine)）创建引擎；模型在各自线程里加载，加载完成前请求由已就绪的线程处理。
+
+    engine 为 None 时第 0 个引擎同样由 engine_factory() 创建。background=True 时
+    VAD / 引擎加载与预热在 loader 线程进行、构造立即返回（界面先出来）：ready 置位前
+    不能 start_stream，进度见 load_status，失败原因见 load_error。
     """
 
-    def __init__(self, engine):
-        self.engine = engine
+    def __init__(self, engine=None, workers: int = INFER_WORKERS, engine_factory=None,
+                 background: bool = False):
+        self.engine   = engine
+        self._factory = engine_factory or type(engine)
+        self._workers = workers
 
-        log.info("正在加载 Silero VAD（断句检测）...")
-        self._vad_model = load_silero_vad()
-        log.info("Silero VAD 加载完成，准备就绪")
+        # 加载状态（loader 线程写，界面线程只读）
+        self.ready       = threading.Event()
+        self.load_status = ""
+        self.load_error  = None
+        self._vad_model  = None
+        self.gate        = None
 
         # 音频输入队列
         self.audio_q = queue.Queue(maxsize=300)
@@ -75,98 +100,248 @@ class RealtimeSubtitle:
         self.disp_lock = threading.Lock()
         self.finals    = deque(maxlen=MAX_DISPLAY_LINES)
         self.pending   = ""
+        # 多线程乱序完成时的顺序交付：final 按 seq 暂存，连续的部分依次写入 finals；
+        # _final_lock 保证 on_final 回调也按说话顺序执行
+        self._final_lock  = threading.Lock()
+        self._reset_delivery()
 
         # 设备错误回调（由控制面板注册）
         self.on_device_error = None
+        # 最终字幕回调 on_final(text)，在推理线程中调用（无界面模式逐句输出用）
+        self.on_final = None
 
         # 流控
+        self.capture_process = CAPTURE_PROCESS   # True = 采集放到子进程（见 capture_proc）
+        self._shared_ring    = None              # 子进程模式下 VAD 直接读的共享环形缓冲
         self._capture   = None
         self._stop_flag = threading.Event()
         self._stop_flag.set()   # 初始为停止状态
         self.vad        = None
-        self._gen       = 0     # 会话代次，用于使过期推理请求失效
 
-        # 推理请求队列：items = (req_type, audio, gen)
-        # req_type: "preview" | "final"
-        self._infer_q = queue.Queue()
+        # 推理调度：final FIFO 通道 + preview 最新单槽，请求为 InferRequest
+        # seg: 语音段序号（增量识别按段复用状态，也用于作废同段的旧 preview）
+        self._sched = InferenceScheduler()
+        self._gen   = self._sched.new_generation()   # 会话代次，用于使过期推理请求失效
+
+        # 分环节延迟（采集 → VAD → 调度 → 推理 → 写入 → 界面绘制），见 StageTracer
+        self.tracer       = StageTracer()
+        self._undrawn     = []      # 已写入、界面尚未画出的 (kind, ts)
+        self._draw_traced = False   # 界面调用过 mark_drawn 才记录 draw 环节（无界面时不积累）
 
-        # 两个常驻后台线程
-        threading.Thread(target=self._vad_loop,     daemon=True, name="inference").start()
-        threading.Thread(target=self._infer_worker, daemon=True, name="infer").start()
+        # 增量识别 / preview 调速依赖引擎类型，引擎就绪后在 load() 里确定
+        self._streaming = False
+        self.governor   = PreviewGovernor(workers=workers)
+
+        if background:
+            threading.Thread(target=self._load_background, daemon=True, name="loader").start()
+        else:
+            self.load()
+
+    # ── 加载 ───────────────────────────────────────────────────────────────────
+
+    def load(self):
+        """加载 Silero VAD 与引擎、预热，然后启动 VAD 线程与推理线程池并置位 ready"""
+        self.load_status = "正在加载 Silero VAD（断句检测）..."
+        log.info(self.load_status)
+        with timeline.stage("vad"):
+            self._vad_model = make_vad_backend()
+        log.info("Silero VAD 加载完成（%s 后端），准备就绪", self._vad_model.name)
+        # 能量预门控：长时间静音时整批跳过 Silero（None = 关闭）
+        self.gate = EnergyGate() if VAD_GATE else None
+
+        if self.engine is None:
+            self.load_status = "正在加载 SenseVoice 模型..."
+            with timeline.stage("model"):
+                self.engine = self._factory()
+        if WARMUP:   # 只预热第 0 个引擎；其余推理线程的引擎就绪较晚，本来就是后备
+            self.load_status = "正在预热模型..."
+            with timeline.stage("warmup"):
+                warmup(self.engine)
+
+        # 增量识别：preview 送整段视图，由引擎复用特征与已确认前缀。
+        # 增量状态在各引擎内部，多个推理线程时同一段的请求会落到不同引擎上，只能单线程使用
+        self._streaming = (ENGINE_STREAMING and self._workers == 1
+                           and hasattr(self.engine, "transcribe_stream"))
+        if ENGINE_STREAMING and self._workers > 1:
+            log.info("推理线程数 %d > 1：关闭增量识别，preview 按窗口整段推理", self._workers)
+
+        # preview 调速：按实测推理耗时调整间隔 / 窗口，过载时暂停 preview
+        # （关闭时固定为 GOV_LEVELS[0]，即 PREVIEW_INTERVAL_SEC / PREVIEW_WINDOW_SEC）
+        self.governor = PreviewGovernor(windowed=not self._streaming, workers=self._workers)
+
+        # 常驻后台线程：VAD + workers 个推理线程
+        threading.Thread(target=self._vad_loop, daemon=True, name="inference").start()
+        for i in range(self._workers):
+            args = (self.engine, None) if i == 0 else (None, self._factory)
+            threading.Thread(target=self._infer_worker, args=args, daemon=True,
+                             name="infer" if self._workers == 1 else f"infer-{i}").start()
+
+        self.load_status = ""
+        self.ready.set()
+        timeline.mark("ready")
+        timeline.log()
+
+    def _load_background(self):
+        try:
+            self.load()
+        except Exception as e:
+            log.exception("加载失败: %s", e)
+            self.load_error  = e
+            self.load_status = ""
 
     # ── VAD 实例 ───────────────────────────────────────────────────────────────
 
-    def _new_vad(self) -> VADIterator:
-        return VADIterator(
-            self._vad_model,
-            threshold=0.5,
-            sampling_rate=SAMPLE_RATE,
-            min_silence_duration_ms=SILENCE_MS,
-            speech_pad_ms=80,
-        )
+    def _new_vad(self) -> VADSegmenter:
+        self._vad_model.reset()
+        if self.gate is not None:
+            self.gate.reset()
+        return VADSegmenter(threshold=0.5, min_silence_ms=SILENCE_MS)
 
     # ── 后台推理线程 ───────────────────────────────────────────────────────────
 
-    def _infer_worker(self):
+    def _infer_worker(self, engine=None, factory=None):
         """
-        后台推理线程：消费 _infer_q。
+        后台推理线程：从 _sched 取请求（final 优先，preview 已由调度器合并为最新一条，
+        交给当时空闲的线程）。engine 为 None 时先在本线程内调用 factory() 创建引擎。
 
-        - preview：若队列中存在更新的 preview（同一 gen），跳过旧的，仅处理最新
-        - final  ：始终处理，不跳过
+        - 过期代次的请求在调度器入口丢弃
+        - preview 推理完成时若流已重启、同段 final 已提交、或已显示更新的 preview，结果直接丢弃
+        - final 按 seq 顺序写入 finals（见 _deliver_final）
         - 字幕写入前剥离 SenseVoice 标签，日志保留原始文本
         """
-        while True:
+        if engine is None:
             try:
-                req_type, audio, gen = self._infer_q.get(timeout=0.5)
-            except queue.Empty:
-                continue
-
-            # 过期请求（流已重启）
-            if gen != self._gen:
-                continue
-
-            # preview：排空队列中同代次更新的 preview，使用最新音频
-            if req_type == "preview":
-                latest_audio = audio
-                while True:
-                    try:
-                        nxt_type, nxt_audio, nxt_gen = self._infer_q.get_nowait()
-                        if nxt_type == "preview" and nxt_gen == gen:
-                            latest_audio = nxt_audio        # 覆盖为更新的
-                        else:
-                            self._infer_q.put((nxt_type, nxt_audio, nxt_gen))  # 放回
-                            break
-                    except queue.Empty:
-                        break
-                audio = latest_audio
+                engine = factory()
+            except Exception as e:
+                log.exception("推理线程引擎创建失败，本线程退出: %s", e)
+                return
+            log.info("推理线程就绪")
 
-            # 二次检查（draining 期间流可能已停止）
-            if gen != self._gen:
+        while True:
+            t0  = time.perf_counter()
+            req = self._sched.get(timeout=0.5)
+            if req is None:
                 continue
+            tracer.complete("wait:sched", t0)
+            try:
+                self._handle_request(req, engine)
+            finally:
+                self._sched.task_done()
+
+    def _handle_request(self, req: InferRequest, engine):
+        final = req.kind == "final"
+        ts    = req.ts if req.ts is not None else {}
+        t0    = time.perf_counter()
+        ts["infer_start"] = time.time()
+        try:
+            if self._streaming:
+                raw = engine.transcribe_stream(req.seg, req.audio, final=final)
+            else:
+                raw = engine.transcribe(req.audio)      # 含 SenseVoice 标签
+        except Exception as e:
+            # final 仍需交付（哪怕为空），否则后续 seq 会一直等它
+            log.exception("推理异常 (%s seg=%d): %s", req.kind, req.seg, e)
+            raw = ""
+        ts["infer_end"] = time.time()
+        tracer.complete(f"infer:{req.kind}", t0,
+                        {"seg": req.seg, "audio_ms": len(req.audio) * 1000 // SAMPLE_RATE})
+        if PREVIEW_GOVERNOR:
+            self.governor.observe(req.kind, len(req.audio) / SAMPLE_RATE,
+                                  time.perf_counter() - t0, self._sched.final_backlog)
+        clean = _TAG_RE.sub("", raw).strip()            # 字幕显示用
+
+        if final:
+            self._deliver_final(req, raw, clean)
+            return
 
-            raw   = self.engine.transcribe(audio)           # 含 SenseVoice 标签
-            clean = _TAG_RE.sub("", raw).strip()            # 字幕显示用
-
+        with self.disp_lock:
+            # 推理期间流已重启 / 同段 final 已提交 / 其他线程已显示更新的 preview：不再显示
+            if self._sched.is_stale(req) or req.t < self._pending_t:
+                log.debug("[丢弃] 过期 preview seg=%d", req.seg)
+                return
+            if clean:
+                self.pending      = clean
+                self._pending_seg = req.seg
+                self._pending_t   = req.t
+                ts["display"] = time.time()
+                self._traced("preview", ts)
+                self._first_subtitle()
+            log.debug("[预览] %s", raw)
+
+    def _deliver_final(self, req: InferRequest, raw: str, clean: str):
+        """final 结果按 seq 暂存，从 _final_next 起连续的部分按顺序写入 finals 并回调 on_final"""
+        with self._final_lock:
             with self.disp_lock:
-                if req_type == "final":
+                if self._sched.is_stale(req):
+                    log.debug("[丢弃] 过期 final seg=%d", req.seg)
+                    return
+                self._final_ready[req.seq] = (req, raw, clean)
+                ready = []
+                while self._final_next in self._final_ready:
+                    ready.append(self._final_ready.pop(self._final_next))
+                    self._final_next += 1
+                now = time.time()
+                for r, raw, clean in ready:
                     if clean:
                         self.finals.append(clean)
                         log.info("[字幕] %s", raw)
-                    self.pending = ""
-                else:  # preview
+                        self._first_subtitle()
+                    if self._pending_seg <= r.seg:    # 后一段的 preview 可能已先显示
+                        self.pending = ""
+                    if r.ts is not None:
+                        r.ts["display"] = now
+                        self._traced("final", r.ts)
+
+            if self.on_final is not None:
+                for _, _, clean in ready:
                     if clean:
-                        self.pending = clean
-                    log.debug("[预览] %s", raw)
+                        self.on_final(clean)
+
+    @staticmethod
+    def _first_subtitle():
+        if not timeline.has("first_subtitle") and timeline.mark("first_subtitle"):
+            timeline.log()
+
+    def _traced(self, kind: str, ts: dict):
+        """写入显示状态后记录延迟（调用方持有 disp_lock）；未画出的 preview 只保留最新一条"""
+        self.tracer.record(kind, ts)
+        if self._draw_traced:
+            if kind == "preview":
+                self._undrawn = [u for u in self._undrawn if u[0] != "preview"]
+            self._undrawn.append((kind, ts))
+
+    def mark_drawn(self):
+        """界面刷新画完当前显示状态后调用（Tk 主线程），为其间写入的结果记录 draw 时间戳"""
+        now = time.time()
+        with self.disp_lock:
+            self._draw_traced = True
+            undrawn, self._undrawn = self._undrawn, []
+        for kind, ts in undrawn:
+            ts["draw"] = now
+            self.tracer.record(kind, ts, upto="draw")
+
+    def _reset_delivery(self):
+        """新代次：清空 final 暂存与 preview 顺序状态（调用方持有 disp_lock 或尚未启动线程）"""
+        self._final_next  = 0
+        self._final_ready = {}
+        self._pending_seg = -1
+        self._pending_t   = 0.0
+        self._undrawn     = []
 
     # ── VAD 循环（轻量，不阻塞于推理）────────────────────────────────────────
 
     def _vad_loop(self):
         """
-        轻量 VAD 循环：逐帧运行 Silero VAD，将推理请求提交到 _infer_q。
+        轻量 VAD 循环：逐帧运行 Silero VAD，将推理请求提交到 _sched。
         不直接调用 engine.transcribe()，彻底消除推理阻塞。
+        每轮把环形缓冲中已对齐的帧（最多 VAD_BATCH_FRAMES 个）一次交给后端打分，
+        状态机更新在同一次 buf_lock 内完成，取时间也只取一次。
         """
-        leftover          = np.array([], dtype=np.float32)
-        buf: list         = []       # 当前语音段缓冲
+        local             = RingBuffer(block=VAD_CHUNK * VAD_BATCH_FRAMES)
+        shared            = None     # 子进程采集时的共享环形缓冲（不经过 audio_q）
+        buf               = SegmentBuffer()   # 当前语音段缓冲
+        seg_id            = 0        # 语音段序号（开始说话 / 强制切断时递增）
+        gov               = self.governor
         seg_start         = 0.0
         last_preview_time = 0.0
 
@@ -174,87 +349,142 @@ class RealtimeSubtitle:
             # ── 停止状态：清理并等待 ──────────────────────────────────────────
             if self._stop_flag.is_set():
                 with self.buf_lock:
-                    buf = []
+                    buf.clear()
                     self.speaking = False
-                leftover = np.array([], dtype=np.float32)
+                local.clear()
+                ring = shared = None   # 释放对上一会话共享内存的引用
                 time.sleep(0.05)
                 continue
 
             # ── 取音频 ────────────────────────────────────────────────────────
-            try:
-                chunk = self.audio_q.get(timeout=0.5)
-            except queue.Empty:
-                continue
-
-            # ── 按 VAD_CHUNK 对齐，逐帧处理 ───────────────────────────────────
-            data     = np.concatenate([leftover, chunk]) if len(leftover) else chunk.copy()
-            n        = len(data) // VAD_CHUNK
-            leftover = data[n * VAD_CHUNK:].copy()
-
-            for i in range(n):
-                if self._stop_flag.is_set():
+            shared = self._shared_ring
+            if shared is not None:
+                ring = shared
+                if len(ring) < VAD_CHUNK:
+                    time.sleep(SHM_POLL_MS / 1000)
+                    continue
+            else:
+                ring = local
+                t0   = time.perf_counter()
+                try:
+                    chunk = self.audio_q.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                tracer.complete("wait:audio_q", t0)
+                if (written := ring.write(chunk)) < len(chunk):
+                    log.debug("VAD 环形缓冲满，丢弃 %d 采样", len(chunk) - written)
+
+            # ── 按 VAD_CHUNK 对齐，成批打分（frames 是环形缓冲的零拷贝视图）──────
+            while len(ring) >= VAD_CHUNK:
+                if self._stop_flag.is_set() or self.vad is None:
                     break
 
-                frame      = data[i * VAD_CHUNK:(i + 1) * VAD_CHUNK]
-                frame_t    = torch.from_numpy(frame)
-                vad_result = self.vad(frame_t, return_seconds=False) if self.vad else None
-
-                sentence_end = False
-                force_cut    = False
+                t0     = time.perf_counter()
+                n      = min(len(ring) // VAD_CHUNK, VAD_BATCH_FRAMES)
+                frames = ring.peek(n * VAD_CHUNK).reshape(n, VAD_CHUNK)
+                replay = 0
+                if self.gate is not None:
+                    # 空闲中整批安静 → 跳过 VAD；唤醒时整批交给 VAD，前面拼上 replay 个回看帧（已离开环形缓冲）
+                    gated = self.gate.process(frames, self.speaking)
+                    if gated is None:
+                        ring.advance(n * VAD_CHUNK)
+                        tracer.complete("vad:gated", t0, {"frames": n})
+                        continue
+                    frames, replay = gated.frames, gated.replay
+                    if gated.warmup is not None:
+                        self._vad_model.probs(gated.warmup)   # 不重置：只推进模型状态，概率丢弃
+                probs  = self._vad_model.probs(frames)
+                now    = time.time()
+                used   = len(frames)
+                reqs   = []
+                # 第 i 帧进入程序的时刻 ≈ now - 其后仍在缓冲 / 队列中的采样时长
+                lag    = len(ring) + replay * VAD_CHUNK \
+                         + (0 if shared is not None else self.audio_q.qsize() * VAD_CHUNK)
 
                 with self.buf_lock:
-                    if vad_result:
-                        if "start" in vad_result:
+                    for i in range(len(frames)):
+                        event        = self.vad.step(probs[i])
+                        sentence_end = False
+                        force_cut    = False
+
+                        if event == "start":
                             self.speaking     = True
-                            seg_start         = time.time()
-                            last_preview_time = seg_start
-                            self.last_speech_time = seg_start
-                            buf = []
-                        elif "end" in vad_result and self.speaking:
+                            seg_start         = now
+                            last_preview_time = now
+                            seg_id           += 1
+                            buf.clear()
+                        elif event == "end" and self.speaking:
                             sentence_end  = True
                             self.speaking = False
 
-                    if self.speaking:
-                        self.last_speech_time = time.time()
-                        buf.append(frame.copy())
-
-                        if time.time() - seg_start > MAX_SEG_SEC:
-                            force_cut = True
-                            seg_start = time.time()   # 重置计时，继续说话
-                            if self.vad:
-                                self.vad.reset_states()
-
-                # ── 句尾 / 强制切断 → 提交最终推理 ───────────────────────────
-                if (sentence_end or force_cut) and buf:
-                    audio = np.concatenate(buf)
-                    rms   = float(np.sqrt(np.mean(audio ** 2)))
-                    if rms >= NOISE_GATE_RMS:
-                        self._infer_q.put(("final", audio, self._gen))
-                    else:
-                        log.debug("[噪声门控] 跳过推理 rms=%.4f", rms)
-                    buf = []
-
-                # ── 说话中 → 提交预览推理（动态窗口：仅取末尾 PREVIEW_WINDOW_SEC 秒）
-                elif self.speaking and buf:
-                    now = time.time()
-                    if now - last_preview_time >= PREVIEW_INTERVAL_SEC:
-                        audio     = np.concatenate(buf)
-                        max_samp  = int(PREVIEW_WINDOW_SEC * SAMPLE_RATE)
-                        if len(audio) > max_samp:
-                            audio = audio[-max_samp:]   # 滑动窗口：只看最近 N 秒
-                        self._infer_q.put(("preview", audio, self._gen))
-                        last_preview_time = now
+                        t_start = seg_start
+                        t_cap   = now - (lag - (i + 1) * VAD_CHUNK) / SAMPLE_RATE
+                        if self.speaking:
+                            self.last_speech_time = now
+                            buf.append(frames[i])
+
+                            if now - seg_start > MAX_SEG_SEC or buf.full:
+                                force_cut = True
+                                seg_start = now   # 重置计时，继续说话
+
+                        # ── 句尾 / 强制切断 → 提交最终推理（整段连续数组，不再拼接）──
+                        if (sentence_end or force_cut) and len(buf):
+                            rms = buf.rms
+                            if rms >= NOISE_GATE_RMS:
+                                reqs.append(("final", buf.take(), seg_id,
+                                             {"vad_start": t_start, "capture": t_cap, "vad": now}))
+                            else:
+                                log.debug("[噪声门控] 跳过推理 rms=%.4f", rms)
+                                buf.clear()
+
+                        # ── 说话中 → 提交预览推理（动态窗口：仅取末尾 gov.window 秒的视图；
+                        #    增量识别时送整段视图，由引擎只重算未确认的尾部；间隔 / 窗口由调速器决定；
+                        #    调速器暂停 preview 时 final 仍是整段，引擎没有该段状态会整段推理）
+                        elif self.speaking and len(buf) and not gov.suspended \
+                                and now - last_preview_time >= gov.interval:
+                            win = len(buf) if self._streaming else int(gov.window * SAMPLE_RATE)
+                            reqs.append(("preview", buf.tail(win), seg_id,
+                                         {"capture": t_cap, "vad": now}))
+                            last_preview_time = now
+
+                        if force_cut:
+                            # 与 VADIterator.reset_states 一致：模型状态清零，
+                            # 本批剩余帧留到下一轮用新状态重新打分
+                            self._vad_model.reset()
+                            self.vad.reset()
+                            seg_id += 1
+                            used    = i + 1
+                            break
+
+                ring.advance(max(0, used - replay) * VAD_CHUNK)
+
+                gen = self._gen
+                for req_type, audio, seg, ts in reqs:
+                    self._sched.submit(InferRequest(req_type, audio, gen, seg, now, ts=ts))
+                tracer.complete("vad", t0, {"frames": n})
+
+            if shared is None:
+                self.audio_q.task_done()
 
     # ── 流控 ───────────────────────────────────────────────────────────────────
 
     def start_stream(self, device_index: int, mode: str = "input",
                      device_info: dict = None,
-                     loopback_idx: int = None, loopback_info: dict = None):
+                     loopback_idx: int = None, loopback_info: dict = None,
+                     file_path: str = None, speed: float = 1.0, ref_path: str = None):
         """
         启动指定设备的音频流并重建 VAD。
-        mode: 'input' | 'loopback' | 'mic_aec'
+        mode: 'input' | 'loopback' | 'mic_aec' | 'mic_mix' | 'file'
+        file 模式忽略 device_index，回放 file_path（ref_path 非空时先做 AEC），
+        speed 为回放倍速，0 = 不限速（见 AudioCapture.start_file）。
         """
-        self._gen += 1   # 使所有待处理的旧推理请求失效
+        if not self.ready.is_set():
+            raise RuntimeError("模型尚未加载完成")
+        timeline.mark("stream_start")
+        self._gen = self._sched.new_generation()   # 清空并使所有旧推理请求失效
+        with self.disp_lock:
+            self._reset_delivery()
+        self.tracer.reset()
 
         self.vad = self._new_vad()
         self.last_speech_time = time.time()
@@ -265,22 +495,23 @@ class RealtimeSubtitle:
                 self.audio_q.get_nowait()
             except queue.Empty:
                 break
-
-        # 清空残留推理请求
-        while not self._infer_q.empty():
-            try:
-                self._infer_q.get_nowait()
-            except queue.Empty:
-                break
+            self.audio_q.task_done()
 
         with self.buf_lock:
             self.speaking = False
 
-        self._capture = AudioCapture(
-            audio_q=self.audio_q,
-            on_error=self.on_device_error,
-        )
-        if mode == "loopback":
+        if self.capture_process:
+            self._capture = CaptureProcess(on_error=self.on_device_error)
+        else:
+            self._capture = AudioCapture(
+                audio_q=self.audio_q,
+                on_error=self.on_device_error,
+            )
+        if mode == "file":
+            if not file_path:
+                raise ValueError("file 模式需要提供 file_path")
+            self._capture.start_file(file_path, speed=speed, ref_path=ref_path)
+        elif mode == "loopback":
             self._capture.start_loopback(device_index, device_info or {})
         elif mode == "mic_aec":
             if loopback_idx is None:
@@ -293,19 +524,18 @@ class RealtimeSubtitle:
         else:
             self._capture.start_input(device_index)
 
+        if self.capture_process:
+            self._shared_ring = self._capture.ring
         self._stop_flag.clear()   # 最后清除 stop_flag，让两个循环开始工作
 
     def stop_stream(self):
-        """停止音频流，清空推理队列"""
+        """停止音频流，清空推理队列；本次会话的分环节延迟写入日志"""
         self._stop_flag.set()
-        self._gen += 1   # 使所有待处理推理请求失效
-
-        while not self._infer_q.empty():
-            try:
-                self._infer_q.get_nowait()
-            except queue.Empty:
-                break
+        self._gen = self._sched.new_generation()   # 清空并使所有待处理推理请求失效
+        with self.disp_lock:
+            self._reset_delivery()
 
+        self._shared_ring = None
         if self._capture is not None:
             self._capture.stop()
             self._capture = None
@@ -313,6 +543,51 @@ class RealtimeSubtitle:
         with self.disp_lock:
             self.pending = ""
 
+        for line in self.tracer.format():
+            log.info("[延迟] %s", line)
+
+    def wait_file_done(self, timeout: float | None = None) -> bool:
+        """
+        file 模式：阻塞直到文件回放结束（含尾部静音）；超时返回 False。
+        未以 file 模式启动时抛 RuntimeError。
+        """
+        done = getattr(self._capture, "file_done", None)
+        if done is None:
+            raise RuntimeError("未以 file 模式启动，没有回放可等待")
+        return done.wait(timeout)
+
+    def wait_idle(self):
+        """
+        阻塞直到已入队的音频全部经过 VAD、由此产生的推理请求全部完成。
+        file 模式下在 wait_file_done 之后调用，保证最后一句字幕已经输出。
+        """
+        ring = self._shared_ring
+        if ring is not None:
+            while len(ring) >= VAD_CHUNK:     # 子进程模式：等 VAD 读完共享环形缓冲
+                time.sleep(SHM_POLL_MS / 1000)
+        self.audio_q.join()
+        self._sched.join()
+
+    # ── 统计 ───────────────────────────────────────────────────────────────────
+
+    def stats(self) -> dict:
+        """
+        运行时统计快照；capture 为 AudioCapture.stats()（未启动时为空），
+        latency 为本次会话各环节延迟分位数（毫秒，见 StageTracer.summary）
+        """
+        cap = self._capture
+        return {
+            "audio_q_depth":    self.audio_q.qsize(),
+            "infer_pending":    self._sched.qsize(),
+            "infer_dropped":    dict(self._sched.dropped),
+            "latency":          self.tracer.summary(),
+            "preview_governor": self.governor.stats(),
+            "vad_gate":         self.gate.stats() if self.gate is not None else {},
+            "engine":           self.engine.stats() if hasattr(self.engine, "stats") else {},
+            "startup":          timeline.summary(),
+            "capture":          cap.stats() if cap is not None else {},
+        }
+
     # ── 显示 ───────────────────────────────────────────────────────────────────
 
     def get_display(self) -> tuple[list[str], str]:
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+流水线线程时间线（Chrome trace-event JSON，Perfetto / chrome://tracing 可直接打开），默认关闭
+
+  t0 = time.perf_counter(); ...; tracer.complete("vad", t0)   # 已有起点的代码段（回调等）
+  with tracer.span("gui:refresh"): ...                        # 代码块
+  tracer.write("trace.json")
+
+关闭时 complete() 只做一次属性判断，span() 返回共享的空上下文；开启时每个事件是
+一次 perf_counter() + 有界 deque.append（满了丢最早的事件），不加锁。
+线程名在该线程第一次记录时登记，PortAudio 回调线程按事件名命名。
+只覆盖本进程内的线程：采集 / 推理子进程里的工作不在时间线上（推理调用在主进程一侧仍有 span）。
+"""
+
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import nullcontext
+
+from config import TRACE_CAPACITY
+
+_NULL = nullcontext()
+
+
+class _Span:
+    __slots__ = ("_tracer", "_name", "_args", "_t0")
+
+    def __init__(self, tracer, name: str, args: dict | None):
+        self._tracer = tracer
+        self._name   = name
+        self._args   = args
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._tracer.complete(self._name, self._t0, self._args)
+
+
+class SpanTracer:
+    """
+    有界的 begin/end 事件缓冲（每个事件记为 Chrome trace 的 "X" 完整事件）。
+    事件名里冒号前的部分作为分类（cb / wait / infer ...），便于在 Perfetto 里筛选。
+    """
+
+    def __init__(self, capacity: int = TRACE_CAPACITY):
+        self.enabled  = False
+        self._events  = deque(maxlen=capacity)
+        self._threads = {}       # ident → 线程名
+        self._origin  = time.perf_counter()
+        self._count   = 0
+
+    def enable(self):
+        self._events.clear()
+        self._origin  = time.perf_counter()
+        self._count   = 0
+        self.enabled  = True
+
+    def disable(self):
+        self.enabled = False
+
+    def span(self, name: str, **args):
+        return _Span(self, name, args or None) if self.enabled else _NULL
+
+    def complete(self, name: str, t0: float, args: dict | None = None):
+        """记录 [t0, 现在] 的一个事件；t0 为 time.perf_counter()"""
+        if not self.enabled:
+            return
+        t1  = time.perf_counter()
+        tid = threading.get_ident()
+        if tid not in self._threads:
+            tname = threading.current_thread().name
+            self._threads[tid] = f"portaudio ({name})" if tname.startswith("Dummy") else tname
+        self._events.append((name, tid, t0, t1, args))
+        self._count += 1
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "events": len(self._events),
+                "dropped": max(0, self._count - len(self._events))}
+
+    def write(self, path: str) -> int:
+        """写出 Chrome trace-event JSON，返回事件数"""
+        pid    = os.getpid()
+        events = list(self._events)
+        out    = [{"ph": "M", "name": "process_name", "pid": pid, "args": {"name": "asr"}}]
+        out   += [{"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": tname}}
+                  for tid, tname in list(self._threads.items())]
+        for name, tid, t0, t1, args in events:
+            ev = {"ph": "X", "name": name, "cat": name.split(":", 1)[0], "pid": pid, "tid": tid,
+                  "ts": round((t0 - self._origin) * 1e6, 1), "dur": round((t1 - t0) * 1e6, 1)}
+            if args:
+                ev["args"] = args
+            out.append(ev)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": out, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+
+# 进程内唯一实例：各模块直接 from tracing import tracer
+tracer = SpanTracer()
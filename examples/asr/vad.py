@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Silero VAD 后端 + 断句状态机
+
+  TorchVAD    : silero_vad 的 TorchScript 模型（原实现），逐帧调用
+  OnnxVAD     : 同一模型的 ONNX 版本（silero-vad 包自带，onnxruntime 是其依赖），
+                单线程推理，LSTM 状态与 64 采样上下文由本类维护；
+                包内带 sequence 模型（silero_vad_16k_sequence.onnx）时
+                n 帧只需一次 session.run，否则逐帧调用流式模型
+  VADSegmenter: 在概率序列上复刻 silero_vad.VADIterator 的 start / end 判定
+  EnergyGate  : Silero 之前的能量 / 过零率预门控，长时间静音时整批跳过神经网络 VAD
+
+后端接口 probs(frames) 一次接收 (n, VAD_CHUNK) 的多帧，返回 n 个语音概率，
+跨调用保持模型状态。VAD 循环每轮把环形缓冲里已对齐的全部帧一起交给后端，
+加锁、取时间也只做一次。
+"""
+
+import os
+import logging
+from collections import deque
+from typing import NamedTuple
+
+import numpy as np
+
+from config import (
+    SAMPLE_RATE, VAD_CHUNK, VAD_BACKEND, VAD_BATCH_FRAMES,
+    GATE_IDLE_SEC, GATE_CLOSE_DB, GATE_OPEN_DB, GATE_ZCR, GATE_MIN_DBFS, GATE_LOOKBACK_MS,
+    GATE_WARMUP_MS,
+)
+
+log = logging.getLogger("subtitle")
+
+
+class TorchVAD:
+    """silero_vad.load_silero_vad() 的 TorchScript 模型，逐帧推理"""
+
+    name = "torch"
+
+    def __init__(self):
+        import torch
+        from silero_vad import load_silero_vad
+
+        self._torch = torch
+        self._model = load_silero_vad()
+        self._out   = np.zeros(VAD_BATCH_FRAMES, dtype=np.float32)
+
+    def probs(self, frames: np.ndarray) -> np.ndarray:
+        """frames: (n, VAD_CHUNK) float32；返回值为内部缓冲视图，下次调用前有效"""
+        n = len(frames)
+        if n > len(self._out):
+            self._out = np.zeros(n, dtype=np.float32)
+        with self._torch.inference_mode():
+            for i in range(n):
+                self._out[i] = self._model(self._torch.from_numpy(frames[i]), SAMPLE_RATE).item()
+        return self._out[:n]
+
+    def reset(self):
+        self._model.reset_states()
+
+
+class OnnxVAD:
+    """
+    silero_vad 的 ONNX 模型 + onnxruntime（单线程，CPU）。
+
+    sequence 模型：input=(n, 64 + 512)，每行是上一帧末尾 64 采样 + 本帧，
+                   LSTM 状态 h / c 随调用传递，n 帧一次 session.run 得到 n 个概率
+    流式模型    ：input=(1, 64 + 512)、state=(2, 1, 128)、sr，逐帧调用
+
+    两种模型输出逐帧一致；输入数组全部预分配。
+    """
+
+    name = "onnx"
+
+    _CTX = 64
+
+    def __init__(self, path: str | None = None):
+        import onnxruntime as ort
+
+        if path is None:
+            # find_spec 只定位包目录，不执行 silero_vad/__init__（那里会导入 torch）
+            from importlib.util import find_spec
+            data = os.path.join(find_spec("silero_vad").submodule_search_locations[0], "data")
+            path = os.path.join(data, "silero_vad_16k_sequence.onnx")
+            if not os.path.isfile(path):     # 旧版 silero-vad 只有流式模型
+                path = os.path.join(data, "silero_vad.onnx")
+
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = 1
+        opts.inter_op_num_threads = 1
+        self._sess    = ort.InferenceSession(path, sess_options=opts,
+                                             providers=["CPUExecutionProvider"])
+        self.batched  = "h" in {i.name for i in self._sess.get_inputs()}
+        self._x       = np.zeros((VAD_BATCH_FRAMES, self._CTX + VAD_CHUNK), dtype=np.float32)
+        self._out     = np.zeros(VAD_BATCH_FRAMES, dtype=np.float32)
+        self._sr      = np.array(SAMPLE_RATE, dtype=np.int64)
+        self.reset()
+
+    def probs(self, frames: np.ndarray) -> np.ndarray:
+        """frames: (n, VAD_CHUNK) float32；返回值为内部缓冲视图，下次调用前有效"""
+        n = len(frames)
+        if n > len(self._x):
+            self._x   = np.zeros((n, self._CTX + VAD_CHUNK), dtype=np.float32)
+            self._out = np.zeros(n, dtype=np.float32)
+        ctx = self._CTX
+        x   = self._x[:n]
+        x[0, :ctx] = self._ctx
+        x[1:, :ctx] = frames[:-1, -ctx:]
+        x[:, ctx:]  = frames
+        self._ctx[:] = frames[-1, -ctx:]
+
+        if self.batched:
+            p, self._h, self._c = self._sess.run(None, {"input": x, "h": self._h, "c": self._c})
+            self._out[:n] = p
+        else:
+            for i in range(n):
+                out, self._state = self._sess.run(
+                    None, {"input": x[i:i + 1], "state": self._state, "sr": self._sr})
+                self._out[i] = out[0, 0]
+        return self._out[:n]
+
+    def reset(self):
+        self._ctx   = np.zeros(self._CTX, dtype=np.float32)
+        self._h     = np.zeros((1, 1, 128), dtype=np.float32)
+        self._c     = np.zeros((1, 1, 128), dtype=np.float32)
+        self._state = np.zeros((2, 1, 128), dtype=np.float32)
+
+
+def make_vad_backend(name: str = VAD_BACKEND):
+    """按名称创建后端；"onnx" 加载失败（onnxruntime 缺失等）时退回 "torch" """
+    if name == "onnx":
+        try:
+            return OnnxVAD()
+        except Exception as e:
+            log.warning("ONNX VAD 加载失败，退回 TorchScript 版本: %s", e)
+    elif name != "torch":
+        raise ValueError(f"未知 VAD 后端: {name}（可选: onnx, torch）")
+    return TorchVAD()
+
+
+class VADSegmenter:
+    """
+    与 silero_vad.VADIterator 相同的断句状态机，输入是逐帧语音概率：
+
+      - 概率 ≥ threshold 且未触发        → "start"
+      - 触发后概率 < threshold - 0.15 起计静音，持续 min_silence_ms → "end"
+      - 静音期间概率回到 ≥ threshold     → 取消本次静音计时
+
+    VADIterator 还会按 speech_pad_ms 返回起止采样位置；本项目只用事件本身，故省略。
+    """
+
+    def __init__(self, threshold: float = 0.5, min_silence_ms: int = 100):
+        self.threshold   = threshold
+        self._neg        = threshold - 0.15
+        self._min_sil    = SAMPLE_RATE * min_silence_ms / 1000
+        self.reset()
+
+    def reset(self):
+        self.triggered = False
+        self._temp_end = 0
+        self._pos      = 0        # 已处理采样数（含当前帧）
+
+    def step(self, prob: float) -> str | None:
+        self._pos += VAD_CHUNK
+        if prob >= self.threshold:
+            self._temp_end = 0
+            if not self.triggered:
+                self.triggered = True
+                return "start"
+        elif prob < self._neg and self.triggered:
+            if not self._temp_end:
+                self._temp_end = self._pos
+            if self._pos - self._temp_end >= self._min_sil:
+                self._temp_end = 0
+                self.triggered = False
+                return "end"
+        return None
+
+
+class GateOut(NamedTuple):
+    frames: np.ndarray          # 应交给 VAD 的帧：前 replay 帧来自此前的批（已离开缓冲），其后为本批全部帧
+    replay: int
+    warmup: np.ndarray | None   # 唤醒时：先送进 VAD 模型推进状态的空闲帧（在 frames 之前，概率丢弃）
+
+
+class EnergyGate:
+    """
+    VAD 预门控（每批帧一次向量化计算：帧能量 dBFS + 过零率），两种状态：
+
+      active → idle : VAD 未触发，且连续 GATE_IDLE_SEC 的帧能量都低于 底噪 + GATE_CLOSE_DB
+      idle → active : 某帧能量高于 底噪 + GATE_OPEN_DB，或高于 底噪 + GATE_CLOSE_DB 且
+                      过零率 ≥ GATE_ZCR（清擦音起始能量低、过零率高）
+
+    开 / 关阈值之间留回差，进入空闲前还要持续安静 GATE_IDLE_SEC，说话中途的停顿不会关门。
+    空闲期间最近的帧留在回看缓冲；唤醒时本批整批交给 VAD，唤醒帧之前不足 GATE_LOOKBACK_MS
+    的部分由回看缓冲补上、排在本批之前，弱起始的前几帧也能被 VAD 看到。
+    再往前最多 GATE_WARMUP_MS 的空闲帧作为 warmup 返回：调用方不重置 VAD 模型，先用它们
+    推进状态再打分，模型状态与不开门控时连续运行的状态接近（Silero 的 LSTM 记忆很长）。
+
+    底噪：active 时跟踪 VAD 未触发的帧，idle 时跟踪未达唤醒阈值的帧；
+    下降快、上升慢（环境噪声变大后需要一段时间才会进入空闲，而不是漏判语音）。
+    """
+
+    _DOWN = 0.3      # 每帧的跟踪系数
+    _UP   = 0.01
+
+    def __init__(self):
+        ms2frames         = lambda ms: int(np.ceil(ms * SAMPLE_RATE / 1000 / VAD_CHUNK))
+        self._idle_frames = max(1, int(GATE_IDLE_SEC * SAMPLE_RATE / VAD_CHUNK))
+        self._back        = max(1, ms2frames(GATE_LOOKBACK_MS))
+        self._warm        = ms2frames(GATE_WARMUP_MS)
+        self._lookback    = deque(maxlen=self._back + self._warm)   # 空闲中最近的帧（warmup + 回看）
+        self.skipped      = 0     # 未交给 VAD 模型的帧数（warmup 帧不算跳过）
+        self.wakeups      = 0
+        self.reset()
+
+    def reset(self):
+        self.idle    = False
+        self._floor  = GATE_MIN_DBFS
+        self._quiet  = 0          # 连续安静帧数（active 时）
+        self._lookback.clear()
+
+    def process(self, frames: np.ndarray, triggered: bool) -> GateOut | None:
+        """
+        frames: (n, VAD_CHUNK)；triggered: VAD 当前是否处于语音段内。
+        active 时返回 GateOut(frames, 0, None)；空闲且整批安静时返回 None（整批跳过）；
+        唤醒时返回 GateOut(回看帧 + frames, 回看帧数, 更早的空闲帧)。
+        """
+        n   = len(frames)
+        db  = 10 * np.log10(np.einsum("ij,ij->i", frames, frames) / VAD_CHUNK + 1e-12)
+        fl  = self._floor
+
+        if not self.idle:
+            quiet = db < fl + GATE_CLOSE_DB
+            if triggered:
+                self._quiet = 0
+            else:
+                self._track(db)
+                loud = np.flatnonzero(~quiet)
+                self._quiet = self._quiet + n if not len(loud) else n - 1 - loud[-1]
+                if self._quiet >= self._idle_frames:
+                    self.idle = True          # 本批已交给 VAD，回看缓冲从下一批开始
+            return GateOut(frames, 0, None)
+
+        zcr  = np.count_nonzero(np.diff(np.signbit(frames), axis=1), axis=1) / (VAD_CHUNK - 1)
+        wake = (db > fl + GATE_OPEN_DB) | ((db > fl + GATE_CLOSE_DB) & (zcr >= GATE_ZCR))
+        if not wake.any():
+            self._track(db)
+            self._lookback.extend(frames[-self._lookback.maxlen:].copy())
+            self.skipped += n
+            return None
+
+        # 唤醒帧 k 之前本批已有 k 帧，回看只补不足 GATE_LOOKBACK_MS 的部分；更早的帧作 warmup
+        k      = int(np.argmax(wake))
+        hist   = list(self._lookback)
+        replay = min(len(hist), max(0, self._back - k))
+        cut    = len(hist) - replay
+        out    = np.concatenate([np.stack(hist[cut:]), frames]) if replay else frames
+        warm   = np.stack(hist[max(0, cut - self._warm):cut]) if cut else None
+        self.skipped -= len(hist[max(0, cut - self._warm):])   # 回放 / warmup 的帧此前计为跳过
+        self.idle     = False
+        self._quiet   = 0
+        self.wakeups += 1
+        self._lookback.clear()
+        return GateOut(out, replay, warm)
+
+    def _track(self, db: np.ndarray):
+        """用一批帧里的最低能量更新底噪（按帧数折算跟踪系数；取最低值，语音起始所在批不会抬高底噪）"""
+        m = float(db.min())
+        a = self._DOWN if m < self._floor else self._UP
+        self._floor += (1 - (1 - a) ** len(db)) * (m - self._floor)
+        self._floor  = max(self._floor, GATE_MIN_DBFS)
+
+    def stats(self) -> dict:
+        return {"idle": self.idle, "floor_dbfs": round(self._floor, 1),
+                "skipped": self.skipped, "wakeups": self.wakeups}